@@ -1,32 +1,101 @@
 """
 API views for the immigration application.
 """
+import io
+import json
+import os
+import tempfile
+import time
+
 from rest_framework import viewsets, generics, status
 from rest_framework.decorators import action
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.reverse import reverse
+from django.conf import settings
+from django.utils import timezone
+from django.http import StreamingHttpResponse, FileResponse
 from django.shortcuts import get_object_or_404
-from .models import TravelDocument, DegmadaForm, KafiilkaForm
+from django.core.exceptions import ValidationError
+from .models import TravelDocument, DegmadaForm, KafiilkaForm, Job, ExportArtifact
 from .serializers import (
     TravelDocumentSerializer, TravelDocumentCreateSerializer,
-    TravelDocumentUpdateSerializer, DegmadaFormSerializer,
+    TravelDocumentUpdateSerializer, TravelDocumentBulkCreateSerializer,
+    DegmadaFormSerializer,
     KafiilkaFormSerializer, StatisticsSerializer,
     DocumentSearchSerializer, ExportRequestSerializer,
-    BulkOperationSerializer
+    BulkOperationSerializer, NameSearchSerializer, NameMatchSerializer,
+    PersonRecordSerializer, AutocompleteSerializer, RollupQuerySerializer,
+    LifecycleReportSerializer, JobSerializer, SyncFeedSerializer,
+    ExportArtifactSerializer, PrintBatchSerializer
 )
 from .services import (
     TravelDocumentService, FormService, ValidationService,
     ExportService
 )
-from .utils import ReportGenerator
+from .utils import ReportGenerator, DataProcessor
+from .search import get_search_backend
+from .names import NameIndex
+from .persons import PersonIndex
+from .search_cache import SearchResultCache
+from .autocomplete import AutocompleteIndex
+from .statistics import StatisticsCounters
+from .rollups import RollupCube, CUBES
+from .lifecycle import LifecycleReport
+from .pagination import OptionalCursorPagination
+from .fast_serializers import FastSerializer
+from .conditional import ConditionalGetMixin
+from .jobs import JobQueue
+from .exports import ExportArtifacts
+from .sync import SyncFeed, InvalidSyncToken
+from .pdf import PDFRenderer, PDFUnavailable, PDF_LAYOUTS, require_packages
+
+
+def job_accepted(request, job):
+    """Return the 202 response pointing the client at a queued job."""
+    return Response(
+        {'job': JobSerializer(job).data},
+        status=status.HTTP_202_ACCEPTED,
+        headers={'Location': reverse('job-detail', args=[job.pk], request=request)}
+    )
+
+
+class QueryPlanMixin:
+    """
+    Shape viewset querysets after the fields the serializer will output.
+    
+    Joins and prefetches follow the selected fields, and read actions with
+    ``?fields=``/``?expand=`` also load only the columns those fields use.
+    """
+    read_actions = ('list', 'retrieve', 'recent', 'search')
+    
+    def with_related(self, queryset):
+        serializer = self.get_serializer()
+        if not hasattr(serializer, 'get_query_plan'):
+            return queryset
+        
+        plan = serializer.get_query_plan()
+        if plan['select_related']:
+            queryset = queryset.select_related(*plan['select_related'])
+        if plan['prefetch_related']:
+            queryset = queryset.prefetch_related(*plan['prefetch_related'])
+        if serializer.is_sparse and self.action in self.read_actions:
+            # created_at is kept for ordering and cursor pagination
+            queryset = queryset.only('created_at', *plan['only'])
+        return queryset
 
 
-class TravelDocumentViewSet(viewsets.ModelViewSet):
+class TravelDocumentViewSet(ConditionalGetMixin, QueryPlanMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing travel documents.
     """
     queryset = TravelDocument.objects.all()
     permission_classes = [IsAuthenticated]
+    pagination_class = OptionalCursorPagination
+    # Read actions served from values_list rows, see FastSerializer
+    fast_actions = ('list', 'recent', 'search')
+    conditional_actions = ('list', 'retrieve', 'recent', 'pdf')
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -36,19 +105,14 @@ class TravelDocumentViewSet(viewsets.ModelViewSet):
         return TravelDocumentSerializer
     
     def get_queryset(self):
-        queryset = TravelDocument.objects.all()
+        queryset = self.with_related(TravelDocument.objects.all())
         
         # Filter by query parameters
         query = self.request.query_params.get('query', None)
         region = self.request.query_params.get('region', None)
         status_filter = self.request.query_params.get('status', None)
-        
-        if query:
-            queryset = queryset.filter(
-                full_name__icontains=query
-            ) | queryset.filter(
-                document_number__icontains=query
-            )
+        phone_number = self.request.query_params.get('phone_number', None)
+        identification_number = self.request.query_params.get('identification_number', None)
         
         if region:
             queryset = queryset.filter(region=region)
@@ -56,14 +120,73 @@ class TravelDocumentViewSet(viewsets.ModelViewSet):
         if status_filter:
             queryset = queryset.filter(status=status_filter)
         
+        # Exact lookups on the normalized columns
+        if phone_number:
+            queryset = queryset.filter(
+                phone_number_normalized=DataProcessor.normalize_phone_number(phone_number)
+            )
+        
+        if identification_number:
+            queryset = queryset.filter(
+                identification_number_normalized=DataProcessor.normalize_identification_number(
+                    identification_number
+                )
+            )
+        
+        if query:
+            return get_search_backend().search(queryset, query)
+        
         return queryset.order_by('-created_at')
     
+    def get_conditional_queryset(self):
+        if self.action == 'recent':
+            days = int(self.request.query_params.get('days', 30))
+            return ReportGenerator.get_recent_documents(days)
+        return super().get_conditional_queryset()
+    
+    def get_fast_serializer(self):
+        """Return the fast serializer for this action, or None to use the regular one."""
+        if self.action not in self.fast_actions:
+            return None
+        # created_at is kept for cursor pagination
+        fast = FastSerializer(self.get_serializer(), columns=('created_at',))
+        return fast if fast.supported else None
+    
+    def read_rows(self, queryset, fast):
+        """Prepare a queryset for the fast or the regular serializer."""
+        if fast is not None:
+            return fast.rows(queryset)
+        return self.with_related(queryset)
+    
+    def read_ids(self, ids, fast):
+        """Load the documents for a list of IDs, keeping their order."""
+        if fast is not None:
+            return fast.rows_for_ids(ids)
+        return SearchResultCache.hydrate(ids, self.with_related(TravelDocument.objects.all()))
+    
+    def serialize_rows(self, rows, fast):
+        """Serialize rows with the fast or the regular serializer."""
+        if fast is not None:
+            return fast.serialize(rows)
+        return self.get_serializer(rows, many=True).data
+    
+    def list(self, request, *args, **kwargs):
+        fast = self.get_fast_serializer()
+        if fast is None:
+            return super().list(request, *args, **kwargs)
+        
+        rows = fast.rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(fast.serialize(page))
+        return Response(fast.serialize(rows))
+    
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
         """Approve a travel document."""
         document = self.get_object()
         try:
-            updated_document = TravelDocumentService.approve_document(document)
+            updated_document = TravelDocumentService.approve_document(document, request.user)
             serializer = self.get_serializer(updated_document)
             return Response(serializer.data)
         except Exception as e:
@@ -77,7 +200,7 @@ class TravelDocumentViewSet(viewsets.ModelViewSet):
         """Mark document as printed."""
         document = self.get_object()
         try:
-            updated_document = TravelDocumentService.print_document(document)
+            updated_document = TravelDocumentService.print_document(document, request.user)
             serializer = self.get_serializer(updated_document)
             return Response(serializer.data)
         except Exception as e:
@@ -86,6 +209,105 @@ class TravelDocumentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
     
+    @action(detail=True, methods=['get'])
+    def pdf(self, request, pk=None):
+        """Get the document's print-ready PDF (``?layout=document|card``)."""
+        layout = request.query_params.get('layout', 'document')
+        if layout not in PDF_LAYOUTS:
+            return Response(
+                {'error': f'Unknown layout: {layout}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        document = self.get_object()
+        try:
+            content = PDFRenderer.render(document, layout)
+        except PDFUnavailable as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        return FileResponse(
+            io.BytesIO(content),
+            filename=f'{document.document_number}_{layout}.pdf',
+            content_type='application/pdf'
+        )
+    
+    @action(detail=False, methods=['post'])
+    def print_batch(self, request):
+        """
+        Render many documents, in order, into one print-ready PDF.
+        
+        With ``mark_printed`` the documents are marked printed before they
+        are rendered, so the pages show their printed status; nothing is
+        changed if any of them cannot be printed. Batches of more than
+        PDF_BATCH_SYNC_LIMIT documents, or with ``background``, are
+        rendered by a job and stored as an export artifact.
+        """
+        serializer = PrintBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        document_ids = serializer.validated_data['document_ids']
+        layout = serializer.validated_data['layout']
+        
+        try:
+            require_packages()
+        except PDFUnavailable as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        
+        statuses = dict(
+            TravelDocument.objects.filter(id__in=document_ids).values_list('id', 'status')
+        )
+        if not statuses:
+            return Response(
+                {'error': 'No documents found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        if serializer.validated_data['mark_printed']:
+            errors = TravelDocumentService.print_errors(document_ids, statuses)
+            if errors:
+                return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+            unprinted = [pk for pk in document_ids if statuses[pk] != 'printed']
+            if unprinted:
+                TravelDocumentService.bulk_update_status(unprinted, 'printed', request.user)
+        
+        if (serializer.validated_data['background']
+                or len(document_ids) > settings.PDF_BATCH_SYNC_LIMIT):
+            # An unchanged batch is served from its stored file
+            artifact = ExportArtifacts.find(
+                PDFRenderer.batch_fingerprint(document_ids, layout, request.user)
+            )
+            if artifact is not None:
+                return Response({
+                    'artifact': ExportArtifactSerializer(
+                        artifact, context={'request': request}
+                    ).data
+                })
+            job = JobQueue.enqueue(
+                'print_batch',
+                {'document_ids': document_ids, 'layout': layout},
+                request.user
+            )
+            return job_accepted(request, job)
+        
+        output = tempfile.TemporaryFile()
+        # Rendered in this process; only background jobs start workers
+        PDFRenderer.render_batch(document_ids, output, layout, processes=1)
+        output.seek(0)
+        return FileResponse(
+            output,
+            as_attachment=True,
+            filename=f'print_{layout}.pdf',
+            content_type='application/pdf'
+        )
+    
     @action(detail=False, methods=['get'])
     def statistics(self, request):
         """Get document statistics."""
@@ -102,9 +324,15 @@ class TravelDocumentViewSet(viewsets.ModelViewSet):
     def recent(self, request):
         """Get recent documents (last 30 days by default)."""
         days = int(request.query_params.get('days', 30))
-        documents = ReportGenerator.get_recent_documents(days)
-        serializer = self.get_serializer(documents, many=True)
-        return Response(serializer.data)
+        fast = self.get_fast_serializer()
+        documents = self.read_rows(ReportGenerator.get_recent_documents(days), fast)
+        
+        # Unpaginated unless the client asks for cursor pages
+        if self.paginator.use_cursor(request):
+            page = self.paginate_queryset(documents)
+            return self.get_paginated_response(self.serialize_rows(page, fast))
+        
+        return Response(self.serialize_rows(documents, fast))
     
     @action(detail=False, methods=['post'])
     def search(self, request):
@@ -112,17 +340,31 @@ class TravelDocumentViewSet(viewsets.ModelViewSet):
         serializer = DocumentSearchSerializer(data=request.data)
         if serializer.is_valid():
             filters = serializer.validated_data
-            documents = TravelDocumentService.search_documents(
+            
+            fast = self.get_fast_serializer()
+            # Pages are cut from the cached ID list; only one page is loaded.
+            # Cursor pages are ordered by recency and read straight from the table.
+            document_ids = None
+            if not self.paginator.use_cursor(request):
+                document_ids = SearchResultCache.get_ids(
+                    filters,
+                    lambda params: TravelDocumentService.search_documents(params.get('query'), params)
+                )
+            if document_ids is not None:
+                page = self.paginate_queryset(document_ids)
+                if page is not None:
+                    rows = self.read_ids(page, fast)
+                    return self.get_paginated_response(self.serialize_rows(rows, fast))
+                return Response(self.serialize_rows(self.read_ids(document_ids, fast), fast))
+            
+            documents = self.read_rows(TravelDocumentService.search_documents(
                 filters.get('query'),
                 filters
-            )
+            ), fast)
             page = self.paginate_queryset(documents)
             if page is not None:
-                serializer = self.get_serializer(page, many=True)
-                return self.get_paginated_response(serializer.data)
-            
-            serializer = self.get_serializer(documents, many=True)
-            return Response(serializer.data)
+                return self.get_paginated_response(self.serialize_rows(page, fast))
+            return Response(self.serialize_rows(documents, fast))
         return Response(
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
@@ -136,27 +378,89 @@ class TravelDocumentViewSet(viewsets.ModelViewSet):
             format_type = serializer.validated_data['format']
             filters = serializer.validated_data.get('filters', {})
             
+            if format_type not in ExportService.FORMATS:
+                return Response(
+                    {'error': 'Format not yet implemented'},
+                    status=status.HTTP_501_NOT_IMPLEMENTED
+                )
+            if serializer.validated_data['background']:
+                # An unchanged export is served from its stored file
+                artifact, job = ExportArtifacts.request(serializer.data, request.user)
+                if artifact is not None:
+                    return Response({
+                        'artifact': ExportArtifactSerializer(
+                            artifact, context={'request': request}
+                        ).data
+                    })
+                return job_accepted(request, job)
+            
             documents = TravelDocumentService.search_documents(
                 filters.get('query'),
                 filters
             )
             
             if format_type == 'excel':
-                return ExportService.export_to_excel(documents)
-            elif format_type == 'json':
-                data = [TravelDocumentSerializer(doc).data for doc in documents]
-                from django.http import JsonResponse
-                return JsonResponse({'documents': data})
-            else:
-                return Response(
-                    {'error': 'Format not yet implemented'},
-                    status=status.HTTP_501_NOT_IMPLEMENTED
+                return ExportService.export_to_excel(
+                    documents,
+                    filters=filters,
+                    sheets=serializer.validated_data.get('sheets')
                 )
+            return ExportService.export_streamed(
+                format_type,
+                documents,
+                columns=serializer.validated_data.get('columns')
+            )
         return Response(
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
         )
     
+    @action(detail=False, methods=['post'])
+    def bulk_create(self, request):
+        """
+        Create a batch of documents with their children.
+        
+        Valid rows are created together; the response lists the outcome of
+        every row by its index in the request.
+        """
+        serializer = TravelDocumentBulkCreateSerializer(
+            data=request.data,
+            context=self.get_serializer_context()
+        )
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        valid, invalid = serializer.split_rows()
+        documents = TravelDocumentService.bulk_create_documents(
+            [row for index, row in valid],
+            request.user
+        )
+        
+        results = [
+            {
+                'index': index,
+                'status': 'created',
+                'id': document.id,
+                'document_number': document.document_number
+            }
+            for (index, row), document in zip(valid, documents)
+        ] + [
+            {'index': index, 'status': 'error', 'errors': errors}
+            for index, errors in invalid
+        ]
+        results.sort(key=lambda result: result['index'])
+        
+        if not invalid:
+            response_status = status.HTTP_201_CREATED
+        elif valid:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({'results': results}, status=response_status)
+    
     @action(detail=False, methods=['post'])
     def bulk_operation(self, request):
         """Perform bulk operations on documents."""
@@ -165,39 +469,18 @@ class TravelDocumentViewSet(viewsets.ModelViewSet):
             document_ids = serializer.validated_data['document_ids']
             operation = serializer.validated_data['operation']
             
-            documents = TravelDocument.objects.filter(id__in=document_ids)
-            results = []
-            
-            for document in documents:
-                try:
-                    if operation == 'approve':
-                        TravelDocumentService.approve_document(document)
-                        results.append({
-                            'document_id': document.id,
-                            'status': 'success',
-                            'message': 'Document approved'
-                        })
-                    elif operation == 'print':
-                        TravelDocumentService.print_document(document)
-                        results.append({
-                            'document_id': document.id,
-                            'status': 'success',
-                            'message': 'Document marked as printed'
-                        })
-                    elif operation == 'delete':
-                        document.delete()
-                        results.append({
-                            'document_id': document.id,
-                            'status': 'success',
-                            'message': 'Document deleted'
-                        })
-                except Exception as e:
-                    results.append({
-                        'document_id': document.id,
-                        'status': 'error',
-                        'message': str(e)
-                    })
+            if (serializer.validated_data['background']
+                    or len(document_ids) > settings.BULK_OPERATION_SYNC_LIMIT):
+                job = JobQueue.enqueue(
+                    'bulk_operation',
+                    {'document_ids': document_ids, 'operation': operation},
+                    request.user
+                )
+                return job_accepted(request, job)
             
+            results = TravelDocumentService.bulk_operation(
+                document_ids, operation, request.user
+            )
             return Response({'results': results})
         return Response(
             serializer.errors,
@@ -205,13 +488,17 @@ class TravelDocumentViewSet(viewsets.ModelViewSet):
         )
 
 
-class DegmadaFormViewSet(viewsets.ModelViewSet):
+class DegmadaFormViewSet(ConditionalGetMixin, QueryPlanMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing degmada forms.
     """
     queryset = DegmadaForm.objects.all()
     serializer_class = DegmadaFormSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OptionalCursorPagination
+    
+    def get_queryset(self):
+        return self.with_related(super().get_queryset())
     
     @action(detail=False, methods=['get'])
     def statistics(self, request):
@@ -237,13 +524,17 @@ class DegmadaFormViewSet(viewsets.ModelViewSet):
         return Response({'valid': True})
 
 
-class KafiilkaFormViewSet(viewsets.ModelViewSet):
+class KafiilkaFormViewSet(ConditionalGetMixin, QueryPlanMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing kafiilka forms.
     """
     queryset = KafiilkaForm.objects.all()
     serializer_class = KafiilkaFormSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OptionalCursorPagination
+    
+    def get_queryset(self):
+        return self.with_related(super().get_queryset())
     
     @action(detail=False, methods=['get'])
     def statistics(self, request):
@@ -277,30 +568,195 @@ class StatisticsView(generics.RetrieveAPIView):
     
     def get(self, request):
         """Get overall statistics."""
-        stats = ReportGenerator.get_statistics()
-        
-        # Combine with service statistics
-        travel_stats = TravelDocumentService.get_document_statistics()
-        form_stats = FormService.get_form_statistics()
-        
-        combined_stats = {
-            'total_documents': stats['total_travel_documents'],
-            'approved_documents': stats['approved_documents'],
-            'filled_documents': stats['filled_documents'],
-            'printed_documents': stats['printed_documents'],
-            'recent_documents': travel_stats['recent_30_days'],
-            
-            'total_degmada': form_stats['total_degmada'],
-            'total_kafiilka': form_stats['total_kafiilka'],
-            
-            'recent_degmada': form_stats['recent_degmada'],
-            'recent_kafiilka': form_stats['recent_kafiilka'],
-        }
+        # Read from the counters table instead of counting the base tables
+        combined_stats = StatisticsCounters.dashboard()
         
         serializer = StatisticsSerializer(combined_stats)
         return Response(serializer.data)
 
 
+class RollupView(generics.GenericAPIView):
+    """
+    View for slicing and rolling up the pre-aggregated document and form cubes.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = RollupQuerySerializer
+    
+    def get(self, request, cube):
+        """
+        Drill down into a cube.
+        
+        ``group_by`` is a comma-separated list of dimensions; any other
+        dimension given as a query parameter slices the cube.
+        """
+        params = RollupQuerySerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response(
+                params.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        dimensions = CUBES[cube][1] if cube in CUBES else []
+        filters = {
+            dimension: request.query_params[dimension]
+            for dimension in dimensions
+            if dimension != 'day' and dimension in request.query_params
+        }
+        
+        try:
+            rows = RollupCube.drill_down(
+                cube,
+                group_by=params.validated_data.get('group_by'),
+                filters=filters,
+                date_from=params.validated_data.get('date_from'),
+                date_to=params.validated_data.get('date_to')
+            )
+        except ValidationError as e:
+            return Response(
+                {'error': e.messages[0]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(rows)
+
+
+class SyncFeedView(generics.GenericAPIView):
+    """
+    View serving the change feed regional offices sync from.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = SyncFeedSerializer
+    
+    def get(self, request):
+        """
+        Return the records changed or deleted since ``sync_token``.
+        
+        Without a token the feed starts from the beginning. Clients store
+        the returned ``sync_token`` and call again while ``has_more`` is
+        true; ``region_office`` limits the feed to one office.
+        """
+        params = SyncFeedSerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response(
+                params.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            page = SyncFeed.read(
+                params.validated_data.get('sync_token'),
+                region_office=params.validated_data.get('region_office'),
+                limit=params.validated_data.get('limit'),
+                context={'request': request}
+            )
+        except InvalidSyncToken as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(page)
+
+
+class LifecycleReportView(generics.GenericAPIView):
+    """
+    View for time-in-state percentiles of travel documents.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = LifecycleReportSerializer
+    
+    def get(self, request):
+        """Get p50/p90/p99 seconds spent in a status, per region office or officer."""
+        params = LifecycleReportSerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response(
+                params.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        rows = LifecycleReport.time_in_state(
+            params.validated_data['status'],
+            group_by=params.validated_data['group_by'],
+            date_from=params.validated_data.get('date_from'),
+            date_to=params.validated_data.get('date_to')
+        )
+        return Response(rows)
+
+
+class NameSearchView(generics.GenericAPIView):
+    """
+    View for fuzzy name search across documents and form members.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = NameSearchSerializer
+    
+    def get(self, request):
+        """Find people whose names sound like the query."""
+        params = NameSearchSerializer(data={
+            'q': request.query_params.get('q', ''),
+            'entity': request.query_params.getlist('entity'),
+            'limit': request.query_params.get('limit', 20),
+        })
+        if not params.is_valid():
+            return Response(
+                params.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        matches = NameIndex.search(
+            params.validated_data['q'],
+            entities=params.validated_data.get('entity'),
+            limit=params.validated_data['limit']
+        )
+        return Response(NameMatchSerializer(matches, many=True).data)
+
+
+class AutocompleteView(generics.GenericAPIView):
+    """
+    View for typeahead suggestions on names, places and numbers.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = AutocompleteSerializer
+    
+    def get(self, request):
+        """Suggest stored values starting with the typed prefix."""
+        params = AutocompleteSerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response(
+                params.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        suggestions = AutocompleteIndex.suggest(
+            params.validated_data['field'],
+            params.validated_data['q'],
+            limit=params.validated_data['limit']
+        )
+        response = Response(suggestions)
+        response['Cache-Control'] = 'private, max-age=60'
+        return response
+
+
+class PersonLookupView(generics.GenericAPIView):
+    """
+    View for listing every record linked to one identification number.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = PersonRecordSerializer
+    
+    def get(self, request, id_number):
+        """Get the travel documents and form memberships of a person."""
+        records = PersonIndex.lookup(id_number)
+        if not records:
+            return Response(
+                {'error': 'No records found for this identification number'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        return Response({
+            'id_number': PersonIndex.person_key(id_number),
+            'records': PersonRecordSerializer(records, many=True).data,
+        })
+
+
 class DocumentValidationView(generics.CreateAPIView):
     """
     View for validating document data before submission.
@@ -324,3 +780,95 @@ class DocumentValidationView(generics.CreateAPIView):
         
         return Response({'valid': True})
 
+
+class ExportArtifactViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for listing and downloading stored export files.
+    
+    Users see their own files, staff see all of them.
+    """
+    serializer_class = ExportArtifactSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        artifacts = ExportArtifact.objects.filter(expires_at__gt=timezone.now())
+        if not self.request.user.is_staff:
+            artifacts = artifacts.filter(created_by=self.request.user)
+        return artifacts
+    
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Download the export file."""
+        artifact = self.get_object()
+        return FileResponse(
+            artifact.file.open('rb'),
+            as_attachment=True,
+            filename=os.path.basename(artifact.file.name)
+        )
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Render data as a single server-sent event."""
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return f'data: {json.dumps(data)}\n\n'.encode(self.charset)
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for following background jobs.
+    
+    Users see their own jobs, staff see all of them. Clients poll a job's
+    detail or follow its ``events`` stream until it finishes.
+    """
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+    
+    # Seconds between progress checks. A stream holds a worker, so it ends
+    # after events_timeout seconds and the client reconnects after
+    # events_retry milliseconds (EventSource does so on its own)
+    events_poll_interval = 1
+    events_timeout = 10
+    events_retry = 1000
+    
+    def get_queryset(self):
+        jobs = Job.objects.all()
+        if not self.request.user.is_staff:
+            jobs = jobs.filter(created_by=self.request.user)
+        return jobs
+    
+    @action(detail=True, methods=['get'], renderer_classes=[EventStreamRenderer, JSONRenderer])
+    def events(self, request, pk=None):
+        """Stream the job's progress as server-sent events until it finishes."""
+        job = self.get_object()
+        response = StreamingHttpResponse(
+            self.stream_events(job, request.headers.get('Last-Event-ID')),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
+    def stream_events(self, job, last_event_id=None):
+        """
+        Yield an event whenever the job changes, ending with a ``done`` event.
+        
+        Event ids are the job's ``updated_at``, so a reconnecting client
+        that sends ``Last-Event-ID`` is not sent the same state again.
+        """
+        deadline = time.monotonic() + self.events_timeout
+        last_update = last_event_id
+        yield f'retry: {self.events_retry}\n\n'
+        while True:
+            event_id = job.updated_at.isoformat()
+            if event_id != last_update or job.is_finished:
+                last_update = event_id
+                event = 'done' if job.is_finished else 'progress'
+                yield f'id: {event_id}\nevent: {event}\ndata: {json.dumps(JobSerializer(job).data)}\n\n'
+            if job.is_finished or time.monotonic() >= deadline:
+                return
+            time.sleep(self.events_poll_interval)
+            job.refresh_from_db()
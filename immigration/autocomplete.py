@@ -0,0 +1,174 @@
+"""
+Prefix index for typeahead suggestions.
+"""
+import sys
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import TravelDocument, DegmadaForm, KafiilkaForm, AutocompleteTerm
+
+
+# Model -> {autocomplete field: model field}
+AUTOCOMPLETE_SOURCES = {
+    TravelDocument: {
+        'full_name': 'full_name',
+        'sponsor_name': 'sponsor_name',
+        'region': 'region',
+        'district': 'district',
+        'document_number': 'document_number',
+    },
+    DegmadaForm: {
+        'sponsor_name': 'sponsor_name',
+        'company_name': 'company_name',
+        'region': 'gobolka',
+        'district': 'degmada',
+        'reference': 'reference',
+    },
+    KafiilkaForm: {
+        'sponsor_name': 'sponsor_name',
+        'company_name': 'company_name',
+        'region': 'gobolka',
+        'district': 'degmada',
+        'reference': 'reference',
+    },
+}
+
+TERM_LENGTH = 200
+
+
+class AutocompleteIndex:
+    """Maintain and query the autocomplete term table."""
+    
+    @staticmethod
+    def make_term(value):
+        """Return the lower-cased, whitespace-collapsed lookup term."""
+        return ' '.join((value or '').lower().split())[:TERM_LENGTH]
+    
+    @staticmethod
+    def field_values(instance, values=None):
+        """
+        Return (field, value) pairs indexed for an instance.
+        
+        ``values`` may be a dict of stored column values, e.g. the previous
+        state of a record, to read instead of the instance attributes.
+        """
+        pairs = []
+        for field, source in AUTOCOMPLETE_SOURCES.get(type(instance), {}).items():
+            value = values.get(source) if values is not None else getattr(instance, source)
+            value = ' '.join((value or '').split())[:TERM_LENGTH]
+            if value:
+                pairs.append((field, value))
+        return pairs
+    
+    @staticmethod
+    def add(field, value, count=1):
+        """Record ``count`` more uses of a value."""
+        term = AutocompleteIndex.make_term(value)
+        terms = AutocompleteTerm.objects.filter(field=field, term=term)
+        
+        with transaction.atomic():
+            if terms.update(count=F('count') + count, value=value):
+                return
+            try:
+                with transaction.atomic():
+                    AutocompleteTerm.objects.create(
+                        field=field, term=term, value=value, count=count
+                    )
+            except IntegrityError:
+                # Another writer created the term first
+                terms.update(count=F('count') + count, value=value)
+    
+    @staticmethod
+    def discard(field, value):
+        """Record one less use of a value, dropping it when unused."""
+        terms = AutocompleteTerm.objects.filter(
+            field=field, term=AutocompleteIndex.make_term(value)
+        )
+        terms.filter(count__lte=1).delete()
+        terms.update(count=F('count') - 1)
+    
+    @staticmethod
+    def update_instance(instance, previous=None):
+        """Apply the difference between a record's previous and current values."""
+        old = Counter(AutocompleteIndex.field_values(instance, previous) if previous else [])
+        new = Counter(AutocompleteIndex.field_values(instance))
+        
+        for field, value in old - new:
+            AutocompleteIndex.discard(field, value)
+        for field, value in new - old:
+            AutocompleteIndex.add(field, value)
+    
+    @staticmethod
+    def add_instances(instances):
+        """Add the values of newly created records, one update per distinct term."""
+        counts = Counter()
+        values = {}
+        for instance in instances:
+            for field, value in AutocompleteIndex.field_values(instance):
+                key = (field, AutocompleteIndex.make_term(value))
+                counts[key] += 1
+                values[key] = value
+        
+        for key, count in counts.items():
+            AutocompleteIndex.add(key[0], values[key], count)
+    
+    @staticmethod
+    def remove_instance(instance):
+        """Drop the values of a deleted record."""
+        for field, value in AutocompleteIndex.field_values(instance):
+            AutocompleteIndex.discard(field, value)
+    
+    @staticmethod
+    @transaction.atomic
+    def rebuild(batch_size=1000):
+        """Rebuild the term table and return the number of terms."""
+        counts = Counter()
+        values = {}
+        for model, fields in AUTOCOMPLETE_SOURCES.items():
+            rows = model.objects.values_list(*fields.values())
+            for row in rows.iterator(chunk_size=batch_size):
+                for field, value in zip(fields, row):
+                    value = ' '.join((value or '').split())[:TERM_LENGTH]
+                    if value:
+                        key = (field, AutocompleteIndex.make_term(value))
+                        counts[key] += 1
+                        values[key] = value
+        
+        AutocompleteTerm.objects.all().delete()
+        AutocompleteTerm.objects.bulk_create([
+            AutocompleteTerm(field=field, term=term, value=values[field, term], count=count)
+            for (field, term), count in counts.items()
+        ], batch_size=batch_size)
+        return len(counts)
+    
+    @staticmethod
+    def prefix_end(term):
+        """
+        Return the smallest string greater than every string starting with
+        ``term``, or None if there is none.
+        """
+        term = term.rstrip(chr(sys.maxunicode))
+        if not term:
+            return None
+        return term[:-1] + chr(ord(term[-1]) + 1)
+    
+    @staticmethod
+    def suggest(field, prefix, limit=8):
+        """
+        Return up to ``limit`` values of a field starting with ``prefix``.
+        
+        Matching terms are read with a range scan on the (field, term) index,
+        so a lookup only touches the terms sharing the prefix, and the most
+        used ones are returned first.
+        """
+        term = AutocompleteIndex.make_term(prefix)
+        if not term:
+            return []
+        
+        terms = AutocompleteTerm.objects.filter(field=field, term__gte=term)
+        end = AutocompleteIndex.prefix_end(term)
+        if end is not None:
+            terms = terms.filter(term__lt=end)
+        return list(terms.order_by('-count', 'term').values_list('value', flat=True)[:limit])
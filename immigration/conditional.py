@@ -0,0 +1,145 @@
+"""
+Conditional GET support (ETag / Last-Modified) for API and HTML views.
+"""
+import hashlib
+from calendar import timegm
+
+from django.db.models import Max, Sum
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    """Build a strong, quoted ETag from the parts that identify a representation."""
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f'"{digest}"'
+
+
+def timestamp(value):
+    """Convert a datetime to the integer timestamp used by Last-Modified."""
+    return timegm(value.utctimetuple()) if value else None
+
+
+def queryset_fingerprint(queryset):
+    """
+    Summarize a queryset, or a slice of one, in one aggregate query.
+    
+    The id sum changes when rows are added or removed and the latest
+    ``updated_at`` when one is updated (nested rows touch their parent).
+    """
+    if not queryset.query.is_sliced:
+        queryset = queryset.order_by()
+    summary = queryset.aggregate(ids=Sum('id'), latest=Max('updated_at'))
+    latest = summary['latest'].isoformat() if summary['latest'] else ''
+    return f"{summary['ids'] or 0}:{latest}"
+
+
+class NotModified(Exception):
+    """Raised to end a request early with a 304 response."""
+    
+    def __init__(self, response):
+        super().__init__('Not modified')
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """
+    Answer unchanged GETs with 304 before the viewset serializes anything.
+    
+    Detail validators come from the record's ``updated_at``; list pages use
+    an aggregate fingerprint of the filtered queryset, or of the rows in the
+    window of a cursor page. Both vary with the URL (page, ``?fields=``,
+    filters) and the response format. List pages only get an ETag: a
+    deletion does not move Last-Modified.
+    """
+    conditional_actions = ('list', 'retrieve')
+    conditional_validators = None
+    
+    def get_conditional_queryset(self):
+        """Return the queryset a list action would serialize."""
+        return self.filter_queryset(self.get_queryset())
+    
+    def get_validators(self, request):
+        """Return (etag, last_modified) for this request, or None."""
+        variant = (request.build_absolute_uri(), request.accepted_renderer.format)
+        label = self.get_queryset().model._meta.label
+        
+        if self.detail:
+            lookup = self.lookup_url_kwarg or self.lookup_field
+            updated_at = self.get_queryset().filter(
+                **{self.lookup_field: self.kwargs[lookup]}
+            ).values_list('updated_at', flat=True).first()
+            if updated_at is None:
+                return None
+            etag = make_etag(label, self.kwargs[lookup], updated_at.isoformat(), *variant)
+            return etag, timestamp(updated_at)
+        
+        queryset = self.get_conditional_queryset()
+        if getattr(self.paginator, 'use_cursor', None) and self.paginator.use_cursor(request):
+            # Cursor pages only depend on the rows in their window
+            queryset = self.paginator.cursor_window(queryset, request)
+        return make_etag(label, queryset_fingerprint(queryset), *variant), None
+    
+    def not_modified(self, request):
+        """Return a 304 response if the client's copy is current, else None."""
+        self.conditional_validators = None
+        if request.method not in ('GET', 'HEAD') or self.action not in self.conditional_actions:
+            return None
+        
+        self.conditional_validators = self.get_validators(request)
+        if self.conditional_validators is None:
+            return None
+        etag, last_modified = self.conditional_validators
+        return get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+    
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Runs after authentication and permission checks
+        response = self.not_modified(request)
+        if response is not None:
+            raise NotModified(response)
+    
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+    
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.conditional_validators is not None and response.status_code in (200, 304):
+            etag, last_modified = self.conditional_validators
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            # Clients must revalidate, and shared caches must not store records
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class RecordValidators:
+    """
+    ETag and Last-Modified functions for ``django.views.decorators.http.condition``.
+    
+    The record's ``updated_at`` is read once per request. The ETag also
+    covers the user, since HTML pages show who is logged in.
+    """
+    
+    def __init__(self, model):
+        self.model = model
+    
+    def updated_at(self, request, pk):
+        cache = request.__dict__.setdefault('_record_updated_at', {})
+        if pk not in cache:
+            cache[pk] = self.model.objects.filter(pk=pk).values_list(
+                'updated_at', flat=True
+            ).first()
+        return cache[pk]
+    
+    def etag(self, request, pk):
+        updated_at = self.updated_at(request, pk)
+        if updated_at is None:
+            return None
+        return make_etag(self.model._meta.label, pk, updated_at.isoformat(), request.user.pk)
+    
+    def last_modified(self, request, pk):
+        return self.updated_at(request, pk)
@@ -11,6 +11,7 @@ from .models import (
     KafiilkaForm, KafiilkaFormMember
 )
 from .utils import DocumentValidator, ReportGenerator
+from .search import get_search_backend
 
 
 class TravelDocumentChildInline(admin.TabularInline):
@@ -40,9 +41,10 @@ class TravelDocumentAdmin(admin.ModelAdmin):
         'status_color', 'actions'
     )
     list_filter = ('status', 'region', 'district', 'created_at', 'date')
+    # Searches go through the full-text index, see get_search_results
     search_fields = (
-        'document_number', 'full_name', 'identification_number',
-        'phone_number', 'sponsor_name'
+        'document_number', 'full_name', 'mother_name', 'identification_number',
+        'phone_number', 'sponsor_name', 'region', 'district'
     )
     readonly_fields = (
         'document_number', 'created_at', 'updated_at',
@@ -125,9 +127,15 @@ class TravelDocumentAdmin(admin.ModelAdmin):
         )
     actions.short_description = 'Actions'
     
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return get_search_backend().search(queryset, search_term), False
+    
     def save_model(self, request, obj, form, change):
         if not change:
             obj.created_by = request.user
+        obj._status_changed_by = request.user
         super().save_model(request, obj, form, change)
 
 
@@ -0,0 +1,185 @@
+"""
+Store of generated export files, reused while their data is unchanged.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ExportArtifact, Job
+from .conditional import queryset_fingerprint
+
+
+class ExportArtifacts:
+    """
+    Find, build and expire export artifacts.
+    
+    An export is identified by its canonical parameters. Its fingerprint
+    adds the id sum and latest ``updated_at`` of the records it reads
+    (children and members move their parent's ``updated_at``), so any
+    insert, update or delete produces a new fingerprint and a fresh file.
+    Artifacts expire after EXPORT_ARTIFACT_TTL seconds, and an export's
+    older artifacts are removed when a newer one is stored. Artifacts
+    belong to the user who requested them and are only reused for that
+    user.
+    """
+    
+    @staticmethod
+    def ttl():
+        return getattr(settings, 'EXPORT_ARTIFACT_TTL', 86400)
+    
+    @staticmethod
+    def canonical_params(data):
+        """Return the export parameters that affect the file's content."""
+        params = {key: value for key, value in data.items() if key not in ('background', 'fingerprint')}
+        if params.get('format') != 'excel':
+            params.pop('sheets', None)
+        if params.get('format') not in ('csv', 'csv_gz'):
+            params.pop('columns', None)
+        return params
+    
+    @staticmethod
+    def owner(user):
+        """Return the user an artifact is stored for, or None."""
+        return user if getattr(user, 'pk', None) else None
+    
+    @staticmethod
+    def params_hash(params, user=None):
+        owner = ExportArtifacts.owner(user)
+        return hashlib.sha256(json.dumps(
+            {'params': params, 'owner': owner.pk if owner else None},
+            sort_keys=True, separators=(',', ':')
+        ).encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def fingerprint(params, user=None):
+        """Hash the parameters together with the state of the rows they match."""
+        from .services import TravelDocumentService, ExportService
+        
+        filters = ExportArtifacts.validated_filters(params)
+        documents = TravelDocumentService.search_documents(filters.get('query'), filters)
+        
+        versions = [queryset_fingerprint(documents)]
+        if params.get('format') == 'excel':
+            # Form sheets, and the forms whose members are exported
+            sheets = {
+                sheet.replace('_members', '_forms')
+                for sheet in params.get('sheets') or []
+                if sheet.startswith(('degmada_', 'kafiilka_'))
+            }
+            versions.extend(
+                queryset_fingerprint(queryset)
+                for sheet, queryset in ExportService.excel_querysets(documents, filters, sorted(sheets))
+            )
+        
+        return hashlib.sha256(
+            '|'.join([ExportArtifacts.params_hash(params, user)] + versions).encode('utf-8')
+        ).hexdigest()
+    
+    @staticmethod
+    def find(fingerprint):
+        """Return the unexpired artifact with this fingerprint, or None."""
+        return ExportArtifact.objects.filter(
+            fingerprint=fingerprint, expires_at__gt=timezone.now()
+        ).first()
+    
+    @staticmethod
+    def request(data, user=None):
+        """
+        Return ``(artifact, job)`` for an export request.
+        
+        A current artifact is returned as is. Otherwise the user's pending
+        job for the same export is reused, or a new job is queued.
+        """
+        from .jobs import JobQueue
+        
+        params = ExportArtifacts.canonical_params(data)
+        fingerprint = ExportArtifacts.fingerprint(params, user)
+        artifact = ExportArtifacts.find(fingerprint)
+        if artifact is not None:
+            return artifact, None
+        
+        job = Job.objects.filter(
+            kind='export',
+            status__in=('queued', 'running'),
+            created_by=ExportArtifacts.owner(user),
+            params__fingerprint=fingerprint
+        ).first()
+        if job is None:
+            job = JobQueue.enqueue('export', {**params, 'fingerprint': fingerprint}, user)
+        return None, job
+    
+    @staticmethod
+    def build(params, user=None, progress=None):
+        """Return a current artifact for the parameters, generating the file if needed."""
+        from .services import ExportService
+        
+        params = ExportArtifacts.canonical_params(params)
+        # Taken before the file is written: changes made meanwhile give a
+        # newer fingerprint, so the file is never served as more recent
+        fingerprint = ExportArtifacts.fingerprint(params, user)
+        artifact = ExportArtifacts.find(fingerprint)
+        if artifact is not None:
+            return artifact
+        
+        name = ExportService.export_to_storage(
+            params.get('format', 'excel'),
+            ExportArtifacts.validated_filters(params),
+            f'exports/travel_documents_{fingerprint[:16]}',
+            columns=params.get('columns'),
+            sheets=params.get('sheets'),
+            progress=progress
+        )
+        return ExportArtifacts.store(fingerprint, params, name, user)
+    
+    @staticmethod
+    def validated_filters(params):
+        """Validate export parameters and return their search filters."""
+        from .serializers import ExportRequestSerializer
+        
+        serializer = ExportRequestSerializer(data=params)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data.get('filters', {})
+    
+    @staticmethod
+    @transaction.atomic
+    def store(fingerprint, params, name, user=None):
+        """Record a generated file and remove the export's older artifacts."""
+        from django.core.files.storage import default_storage
+        
+        params_hash = ExportArtifacts.params_hash(params, user)
+        # Includes an expired artifact with the same fingerprint
+        ExportArtifacts.delete(
+            ExportArtifact.objects.filter(Q(params_hash=params_hash) | Q(fingerprint=fingerprint))
+        )
+        return ExportArtifact.objects.create(
+            fingerprint=fingerprint,
+            params_hash=params_hash,
+            format=params.get('format', 'excel'),
+            params=params,
+            file=name,
+            size=default_storage.size(name),
+            created_by=ExportArtifacts.owner(user),
+            expires_at=timezone.now() + timedelta(seconds=ExportArtifacts.ttl())
+        )
+    
+    @staticmethod
+    def delete(artifacts):
+        """Delete artifacts and their files; return how many were deleted."""
+        count = 0
+        for artifact in artifacts:
+            artifact.file.delete(save=False)
+            artifact.delete()
+            count += 1
+        return count
+    
+    @staticmethod
+    def purge_expired():
+        """Delete expired artifacts and their files."""
+        return ExportArtifacts.delete(
+            ExportArtifact.objects.filter(expires_at__lte=timezone.now())
+        )
@@ -0,0 +1,214 @@
+"""
+Read-only fast path for serializing API list responses.
+"""
+from collections import defaultdict
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.fields import empty
+
+
+class FastSerializer:
+    """
+    Serialize rows read with ``values_list`` instead of model instances.
+    
+    The fields of a ModelSerializer are compiled into a plan of columns and
+    converters that reproduce what each DRF field outputs, so the result is
+    identical to ``serializer.data`` for the same rows. Nested reverse
+    foreign key serializers (e.g. children) are loaded with one query per
+    batch and grouped by parent. When a field cannot be compiled, ``plan``
+    is None and callers should use the regular serializer instead.
+    """
+    
+    def __init__(self, serializer, columns=()):
+        self.serializer = serializer
+        self.model = serializer.Meta.model
+        self.columns = [self.model._meta.pk.attname]
+        for column in columns:
+            self._column(column)
+        self.plan = self._compile()
+    
+    @property
+    def supported(self):
+        return self.plan is not None
+    
+    def rows(self, queryset):
+        """Turn a model queryset into a queryset of named row tuples."""
+        return queryset.prefetch_related(None).values_list(*self.columns, named=True)
+    
+    def rows_for_ids(self, ids):
+        """Load the rows for a list of primary keys, keeping their order."""
+        rows = {
+            row[0]: row
+            for row in self.model._default_manager.filter(pk__in=ids).values_list(*self.columns)
+        }
+        return [rows[pk] for pk in ids if pk in rows]
+    
+    def serialize(self, rows):
+        """Return the serialized data for a list of rows."""
+        rows = list(rows)
+        nested = self._load_nested([row[0] for row in rows])
+        return [self._represent(row, nested) for row in rows]
+    
+    def _represent(self, row, nested):
+        data = {}
+        for name, index, convert, guard in self.plan:
+            if index is None:
+                data[name] = nested[name].get(row[0], [])
+                continue
+            if guard is not None and row[guard] is None:
+                # DRF skips a dotted source whose relation is missing
+                continue
+            
+            value = row[index]
+            if value is None:
+                data[name] = None
+            elif convert is None:
+                data[name] = value
+            else:
+                data[name] = convert(value)
+        return data
+    
+    def _load_nested(self, ids):
+        """Load and group the nested rows of every parent in ``ids``."""
+        nested = {}
+        for name, child, foreign_key in self.nested:
+            grouped = defaultdict(list)
+            if ids:
+                rows = list(child.model._default_manager.filter(
+                    **{f'{foreign_key}__in': ids}
+                ).values_list(*child.columns))
+                position = child.columns.index(foreign_key)
+                for row, data in zip(rows, child.serialize(rows)):
+                    grouped[row[position]].append(data)
+            nested[name] = grouped
+        return nested
+    
+    def _column(self, column):
+        """Add a column to the values_list and return its position."""
+        if column not in self.columns:
+            self.columns.append(column)
+        return self.columns.index(column)
+    
+    def _compile(self):
+        """Build the (name, index, convert, guard) plan, or None if unsupported."""
+        plan = []
+        self.nested = []
+        
+        for name, field in self.serializer.fields.items():
+            if field.write_only:
+                continue
+            
+            if isinstance(field, serializers.ListSerializer):
+                nested = self._compile_nested(field)
+                if nested is None:
+                    return None
+                self.nested.append((name, *nested))
+                plan.append((name, None, None, None))
+                continue
+            
+            entry = self._compile_field(field)
+            if entry is None:
+                return None
+            plan.append((name, *entry))
+        return plan
+    
+    def _compile_nested(self, field):
+        """Compile a ``many=True`` serializer over a reverse foreign key."""
+        try:
+            relation = self.model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+        if not relation.one_to_many or not isinstance(field.child, serializers.ModelSerializer):
+            return None
+        
+        foreign_key = relation.field.attname
+        child = FastSerializer(field.child, columns=(foreign_key,))
+        if not child.supported:
+            return None
+        return child, foreign_key
+    
+    def _compile_field(self, field):
+        """Return the (index, convert, guard) of a plain field, or None."""
+        source = field.source
+        if source == '*' or isinstance(field, serializers.BaseSerializer):
+            return None
+        
+        if source.startswith('get_') and source.endswith('_display'):
+            return self._compile_display(source[4:-len('_display')])
+        
+        guard = None
+        if '.' in source:
+            relation_name, attribute = source.split('.', 1)
+            relation = self._model_field(relation_name)
+            if relation is None or not relation.many_to_one or '.' in attribute:
+                return None
+            
+            # A missing relation makes DRF use the default, None or skip the field
+            if field.default is not empty:
+                return None
+            if not field.allow_null:
+                if field.required:
+                    return None
+                guard = self._column(relation.attname)
+            source = f'{relation_name}__{attribute}'
+        else:
+            model_field = self._model_field(source)
+            if model_field is None or not model_field.concrete:
+                return None
+        
+        convert = self._converter(field)
+        if convert is False:
+            return None
+        return self._column(source), convert, guard
+    
+    def _compile_display(self, source):
+        """Compile a ``get_<field>_display`` source."""
+        model_field = self._model_field(source)
+        if model_field is None or not model_field.choices:
+            return None
+        
+        labels = {value: str(label) for value, label in model_field.flatchoices}
+        return self._column(source), lambda value: str(labels.get(value, value)), None
+    
+    def _converter(self, field):
+        """
+        Return the function turning a column value into the field's output.
+        
+        None means the value is used as-is and False that the field is not
+        supported.
+        """
+        if isinstance(field, serializers.FileField):
+            return self._file_converter(field)
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            return None if field.pk_field is None else False
+        if isinstance(field, serializers.RelatedField):
+            return False
+        if type(field) in (serializers.CharField, serializers.BooleanField):
+            return None
+        return field.to_representation
+    
+    def _file_converter(self, field):
+        if not getattr(field, 'use_url', True):
+            return lambda name: name or None
+        
+        model_field = self._model_field(field.source)
+        if model_field is None:
+            return False
+        storage = model_field.storage
+        request = field.context.get('request')
+        
+        def convert(name):
+            if not name:
+                return None
+            url = storage.url(name)
+            if request is not None:
+                return request.build_absolute_uri(url)
+            return url
+        return convert
+    
+    def _model_field(self, name):
+        try:
+            return self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
@@ -4,6 +4,9 @@ Custom filters for the immigration application.
 import django_filters
 from django.db.models import Q
 from .models import TravelDocument, DegmadaForm, KafiilkaForm
+from .search import get_search_backend
+from .names import NameIndex
+from .utils import DocumentValidator, DataProcessor
 
 
 class TravelDocumentFilter(django_filters.FilterSet):
@@ -11,8 +14,12 @@ class TravelDocumentFilter(django_filters.FilterSet):
     
     document_number = django_filters.CharFilter(lookup_expr='icontains')
     full_name = django_filters.CharFilter(lookup_expr='icontains')
-    identification_number = django_filters.CharFilter(lookup_expr='icontains')
-    phone_number = django_filters.CharFilter(lookup_expr='icontains')
+    identification_number = django_filters.CharFilter(method='filter_identification_number')
+    identification_number_contains = django_filters.CharFilter(
+        field_name='identification_number',
+        lookup_expr='icontains'
+    )
+    phone_number = django_filters.CharFilter(method='filter_phone_number')
     
     region = django_filters.CharFilter(lookup_expr='iexact')
     district = django_filters.CharFilter(lookup_expr='iexact')
@@ -49,33 +56,55 @@ class TravelDocumentFilter(django_filters.FilterSet):
     has_other_documents = django_filters.BooleanFilter()
     
     search = django_filters.CharFilter(method='filter_search')
+    fuzzy_name = django_filters.CharFilter(method='filter_fuzzy_name')
     
     class Meta:
         model = TravelDocument
         fields = [
             'document_number', 'full_name', 'identification_number',
-            'phone_number', 'region', 'district', 'status',
+            'identification_number_contains', 'phone_number',
+            'region', 'district', 'status',
             'date_from', 'date_to', 'created_from', 'created_to',
             'filled_from', 'filled_to', 'has_notayo', 'has_sponsor_id',
             'has_damaged_id', 'has_company_license', 'has_other_documents',
-            'search'
+            'search', 'fuzzy_name'
         ]
     
-    def filter_search(self, queryset, name, value):
-        """Search across multiple fields."""
+    def filter_phone_number(self, queryset, name, value):
+        """Exact match on the normalized phone when a full number is given."""
+        if not value:
+            return queryset
+        
+        if DocumentValidator.validate_phone_number(DataProcessor.clean_phone_number(value)):
+            return queryset.filter(
+                phone_number_normalized=DataProcessor.normalize_phone_number(value)
+            )
+        return queryset.filter(phone_number__icontains=value)
+    
+    def filter_identification_number(self, queryset, name, value):
+        """Exact match on the normalized identification number."""
         if not value:
             return queryset
         
         return queryset.filter(
-            Q(full_name__icontains=value) |
-            Q(document_number__icontains=value) |
-            Q(identification_number__icontains=value) |
-            Q(phone_number__icontains=value) |
-            Q(sponsor_name__icontains=value) |
-            Q(region__icontains=value) |
-            Q(district__icontains=value)
+            identification_number_normalized=DataProcessor.normalize_identification_number(value)
         )
     
+    def filter_search(self, queryset, name, value):
+        """Search across multiple fields using the full-text index."""
+        if not value:
+            return queryset
+        
+        return get_search_backend().search(queryset, value)
+    
+    def filter_fuzzy_name(self, queryset, name, value):
+        """Match full names that sound alike (Maxamed/Mohamed/Muhammad)."""
+        if not value:
+            return queryset
+        
+        matches = NameIndex.search(value, entities=['traveldocument'], limit=100)
+        return queryset.filter(id__in=[match['object_id'] for match in matches])
+    
     order_by = django_filters.OrderingFilter(
         fields=(
             ('created_at', 'created_at'),
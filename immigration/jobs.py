@@ -0,0 +1,246 @@
+"""
+Database-backed job queue for long-running operations.
+"""
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Job kind -> handler(job, progress) returning a JSON-serializable result
+JOB_HANDLERS = {}
+
+
+def job_handler(kind):
+    """Register a function as the handler of a job kind."""
+    def register(function):
+        JOB_HANDLERS[kind] = function
+        return function
+    return register
+
+
+class JobError(Exception):
+    """A job failure that retrying will not fix."""
+
+
+class JobProgress:
+    """
+    Progress callback handed to job handlers.
+    
+    ``progress(done, total)`` stores the percentage when it changes; each
+    store also refreshes the job's lock so a busy job is not taken over.
+    """
+    
+    def __init__(self, job):
+        self.job = job
+        self.percent = job.progress
+    
+    def __call__(self, done, total):
+        # 100 is only reported once the result is stored
+        percent = min(int(done * 100 / total), 99) if total else 0
+        if percent <= self.percent:
+            return
+        
+        self.percent = percent
+        now = timezone.now()
+        Job.objects.filter(pk=self.job.pk, locked_by=self.job.locked_by).update(
+            progress=percent, locked_at=now, updated_at=now
+        )
+
+
+class JobQueue:
+    """Enqueue, claim and run jobs."""
+    
+    @staticmethod
+    def max_attempts():
+        return getattr(settings, 'JOB_MAX_ATTEMPTS', 3)
+    
+    @staticmethod
+    def retry_delay():
+        return getattr(settings, 'JOB_RETRY_DELAY', 30)
+    
+    @staticmethod
+    def lock_timeout():
+        return getattr(settings, 'JOB_LOCK_TIMEOUT', 3600)
+    
+    @staticmethod
+    def enqueue(kind, params=None, user=None):
+        """Queue a job and return it."""
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f'Unknown job kind: {kind}')
+        
+        return Job.objects.create(
+            kind=kind,
+            params=params or {},
+            created_by=user if getattr(user, 'pk', None) else None,
+            max_attempts=JobQueue.max_attempts()
+        )
+    
+    @staticmethod
+    def claim(worker_id, kinds=None):
+        """
+        Take the next due job for a worker, or return None.
+        
+        A job is claimed with a conditional UPDATE, so concurrent workers
+        never run the same job. Running jobs whose lock is older than the
+        lock timeout (their worker died) are claimed again.
+        """
+        now = timezone.now()
+        claimable = Q(status='queued', run_after__lte=now) | Q(
+            status='running', locked_at__lt=now - timedelta(seconds=JobQueue.lock_timeout())
+        )
+        candidates = Job.objects.filter(claimable)
+        if kinds:
+            candidates = candidates.filter(kind__in=kinds)
+        
+        for job_id in candidates.order_by('run_after', 'id').values_list('id', flat=True)[:10]:
+            claimed = Job.objects.filter(claimable, pk=job_id).update(
+                status='running',
+                locked_by=worker_id,
+                locked_at=now,
+                attempts=F('attempts') + 1,
+                updated_at=now
+            )
+            if claimed:
+                return Job.objects.get(pk=job_id)
+        return None
+    
+    @staticmethod
+    def run(job):
+        """Run a claimed job and store its result or failure."""
+        try:
+            if job.attempts > job.max_attempts:
+                raise JobError('The worker running this job stopped responding')
+            handler = JOB_HANDLERS.get(job.kind)
+            if handler is None:
+                raise JobError(f'Unknown job kind: {job.kind}')
+            result = handler(job, JobProgress(job))
+        except Exception as exc:
+            logger.exception('Job %s (%s) failed', job.pk, job.kind)
+            JobQueue._fail(job, exc)
+        else:
+            now = timezone.now()
+            Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+                status='succeeded',
+                progress=100,
+                result=result,
+                error='',
+                locked_at=None,
+                finished_at=now,
+                updated_at=now
+            )
+        job.refresh_from_db()
+        return job
+    
+    @staticmethod
+    def _fail(job, exc):
+        """Schedule a retry with exponential backoff, or fail for good."""
+        now = timezone.now()
+        jobs = Job.objects.filter(pk=job.pk, locked_by=job.locked_by)
+        
+        if isinstance(exc, JobError) or job.attempts >= job.max_attempts:
+            jobs.update(
+                status='failed', error=str(exc), locked_at=None,
+                finished_at=now, updated_at=now
+            )
+        else:
+            delay = JobQueue.retry_delay() * 2 ** (job.attempts - 1)
+            jobs.update(
+                status='queued', error=str(exc), locked_at=None,
+                run_after=now + timedelta(seconds=delay), updated_at=now
+            )
+    
+    @staticmethod
+    def worker_id(index=0):
+        """Name a worker thread after its host, process and index."""
+        return f'{socket.gethostname()}:{os.getpid()}:{index}'
+    
+    @staticmethod
+    def work(worker_id, kinds=None, once=False, poll_interval=2, stop=None):
+        """
+        Run jobs until ``stop`` is set, or until the queue is empty if ``once``.
+        
+        Returns the number of jobs run.
+        """
+        stop = stop or threading.Event()
+        count = 0
+        try:
+            while not stop.is_set():
+                job = JobQueue.claim(worker_id, kinds)
+                if job is None:
+                    if once:
+                        break
+                    stop.wait(poll_interval)
+                    continue
+                JobQueue.run(job)
+                count += 1
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connection.close()
+        return count
+
+
+@job_handler('bulk_operation')
+def run_bulk_operation(job, progress):
+    """Apply a bulk operation to a list of documents."""
+    from .services import TravelDocumentService
+    
+    results = TravelDocumentService.bulk_operation(
+        job.params['document_ids'],
+        job.params['operation'],
+        job.created_by,
+        progress=progress
+    )
+    return {'results': results}
+
+
+@job_handler('export')
+def run_export(job, progress):
+    """Build an export artifact, or reuse a current one."""
+    from django.urls import reverse
+    from rest_framework.exceptions import ValidationError
+    from .exports import ExportArtifacts
+    
+    try:
+        artifact = ExportArtifacts.build(job.params, job.created_by, progress=progress)
+    except (ValidationError, ValueError) as exc:
+        raise JobError(f'Invalid export parameters: {exc}')
+    ExportArtifacts.purge_expired()
+    return {
+        'artifact': artifact.pk,
+        'file': artifact.file.name,
+        'url': reverse('exportartifact-download', args=[artifact.pk]),
+    }
+
+
+@job_handler('print_batch')
+def run_print_batch(job, progress):
+    """Render a batch of documents into one PDF artifact."""
+    from django.urls import reverse
+    from .exports import ExportArtifacts
+    from .pdf import PDFRenderer, PDFUnavailable
+    
+    try:
+        artifact = PDFRenderer.build_batch(
+            job.params['document_ids'],
+            job.params.get('layout', 'document'),
+            job.created_by,
+            progress=progress
+        )
+    except PDFUnavailable as exc:
+        raise JobError(str(exc))
+    ExportArtifacts.purge_expired()
+    return {
+        'artifact': artifact.pk,
+        'file': artifact.file.name,
+        'url': reverse('exportartifact-download', args=[artifact.pk]),
+    }
@@ -0,0 +1,217 @@
+"""
+Travel document lifecycle tracking and time-in-state reporting.
+"""
+import math
+from collections import Counter, defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max, Sum
+from django.utils import timezone
+
+from .models import StatusTransition, TransitionHistogram
+
+
+# Histogram bucket width: each bucket spans a factor of BUCKET_BASE, so
+# reported percentiles are within about 5% of the exact value
+BUCKET_BASE = 1.1
+
+REPORT_GROUPS = ['region_office', 'officer']
+
+
+class LifecycleTracker:
+    """Record status transitions and maintain the time-in-state histograms."""
+    
+    @staticmethod
+    def bucket(seconds):
+        """Return the histogram bucket of a duration."""
+        if seconds < 1:
+            return 0
+        return 1 + int(math.log(seconds, BUCKET_BASE))
+    
+    @staticmethod
+    def bucket_value(bucket):
+        """Return the representative duration (geometric midpoint) of a bucket."""
+        if bucket <= 0:
+            return 0.5
+        return BUCKET_BASE ** (bucket - 0.5)
+    
+    @staticmethod
+    def state_entered_at(document):
+        """Return when a document entered its current status."""
+        last = StatusTransition.objects.filter(document_id=document.pk).order_by(
+            '-occurred_at'
+        ).values_list('occurred_at', flat=True).first()
+        return last or document.created_at
+    
+    @staticmethod
+    @transaction.atomic
+    def record_transition(document, old_status, new_status, officer=None, occurred_at=None):
+        """Store a status change and add its duration to the histograms."""
+        occurred_at = occurred_at or timezone.now()
+        entered_at = LifecycleTracker.state_entered_at(document)
+        seconds = None
+        if entered_at and old_status:
+            seconds = max((occurred_at - entered_at).total_seconds(), 0)
+        
+        transition = StatusTransition.objects.create(
+            document=document,
+            from_status=old_status or '',
+            to_status=new_status or '',
+            region_office=document.region_office or '',
+            officer=officer if getattr(officer, 'pk', None) else None,
+            occurred_at=occurred_at,
+            seconds_in_state=seconds
+        )
+        if seconds is not None:
+            LifecycleTracker.apply({LifecycleTracker.histogram_key(transition): 1})
+        return transition
+    
+    @staticmethod
+    @transaction.atomic
+    def record_transitions(rows, new_status, officer=None, occurred_at=None):
+        """
+        Store the status changes of documents updated in bulk.
+        
+        ``rows`` are dicts with the id, previous status, region_office and
+        created_at of each document. State entry times are read with one
+        query and the transitions are inserted with ``bulk_create``.
+        """
+        occurred_at = occurred_at or timezone.now()
+        officer = officer if getattr(officer, 'pk', None) else None
+        last_transitions = dict(StatusTransition.objects.filter(
+            document_id__in=[row['id'] for row in rows]
+        ).values_list('document_id').annotate(last=Max('occurred_at')).order_by())
+        
+        transitions = []
+        for row in rows:
+            entered_at = last_transitions.get(row['id']) or row['created_at']
+            seconds = None
+            if entered_at and row['status']:
+                seconds = max((occurred_at - entered_at).total_seconds(), 0)
+            transitions.append(StatusTransition(
+                document_id=row['id'],
+                from_status=row['status'] or '',
+                to_status=new_status or '',
+                region_office=row['region_office'] or '',
+                officer=officer,
+                occurred_at=occurred_at,
+                seconds_in_state=seconds
+            ))
+        StatusTransition.objects.bulk_create(transitions)
+        
+        LifecycleTracker.apply(Counter(
+            LifecycleTracker.histogram_key(transition)
+            for transition in transitions
+            if transition.seconds_in_state is not None
+        ))
+        return transitions
+    
+    @staticmethod
+    def histogram_key(transition):
+        """Return the histogram cell of a transition."""
+        return (
+            timezone.localdate(transition.occurred_at),
+            transition.from_status,
+            transition.region_office,
+            transition.officer_id or 0,
+            LifecycleTracker.bucket(transition.seconds_in_state),
+        )
+    
+    @staticmethod
+    @transaction.atomic
+    def apply(deltas):
+        """Add a {histogram key: delta} mapping to the stored histograms."""
+        fields = ['day', 'status', 'region_office', 'officer_id', 'bucket']
+        for key, delta in deltas.items():
+            cells = TransitionHistogram.objects.filter(**dict(zip(fields, key)))
+            if cells.update(count=F('count') + delta):
+                continue
+            try:
+                with transaction.atomic():
+                    TransitionHistogram.objects.create(count=delta, **dict(zip(fields, key)))
+            except IntegrityError:
+                # Another writer created the cell first
+                cells.update(count=F('count') + delta)
+    
+    @staticmethod
+    @transaction.atomic
+    def rebuild(batch_size=1000):
+        """Rebuild the histograms from the stored transitions."""
+        counts = Counter()
+        transitions = StatusTransition.objects.exclude(seconds_in_state=None).only(
+            'occurred_at', 'from_status', 'region_office', 'officer_id', 'seconds_in_state'
+        )
+        for transition in transitions.iterator(chunk_size=batch_size):
+            counts[LifecycleTracker.histogram_key(transition)] += 1
+        
+        fields = ['day', 'status', 'region_office', 'officer_id', 'bucket']
+        TransitionHistogram.objects.all().delete()
+        TransitionHistogram.objects.bulk_create([
+            TransitionHistogram(count=count, **dict(zip(fields, key)))
+            for key, count in counts.items()
+        ], batch_size=batch_size)
+        return len(counts)
+
+
+class LifecycleReport:
+    """Compute time-in-state percentiles from the histograms."""
+    
+    @staticmethod
+    def percentile(buckets, fraction):
+        """Return the duration below which ``fraction`` of the counts fall."""
+        total = sum(buckets.values())
+        if not total:
+            return None
+        
+        threshold = fraction * total
+        seen = 0
+        for bucket in sorted(buckets):
+            seen += buckets[bucket]
+            if seen >= threshold:
+                return round(LifecycleTracker.bucket_value(bucket), 1)
+        return None
+    
+    @staticmethod
+    def time_in_state(status, group_by='region_office', date_from=None, date_to=None,
+                      percentiles=(50, 90, 99)):
+        """
+        Report p50/p90/p99 time (in seconds) spent in a status.
+        
+        Results are grouped per region office or per officer, over the
+        transitions that left the status between the two dates (inclusive).
+        """
+        group_field = 'officer_id' if group_by == 'officer' else 'region_office'
+        
+        cells = TransitionHistogram.objects.filter(status=status)
+        if date_from:
+            cells = cells.filter(day__gte=date_from)
+        if date_to:
+            cells = cells.filter(day__lte=date_to)
+        
+        histograms = defaultdict(dict)
+        for group, bucket, count in cells.values_list(group_field, 'bucket').annotate(
+            total=Sum('count')
+        ).order_by():
+            histograms[group][bucket] = count
+        
+        officers = {}
+        if group_by == 'officer':
+            officers = dict(
+                get_user_model().objects.filter(id__in=histograms).values_list('id', 'username')
+            )
+        
+        rows = []
+        for group, buckets in histograms.items():
+            row = {'count': sum(buckets.values())}
+            if group_by == 'officer':
+                row['officer'] = group or None
+                row['officer_username'] = officers.get(group, '')
+            else:
+                row['region_office'] = group
+            for value in percentiles:
+                row[f'p{value}'] = LifecycleReport.percentile(buckets, value / 100)
+            rows.append(row)
+        
+        rows.sort(key=lambda row: -row['count'])
+        return rows
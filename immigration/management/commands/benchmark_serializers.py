@@ -0,0 +1,85 @@
+"""
+Management command to compare the regular and fast list serializers.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Time the travel document list serializer against the fast path'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=500,
+            help='Number of documents serialized per run (default: 500)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Number of timed runs; the best one is reported (default: 5)'
+        )
+        parser.add_argument(
+            '--fields',
+            default='',
+            help='Comma-separated ?fields= value to benchmark a sparse fieldset'
+        )
+    
+    def handle(self, *args, **options):
+        from rest_framework.renderers import JSONRenderer
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory
+        from immigration.fast_serializers import FastSerializer
+        from immigration.models import TravelDocument
+        from immigration.serializers import TravelDocumentSerializer
+        
+        params = {'fields': options['fields']} if options['fields'] else {}
+        request = Request(APIRequestFactory().get('/api/travel-documents/', params))
+        queryset = TravelDocument.objects.order_by('-created_at')[:options['limit']]
+        renderer = JSONRenderer()
+        
+        def regular():
+            serializer = TravelDocumentSerializer(context={'request': request})
+            plan = serializer.get_query_plan()
+            documents = queryset.select_related(
+                *plan['select_related']
+            ).prefetch_related(*plan['prefetch_related'])
+            data = TravelDocumentSerializer(
+                documents, many=True, context={'request': request}
+            ).data
+            return renderer.render(data)
+        
+        def fast():
+            serializer = FastSerializer(
+                TravelDocumentSerializer(context={'request': request}),
+                columns=('created_at',)
+            )
+            if not serializer.supported:
+                raise CommandError('The selected fields are not supported by the fast path')
+            return renderer.render(serializer.serialize(serializer.rows(queryset)))
+        
+        regular_output = regular()
+        if not regular_output or regular_output == b'[]':
+            self.stdout.write(self.style.WARNING('No travel documents to serialize'))
+            return
+        if fast() != regular_output:
+            raise CommandError('The fast path output differs from the serializer output')
+        
+        timings = {}
+        for name, run in (('serializer', regular), ('fast path', fast)):
+            best = None
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = best
+            self.stdout.write(f'  {name}: {best * 1000:.1f} ms')
+        
+        speedup = timings['serializer'] / timings['fast path']
+        self.stdout.write(self.style.SUCCESS(
+            f'Output identical ({len(regular_output)} bytes), fast path {speedup:.1f}x faster'
+        ))
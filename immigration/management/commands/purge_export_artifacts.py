@@ -0,0 +1,14 @@
+"""
+Management command to delete expired export files.
+"""
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Delete expired export artifacts and their files'
+    
+    def handle(self, *args, **options):
+        from immigration.exports import ExportArtifacts
+        
+        count = ExportArtifacts.purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {count} expired export(s)'))
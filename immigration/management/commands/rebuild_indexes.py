@@ -0,0 +1,82 @@
+"""
+Management command to rebuild derived search indexes.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = 'Rebuild search indexes from the stored records'
+    
+    INDEXES = ['search', 'names', 'lookups', 'persons', 'autocomplete']
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'indexes',
+            nargs='*',
+            choices=self.INDEXES,
+            help='Indexes to rebuild (default: all)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of records processed per batch (default: 1000)'
+        )
+    
+    def handle(self, *args, **options):
+        indexes = options['indexes'] or self.INDEXES
+        self.batch_size = options['batch_size']
+        
+        for index in indexes:
+            self.stdout.write(f'Rebuilding {index} index...')
+            count = getattr(self, f'rebuild_{index}')()
+            self.stdout.write(f'  Indexed {count} records')
+        
+        self.stdout.write(self.style.SUCCESS('Indexes rebuilt successfully!'))
+    
+    def rebuild_search(self):
+        from immigration.search import get_search_backend
+        
+        with transaction.atomic():
+            return get_search_backend().rebuild()
+    
+    def rebuild_names(self):
+        from immigration.names import NameIndex
+        
+        with transaction.atomic():
+            return NameIndex.rebuild(batch_size=self.batch_size)
+    
+    def rebuild_lookups(self):
+        """Backfill the normalized phone and ID columns of travel documents."""
+        from immigration.models import TravelDocument
+        
+        fields = ['phone_number_normalized', 'identification_number_normalized']
+        documents = TravelDocument.objects.only(
+            'id', 'phone_number', 'identification_number', *fields
+        ).order_by('id')
+        
+        count = 0
+        last_id = 0
+        while True:
+            batch = list(documents.filter(id__gt=last_id)[:self.batch_size])
+            if not batch:
+                break
+            
+            for document in batch:
+                document.refresh_lookup_fields()
+            TravelDocument.objects.bulk_update(batch, fields)
+            
+            count += len(batch)
+            last_id = batch[-1].id
+        return count
+    
+    def rebuild_persons(self):
+        from immigration.persons import PersonIndex
+        
+        return PersonIndex.rebuild(batch_size=self.batch_size)
+    
+    def rebuild_autocomplete(self):
+        from immigration.autocomplete import AutocompleteIndex
+        
+        return AutocompleteIndex.rebuild(batch_size=self.batch_size)
@@ -0,0 +1,27 @@
+"""
+Management command to rebuild the statistics counters and aggregates.
+"""
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Recount the statistics counters, rollup cubes and lifecycle histograms'
+    
+    def handle(self, *args, **options):
+        from immigration.statistics import StatisticsCounters
+        from immigration.rollups import RollupCube
+        from immigration.lifecycle import LifecycleTracker
+        
+        self.stdout.write('Rebuilding statistics counters...')
+        count = StatisticsCounters.rebuild()
+        self.stdout.write(f'  Rebuilt {count} counters')
+        
+        self.stdout.write('Rebuilding rollup cubes...')
+        count = RollupCube.rebuild()
+        self.stdout.write(f'  Rebuilt {count} cells')
+        
+        self.stdout.write('Rebuilding lifecycle histograms...')
+        count = LifecycleTracker.rebuild()
+        self.stdout.write(f'  Rebuilt {count} histogram cells')
+        
+        self.stdout.write(self.style.SUCCESS('Statistics rebuilt successfully!'))
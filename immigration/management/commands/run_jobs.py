@@ -0,0 +1,83 @@
+"""
+Management command to run background jobs.
+"""
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (bulk operations, exports, batch printing)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Number of jobs run at the same time (default: 1)'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2,
+            help='Seconds to wait when the queue is empty (default: 2)'
+        )
+        parser.add_argument(
+            '--kind',
+            action='append',
+            dest='kinds',
+            help='Only run jobs of this kind (can be repeated)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once the queue is empty instead of waiting for jobs'
+        )
+    
+    def handle(self, *args, **options):
+        from immigration.jobs import JobQueue, JOB_HANDLERS
+        
+        concurrency = options['concurrency']
+        if concurrency < 1:
+            raise CommandError('--concurrency must be at least 1')
+        unknown = set(options['kinds'] or ()) - set(JOB_HANDLERS)
+        if unknown:
+            raise CommandError(f'Unknown job kinds: {", ".join(sorted(unknown))}')
+        
+        stop = threading.Event()
+        counts = [0] * concurrency
+        
+        def work(index):
+            counts[index] = JobQueue.work(
+                JobQueue.worker_id(index),
+                kinds=options['kinds'],
+                once=options['once'],
+                poll_interval=options['poll_interval'],
+                stop=stop
+            )
+        
+        self.stdout.write(f'Running jobs with {concurrency} worker(s)...')
+        if concurrency == 1:
+            try:
+                work(0)
+            except KeyboardInterrupt:
+                pass
+        else:
+            threads = [
+                threading.Thread(target=work, args=(index,), daemon=True)
+                for index in range(concurrency)
+            ]
+            for thread in threads:
+                thread.start()
+            try:
+                for thread in threads:
+                    while thread.is_alive():
+                        thread.join(0.5)
+            except KeyboardInterrupt:
+                # Let running jobs finish before exiting
+                self.stdout.write('Stopping after the running jobs finish...')
+                stop.set()
+                for thread in threads:
+                    thread.join()
+        
+        self.stdout.write(self.style.SUCCESS(f'Ran {sum(counts)} job(s)'))
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immigration', '0007_alter_traveldocument_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSequence',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='Magaca')),
+                ('last_value', models.BigIntegerField(default=0, verbose_name='Qiimaha ugu Dambeeyay')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Taxanaha Lambarada',
+                'verbose_name_plural': 'Taxanayaasha Lambarada',
+            },
+        ),
+    ]
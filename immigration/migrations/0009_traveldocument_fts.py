@@ -0,0 +1,44 @@
+from django.db import migrations
+
+
+FTS_TABLE = 'immigration_traveldocument_fts'
+SEARCH_FIELDS = [
+    'full_name', 'mother_name', 'document_number', 'identification_number',
+    'phone_number', 'sponsor_name', 'region', 'district',
+]
+
+
+def create_fts_table(apps, schema_editor):
+    """Create and fill the FTS5 search index (SQLite only)."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    
+    columns = ', '.join(SEARCH_FIELDS)
+    source = ', '.join(f"COALESCE({field}, '')" for field in SEARCH_FIELDS)
+    
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"{columns}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} (rowid, {columns}) "
+        f"SELECT id, {source} FROM immigration_traveldocument"
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immigration', '0008_documentsequence'),
+    ]
+    
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
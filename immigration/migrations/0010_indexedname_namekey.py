@@ -0,0 +1,143 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:36
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copy of immigration.names.NameNormalizer when this migration was
+# written, so later changes to the live module do not alter it
+
+TRANSLITERATION_RULES = [
+    ('ch', 'sh'),
+    ('x', 'h'),
+    ('kh', 'h'),
+    ('dh', 'd'),
+    ('gh', 'g'),
+    ('ph', 'f'),
+    ('q', 'k'),
+    ('c', ''),
+    ('ou', 'u'),
+]
+
+VOWELS = set('aeiou')
+
+
+def normalize_token(token):
+    for source, target in TRANSLITERATION_RULES:
+        token = token.replace(source, target)
+    token = re.sub(r'(.)\1+', r'\1', token)
+    if len(token) > 2 and token.endswith('h') and token[-2] in VOWELS:
+        token = token[:-1]
+    return token
+
+
+def tokens(name):
+    if not name:
+        return []
+    text = unicodedata.normalize('NFKD', name.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    words = re.findall(r'[a-z]+', text)
+    return [token for token in map(normalize_token, words) if token]
+
+
+def phonetic_key(token):
+    if not token:
+        return ''
+    first = 'a' if token[0] in VOWELS else token[0]
+    rest = ''.join(char for char in token[1:] if char not in VOWELS)
+    return re.sub(r'(.)\1+', r'\1', first + rest)
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def index_keys(name):
+    phonetic = [key for key in map(phonetic_key, tokens(name)) if key]
+    if not phonetic:
+        return []
+    whole = [f"f:{' '.join(phonetic)}"[:64]]
+    pairs = [f'q:{first} {second}' for first, second in zip(phonetic, phonetic[1:])]
+    words = [f'p:{key}' for key in phonetic]
+    grams = sorted({
+        f't:{gram}'
+        for key in phonetic if len(key) > 1
+        for gram in trigrams(key)
+    })
+    return list(dict.fromkeys(whole + pairs)) + list(dict.fromkeys(words)) + grams
+
+
+def index_existing_names(apps, schema_editor):
+    """Fill the fuzzy name index from the records already stored."""
+    IndexedName = apps.get_model('immigration', 'IndexedName')
+    NameKey = apps.get_model('immigration', 'NameKey')
+    sources = [
+        ('traveldocument', 'TravelDocument', 'full_name'),
+        ('degmadamember', 'DegmadaFormMember', 'name'),
+        ('kafiilkamember', 'KafiilkaFormMember', 'name'),
+    ]
+
+    for entity, model_name, field in sources:
+        model = apps.get_model('immigration', model_name)
+        for object_id, name in model.objects.values_list('id', field).iterator():
+            if not tokens(name):
+                continue
+            entry = IndexedName.objects.create(
+                entity=entity,
+                object_id=object_id,
+                name=name,
+                normalized_name=' '.join(tokens(name))
+            )
+            NameKey.objects.bulk_create([
+                NameKey(name=entry, entity=entity, key=key)
+                for key in index_keys(name)
+            ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immigration', '0009_traveldocument_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexedName',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(choices=[('traveldocument', 'Warqadda Safari'), ('degmadamember', 'Xubinta Foomka Degmada'), ('kafiilkamember', 'Xubinta Foomka Kafiilka')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('name', models.CharField(max_length=200, verbose_name='Magaca')),
+                ('normalized_name', models.CharField(max_length=200)),
+            ],
+            options={
+                'verbose_name': 'Magaca la Tusmeeyay',
+                'verbose_name_plural': 'Magacyada la Tusmeeyay',
+            },
+        ),
+        migrations.CreateModel(
+            name='NameKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(choices=[('traveldocument', 'Warqadda Safari'), ('degmadamember', 'Xubinta Foomka Degmada'), ('kafiilkamember', 'Xubinta Foomka Kafiilka')], max_length=20)),
+                ('key', models.CharField(max_length=64)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='indexedname',
+            constraint=models.UniqueConstraint(fields=('entity', 'object_id'), name='unique_indexed_name'),
+        ),
+        migrations.AddField(
+            model_name='namekey',
+            name='name',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='keys', to='immigration.indexedname'),
+        ),
+        migrations.AddIndex(
+            model_name='namekey',
+            index=models.Index(fields=['key', 'entity'], name='immigration_key_5cdbd6_idx'),
+        ),
+        migrations.RunPython(index_existing_names, migrations.RunPython.noop),
+    ]
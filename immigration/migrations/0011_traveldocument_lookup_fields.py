@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immigration', '0010_indexedname_namekey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='traveldocument',
+            name='identification_number_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='traveldocument',
+            name='phone_number_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20),
+        ),
+    ]
@@ -0,0 +1,109 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:39
+
+import re
+
+from django.db import migrations, models
+
+# Frozen copies of immigration.utils.DataProcessor's normalizers when this
+# migration was written, so later changes to the live module do not alter it
+
+
+def normalize_phone_number(phone):
+    cleaned = re.sub(r'[\s\-\(\)]', '', phone or '')
+    if not cleaned:
+        return ''
+    if cleaned.startswith('00'):
+        cleaned = '+' + cleaned[2:]
+    digits = re.sub(r'\D', '', cleaned)
+    if not digits:
+        return ''
+    if cleaned.startswith('+'):
+        return '+' + digits
+    if digits.startswith('252') and len(digits) > 10:
+        return '+' + digits
+    local = digits[1:] if digits.startswith('0') else digits
+    if re.match(r'^[6-7][0-9]{7,8}$', local):
+        return '+252' + local
+    return digits
+
+
+def normalize_identification_number(id_number):
+    return re.sub(r'[\s\-/.]', '', (id_number or '').upper().strip())
+
+
+def index_existing_persons(apps, schema_editor):
+    """Fill the person index from the records already stored."""
+    PersonRecord = apps.get_model('immigration', 'PersonRecord')
+    TravelDocument = apps.get_model('immigration', 'TravelDocument')
+    records = []
+
+    for document in TravelDocument.objects.exclude(identification_number='').iterator():
+        records.append(PersonRecord(
+            person_key=normalize_identification_number(document.identification_number),
+            entity='traveldocument',
+            object_id=document.pk,
+            name=document.full_name,
+            reference=document.document_number,
+            phone=normalize_phone_number(document.phone_number),
+            birth_date=document.birth_date,
+            nationality=document.nationality,
+        ))
+
+    for entity, model_name in [('degmadamember', 'DegmadaFormMember'), ('kafiilkamember', 'KafiilkaFormMember')]:
+        model = apps.get_model('immigration', model_name)
+        for member in model.objects.exclude(id_number='').select_related('form').iterator():
+            records.append(PersonRecord(
+                person_key=normalize_identification_number(member.id_number),
+                entity=entity,
+                object_id=member.pk,
+                name=member.name,
+                reference=member.form.reference,
+                form_id=member.form_id,
+                phone=normalize_phone_number(member.phone),
+                birth_date=member.birth_date,
+                nationality=member.nationality,
+            ))
+
+    PersonRecord.objects.bulk_create(
+        [record for record in records if record.person_key],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immigration', '0011_traveldocument_lookup_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('person_key', models.CharField(max_length=50, verbose_name='Aqoonsi Lambar')),
+                ('entity', models.CharField(choices=[('traveldocument', 'Warqadda Safari'), ('degmadamember', 'Xubinta Foomka Degmada'), ('kafiilkamember', 'Xubinta Foomka Kafiilka')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('name', models.CharField(blank=True, max_length=200, verbose_name='Magaca')),
+                ('reference', models.CharField(blank=True, max_length=100, verbose_name='Tixraac')),
+                ('form_id', models.BigIntegerField(blank=True, null=True)),
+                ('phone', models.CharField(blank=True, max_length=20, verbose_name='Telephone')),
+                ('birth_date', models.DateField(blank=True, null=True, verbose_name='Taariikhda Dhalasho')),
+                ('nationality', models.CharField(blank=True, max_length=100, verbose_name='Jinsiyadda')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Diiwaanka Qofka',
+                'verbose_name_plural': 'Diiwaanada Qofka',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='personrecord',
+            index=models.Index(fields=['person_key', 'entity', 'object_id'], name='immigration_person__6324d0_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='personrecord',
+            constraint=models.UniqueConstraint(fields=('entity', 'object_id'), name='unique_person_record'),
+        ),
+        migrations.RunPython(index_existing_persons, migrations.RunPython.noop),
+    ]
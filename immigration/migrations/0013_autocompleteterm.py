@@ -0,0 +1,74 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:41
+
+from collections import Counter
+
+from django.db import migrations, models
+
+
+def index_existing_terms(apps, schema_editor):
+    """Fill the autocomplete index from the records already stored."""
+    AutocompleteTerm = apps.get_model('immigration', 'AutocompleteTerm')
+    form_fields = {
+        'sponsor_name': 'sponsor_name',
+        'company_name': 'company_name',
+        'region': 'gobolka',
+        'district': 'degmada',
+        'reference': 'reference',
+    }
+    sources = [
+        ('TravelDocument', {
+            'full_name': 'full_name',
+            'sponsor_name': 'sponsor_name',
+            'region': 'region',
+            'district': 'district',
+            'document_number': 'document_number',
+        }),
+        ('DegmadaForm', form_fields),
+        ('KafiilkaForm', form_fields),
+    ]
+
+    counts = Counter()
+    values = {}
+    for model_name, fields in sources:
+        model = apps.get_model('immigration', model_name)
+        for row in model.objects.values_list(*fields.values()).iterator():
+            for field, value in zip(fields, row):
+                value = ' '.join((value or '').split())[:200]
+                if value:
+                    key = (field, value.lower())
+                    counts[key] += 1
+                    values[key] = value
+
+    AutocompleteTerm.objects.bulk_create([
+        AutocompleteTerm(field=field, term=term, value=values[field, term], count=count)
+        for (field, term), count in counts.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immigration', '0012_personrecord'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AutocompleteTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('full_name', 'Magaca'), ('sponsor_name', 'Magaca Kafiilka'), ('company_name', 'Magaca Shirkada'), ('region', 'Gobolka'), ('district', 'Degmada'), ('document_number', 'Lambarka Warqadda'), ('reference', 'Tixraac')], max_length=20)),
+                ('term', models.CharField(max_length=200)),
+                ('value', models.CharField(max_length=200)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Ereyga Dhammaystirka',
+                'verbose_name_plural': 'Erayada Dhammaystirka',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='autocompleteterm',
+            constraint=models.UniqueConstraint(fields=('field', 'term'), name='unique_autocomplete_term'),
+        ),
+        migrations.RunPython(index_existing_terms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:43
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def count_existing_records(apps, schema_editor):
+    """Fill the statistics counters from the records already stored."""
+    # Frozen copy of StatisticsCounters.count_all when this migration was
+    # written, so later changes to the live module do not alter it
+    StatisticsCounter = apps.get_model('immigration', 'StatisticsCounter')
+    counts = Counter()
+    for prefix, model_name in [
+        ('traveldocument', 'TravelDocument'),
+        ('degmadaform', 'DegmadaForm'),
+        ('kafiilkaform', 'KafiilkaForm'),
+    ]:
+        model = apps.get_model('immigration', model_name)
+        counts[f'{prefix}:total'] = model.objects.count()
+
+        if prefix == 'traveldocument':
+            for status, count in model.objects.values_list('status').annotate(
+                count=Count('id')
+            ).order_by():
+                counts[f'{prefix}:status:{status or "none"}'] += count
+
+        days = model.objects.annotate(
+            day=TruncDate('created_at')
+        ).values_list('day').annotate(count=Count('id')).order_by()
+        for day, count in days:
+            if day:
+                counts[f'{prefix}:day:{day.isoformat()}'] += count
+
+    StatisticsCounter.objects.bulk_create([
+        StatisticsCounter(name=name, value=value)
+        for name, value in counts.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immigration', '0013_autocompleteterm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatisticsCounter',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Magaca')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Qiimaha')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Tirinta Tirakoobka',
+                'verbose_name_plural': 'Tirinta Tirakoobyada',
+            },
+        ),
+        migrations.RunPython(count_existing_records, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:44
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count, Value
+from django.db.models.functions import TruncDate
+
+
+def aggregate_existing_records(apps, schema_editor):
+    """Fill the rollup cubes from the records already stored."""
+    # Frozen copy of RollupCube.count_all when this migration was written,
+    # so later changes to the live module do not alter it
+    cubes = {
+        'documents': ('DocumentRollup', ['day', 'region', 'district', 'status', 'nationality']),
+        'forms': ('FormRollup', ['form_type', 'day', 'gobolka', 'degmada', 'sponsor_type']),
+    }
+    sources = [
+        ('documents', 'TravelDocument', ['region', 'district', 'status', 'nationality']),
+        ('degmada', 'DegmadaForm', ['gobolka', 'degmada', 'rollup_sponsor_type']),
+        ('kafiilka', 'KafiilkaForm', ['gobolka', 'degmada', 'sponsor_type']),
+    ]
+
+    cells = {cube: Counter() for cube in cubes}
+    for source, model_name, fields in sources:
+        rows = apps.get_model('immigration', model_name).objects.annotate(
+            rollup_day=TruncDate('created_at'),
+            # Degmada forms have no sponsor type
+            rollup_sponsor_type=Value('')
+        ).values_list('rollup_day', *fields).annotate(count=Count('id')).order_by()
+
+        for day, *values, count in rows:
+            if day is None:
+                continue
+            values = tuple(value or '' for value in values)
+            if source == 'documents':
+                cells['documents'][(day, *values)] += count
+            else:
+                cells['forms'][(source, day, *values)] += count
+
+    for cube, counts in cells.items():
+        model_name, dimensions = cubes[cube]
+        model = apps.get_model('immigration', model_name)
+        model.objects.bulk_create([
+            model(count=count, **dict(zip(dimensions, key)))
+            for key, count in counts.items()
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immigration', '0014_statisticscounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Maalinta')),
+                ('region', models.CharField(blank=True, max_length=100, verbose_name='Gobolka')),
+                ('district', models.CharField(blank=True, max_length=100, verbose_name='Degmada')),
+                ('status', models.CharField(blank=True, max_length=10, verbose_name='Marxalada')),
+                ('nationality', models.CharField(blank=True, max_length=100, verbose_name='Jinsiyadda')),
+                ('count', models.BigIntegerField(default=0, verbose_name='Tirada')),
+            ],
+            options={
+                'verbose_name': 'Isku-duubka Warqadaha',
+                'verbose_name_plural': 'Isku-duubyada Warqadaha',
+            },
+        ),
+        migrations.CreateModel(
+            name='FormRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('form_type', models.CharField(choices=[('degmada', 'Foomka Degmada'), ('kafiilka', 'Foomka Kafiilka')], max_length=10)),
+                ('day', models.DateField(verbose_name='Maalinta')),
+                ('gobolka', models.CharField(blank=True, max_length=100, verbose_name='Gobolka')),
+                ('degmada', models.CharField(blank=True, max_length=100, verbose_name='Degmada')),
+                ('sponsor_type', models.CharField(blank=True, max_length=10, verbose_name='Nooca Kafiilka')),
+                ('count', models.BigIntegerField(default=0, verbose_name='Tirada')),
+            ],
+            options={
+                'verbose_name': 'Isku-duubka Foomamka',
+                'verbose_name_plural': 'Isku-duubyada Foomamka',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='documentrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'region', 'district', 'status', 'nationality'), name='unique_document_rollup'),
+        ),
+        migrations.AddConstraint(
+            model_name='formrollup',
+            constraint=models.UniqueConstraint(fields=('form_type', 'day', 'gobolka', 'degmada', 'sponsor_type'), name='unique_form_rollup'),
+        ),
+        migrations.RunPython(aggregate_existing_records, migrations.RunPython.noop),
+    ]
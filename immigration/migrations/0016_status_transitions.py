@@ -0,0 +1,70 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immigration', '0015_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatusTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(blank=True, max_length=10, verbose_name='Marxaladii Hore')),
+                ('to_status', models.CharField(max_length=10, verbose_name='Marxalada Cusub')),
+                ('region_office', models.CharField(blank=True, max_length=100, verbose_name='Xafiiska Gobolka')),
+                ('occurred_at', models.DateTimeField(verbose_name='Waqtiga')),
+                ('seconds_in_state', models.FloatField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Isbeddelka Marxalada',
+                'verbose_name_plural': 'Isbeddelada Marxalada',
+                'ordering': ['-occurred_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TransitionHistogram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Maalinta')),
+                ('status', models.CharField(max_length=10, verbose_name='Marxalada')),
+                ('region_office', models.CharField(blank=True, max_length=100, verbose_name='Xafiiska Gobolka')),
+                ('officer_id', models.IntegerField(default=0)),
+                ('bucket', models.SmallIntegerField()),
+                ('count', models.BigIntegerField(default=0, verbose_name='Tirada')),
+            ],
+            options={
+                'verbose_name': 'Jaantuska Waqtiga Marxalada',
+                'verbose_name_plural': 'Jaantusyada Waqtiga Marxalada',
+            },
+        ),
+        migrations.AddField(
+            model_name='statustransition',
+            name='document',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transitions', to='immigration.traveldocument'),
+        ),
+        migrations.AddField(
+            model_name='statustransition',
+            name='officer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='status_transitions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='transitionhistogram',
+            constraint=models.UniqueConstraint(fields=('day', 'status', 'region_office', 'officer_id', 'bucket'), name='unique_transition_histogram'),
+        ),
+        migrations.AddIndex(
+            model_name='statustransition',
+            index=models.Index(fields=['document', 'occurred_at'], name='immigration_documen_e95885_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='statustransition',
+            index=models.Index(fields=['occurred_at'], name='immigration_occurre_f8eb68_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immigration', '0016_status_transitions'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='degmadaform',
+            index=models.Index(fields=['created_at', 'id'], name='immigration_created_5d1490_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='kafiilkaform',
+            index=models.Index(fields=['created_at', 'id'], name='immigration_created_287f21_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='traveldocument',
+            index=models.Index(fields=['created_at', 'id'], name='immigration_created_61a432_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:09
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immigration', '0018_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(choices=[('traveldocument', 'Warqadda Safari'), ('degmadaform', 'Foomka Degmada'), ('kafiilkaform', 'Foomka Kafiilka')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('region_office', models.CharField(blank=True, max_length=100, verbose_name='Xafiiska Gobolka')),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Diiwaan la Tirtiray',
+                'verbose_name_plural': 'Diiwaano la Tirtiray',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='degmadaform',
+            index=models.Index(fields=['updated_at', 'id'], name='immigration_updated_fae93f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='kafiilkaform',
+            index=models.Index(fields=['updated_at', 'id'], name='immigration_updated_677842_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='traveldocument',
+            index=models.Index(fields=['updated_at', 'id'], name='immigration_updated_d0f14f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['deleted_at', 'id'], name='immigration_deleted_f9df0a_idx'),
+        ),
+    ]
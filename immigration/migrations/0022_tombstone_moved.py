@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immigration', '0020_export_artifact'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tombstone',
+            name='moved',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.db import migrations
+
+
+DATABASE_CACHE = 'django.core.cache.backends.db.DatabaseCache'
+
+
+def create_cache_tables(apps, schema_editor):
+    """Create the tables of the database caches in CACHES."""
+    call_command(
+        'createcachetable',
+        database=schema_editor.connection.alias,
+        verbosity=0
+    )
+
+
+def drop_cache_tables(apps, schema_editor):
+    for options in settings.CACHES.values():
+        if options['BACKEND'] == DATABASE_CACHE:
+            table = schema_editor.quote_name(options['LOCATION'])
+            schema_editor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('immigration', '0022_tombstone_moved'),
+    ]
+    
+    operations = [
+        migrations.RunPython(create_cache_tables, drop_cache_tables),
+    ]
@@ -42,6 +42,8 @@ class DegmadaForm(models.Model):
             models.Index(fields=['reference']),
             models.Index(fields=['date']),
             models.Index(fields=['company_name']),
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['updated_at', 'id']),
         ]
     
     def __str__(self):
@@ -144,6 +146,8 @@ class KafiilkaForm(models.Model):
             models.Index(fields=['reference']),
             models.Index(fields=['sponsor_type']),
             models.Index(fields=['date']),
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['updated_at', 'id']),
         ]
     
     def __str__(self):
@@ -194,6 +198,7 @@ class KafiilkaFormMember(models.Model):
 
 from django.db import models
 from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -241,6 +246,10 @@ class TravelDocument(models.Model):
     card_number = models.CharField(max_length=50, blank=True, verbose_name="Card Number")
     officer_signature = models.CharField(max_length=200, blank=True, verbose_name="Signature")
     
+    # Normalized copies of phone_number and identification_number for exact lookups
+    phone_number_normalized = models.CharField(max_length=20, blank=True, db_index=True, editable=False)
+    identification_number_normalized = models.CharField(max_length=50, blank=True, db_index=True, editable=False)
+    
     # System Fields
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -257,6 +266,8 @@ class TravelDocument(models.Model):
             models.Index(fields=['status']),
             models.Index(fields=['region']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['updated_at', 'id']),
         ]
     
     def __str__(self):
@@ -268,11 +279,28 @@ class TravelDocument(models.Model):
     def save(self, *args, **kwargs):
         if not self.document_number:
             # Generate document number if not provided
-            last_doc = TravelDocument.objects.order_by('-id').first()
-            last_id = last_doc.id if last_doc else 0
-            self.document_number = f"TD-{str(last_id + 1).zfill(5)}"
+            from .utils import DocumentNumberGenerator
+            self.document_number = DocumentNumberGenerator.generate_travel_document_number()
+        
+        self.refresh_lookup_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if 'phone_number' in update_fields:
+                update_fields.add('phone_number_normalized')
+            if 'identification_number' in update_fields:
+                update_fields.add('identification_number_normalized')
+            kwargs['update_fields'] = update_fields
         super().save(*args, **kwargs)
     
+    def refresh_lookup_fields(self):
+        """Fill the normalized phone and ID columns used for exact lookups."""
+        from .utils import DataProcessor
+        self.phone_number_normalized = DataProcessor.normalize_phone_number(self.phone_number)
+        self.identification_number_normalized = DataProcessor.normalize_identification_number(
+            self.identification_number
+        )
+    
     def get_status_color(self):
         """Return color code for status badge."""
         colors = {
@@ -324,4 +352,368 @@ class TravelDocumentChild(models.Model):
         today = date.today()
         return today.year - self.birth_date.year - (
             (today.month, today.day) < (self.birth_date.month, self.birth_date.day)
-        )
\ No newline at end of file
+        )
+
+class DocumentSequence(models.Model):
+    """Named counter used to allocate document numbers and references."""
+    name = models.CharField(max_length=50, primary_key=True, verbose_name="Magaca")
+    last_value = models.BigIntegerField(default=0, verbose_name="Qiimaha ugu Dambeeyay")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Taxanaha Lambarada"
+        verbose_name_plural = "Taxanayaasha Lambarada"
+    
+    def __str__(self):
+        return f"{self.name} ({self.last_value})"
+
+
+INDEXED_ENTITY_CHOICES = [
+    ('traveldocument', 'Warqadda Safari'),
+    ('degmadamember', 'Xubinta Foomka Degmada'),
+    ('kafiilkamember', 'Xubinta Foomka Kafiilka'),
+]
+
+
+class IndexedName(models.Model):
+    """Normalized copy of a person's name used for fuzzy name search."""
+    entity = models.CharField(max_length=20, choices=INDEXED_ENTITY_CHOICES)
+    object_id = models.BigIntegerField()
+    name = models.CharField(max_length=200, verbose_name="Magaca")
+    normalized_name = models.CharField(max_length=200)
+    
+    class Meta:
+        verbose_name = "Magaca la Tusmeeyay"
+        verbose_name_plural = "Magacyada la Tusmeeyay"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['entity', 'object_id'],
+                name='unique_indexed_name'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} ({self.entity} {self.object_id})"
+
+
+class NameKey(models.Model):
+    """Phonetic or trigram key pointing at an indexed name."""
+    name = models.ForeignKey(IndexedName, on_delete=models.CASCADE, related_name='keys')
+    entity = models.CharField(max_length=20, choices=INDEXED_ENTITY_CHOICES)
+    key = models.CharField(max_length=64)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['key', 'entity']),
+        ]
+    
+    def __str__(self):
+        return self.key
+
+
+class PersonRecord(models.Model):
+    """
+    One travel document or form member, keyed by the person's normalized ID.
+    
+    Display fields are copied from the source record so that every record of
+    a person can be listed with a single indexed query.
+    """
+    person_key = models.CharField(max_length=50, verbose_name="Aqoonsi Lambar")
+    entity = models.CharField(max_length=20, choices=INDEXED_ENTITY_CHOICES)
+    object_id = models.BigIntegerField()
+    name = models.CharField(max_length=200, blank=True, verbose_name="Magaca")
+    reference = models.CharField(max_length=100, blank=True, verbose_name="Tixraac")
+    form_id = models.BigIntegerField(blank=True, null=True)
+    phone = models.CharField(max_length=20, blank=True, verbose_name="Telephone")
+    birth_date = models.DateField(blank=True, null=True, verbose_name="Taariikhda Dhalasho")
+    nationality = models.CharField(max_length=100, blank=True, verbose_name="Jinsiyadda")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Diiwaanka Qofka"
+        verbose_name_plural = "Diiwaanada Qofka"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['entity', 'object_id'],
+                name='unique_person_record'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['person_key', 'entity', 'object_id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.person_key} ({self.entity} {self.object_id})"
+
+
+AUTOCOMPLETE_FIELD_CHOICES = [
+    ('full_name', 'Magaca'),
+    ('sponsor_name', 'Magaca Kafiilka'),
+    ('company_name', 'Magaca Shirkada'),
+    ('region', 'Gobolka'),
+    ('district', 'Degmada'),
+    ('document_number', 'Lambarka Warqadda'),
+    ('reference', 'Tixraac'),
+]
+
+
+class AutocompleteTerm(models.Model):
+    """
+    Distinct value of an autocompleted field, kept sorted for prefix lookups.
+    
+    ``term`` is the lower-cased value used for range scans and ``count`` is
+    the number of records currently using it.
+    """
+    field = models.CharField(max_length=20, choices=AUTOCOMPLETE_FIELD_CHOICES)
+    term = models.CharField(max_length=200)
+    value = models.CharField(max_length=200)
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = "Ereyga Dhammaystirka"
+        verbose_name_plural = "Erayada Dhammaystirka"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['field', 'term'],
+                name='unique_autocomplete_term'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.field}: {self.value} ({self.count})"
+
+
+class StatisticsCounter(models.Model):
+    """
+    Named running total used by the statistics dashboard.
+    
+    Names look like ``traveldocument:total``, ``traveldocument:status:approved``
+    or ``degmadaform:day:2025-01-31``.
+    """
+    name = models.CharField(max_length=100, primary_key=True, verbose_name="Magaca")
+    value = models.BigIntegerField(default=0, verbose_name="Qiimaha")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Tirinta Tirakoobka"
+        verbose_name_plural = "Tirinta Tirakoobyada"
+    
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+
+class DocumentRollup(models.Model):
+    """Number of travel documents per (day, region, district, status, nationality)."""
+    day = models.DateField(verbose_name="Maalinta")
+    region = models.CharField(max_length=100, blank=True, verbose_name="Gobolka")
+    district = models.CharField(max_length=100, blank=True, verbose_name="Degmada")
+    status = models.CharField(max_length=10, blank=True, verbose_name="Marxalada")
+    nationality = models.CharField(max_length=100, blank=True, verbose_name="Jinsiyadda")
+    count = models.BigIntegerField(default=0, verbose_name="Tirada")
+    
+    class Meta:
+        verbose_name = "Isku-duubka Warqadaha"
+        verbose_name_plural = "Isku-duubyada Warqadaha"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'region', 'district', 'status', 'nationality'],
+                name='unique_document_rollup'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} {self.region}/{self.district} {self.status}: {self.count}"
+
+
+class FormRollup(models.Model):
+    """Number of Degmada/Kafiilka forms per (day, gobolka, degmada, sponsor_type)."""
+    FORM_TYPE_CHOICES = [
+        ('degmada', 'Foomka Degmada'),
+        ('kafiilka', 'Foomka Kafiilka'),
+    ]
+    
+    form_type = models.CharField(max_length=10, choices=FORM_TYPE_CHOICES)
+    day = models.DateField(verbose_name="Maalinta")
+    gobolka = models.CharField(max_length=100, blank=True, verbose_name="Gobolka")
+    degmada = models.CharField(max_length=100, blank=True, verbose_name="Degmada")
+    sponsor_type = models.CharField(max_length=10, blank=True, verbose_name="Nooca Kafiilka")
+    count = models.BigIntegerField(default=0, verbose_name="Tirada")
+    
+    class Meta:
+        verbose_name = "Isku-duubka Foomamka"
+        verbose_name_plural = "Isku-duubyada Foomamka"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['form_type', 'day', 'gobolka', 'degmada', 'sponsor_type'],
+                name='unique_form_rollup'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.form_type} {self.day} {self.gobolka}/{self.degmada}: {self.count}"
+
+
+class StatusTransition(models.Model):
+    """One status change of a travel document, with the time spent in the old status."""
+    document = models.ForeignKey(
+        TravelDocument, on_delete=models.SET_NULL, null=True, related_name='transitions'
+    )
+    from_status = models.CharField(max_length=10, blank=True, verbose_name="Marxaladii Hore")
+    to_status = models.CharField(max_length=10, verbose_name="Marxalada Cusub")
+    region_office = models.CharField(max_length=100, blank=True, verbose_name="Xafiiska Gobolka")
+    officer = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='status_transitions'
+    )
+    occurred_at = models.DateTimeField(verbose_name="Waqtiga")
+    seconds_in_state = models.FloatField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-occurred_at']
+        verbose_name = "Isbeddelka Marxalada"
+        verbose_name_plural = "Isbeddelada Marxalada"
+        indexes = [
+            models.Index(fields=['document', 'occurred_at']),
+            models.Index(fields=['occurred_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.document_id}: {self.from_status} -> {self.to_status}"
+
+
+class TransitionHistogram(models.Model):
+    """
+    Log-bucketed histogram of time spent in a status before leaving it.
+    
+    One row per (day left, status, region office, officer, bucket); officer
+    0 stands for transitions without a known officer.
+    """
+    day = models.DateField(verbose_name="Maalinta")
+    status = models.CharField(max_length=10, verbose_name="Marxalada")
+    region_office = models.CharField(max_length=100, blank=True, verbose_name="Xafiiska Gobolka")
+    officer_id = models.IntegerField(default=0)
+    bucket = models.SmallIntegerField()
+    count = models.BigIntegerField(default=0, verbose_name="Tirada")
+    
+    class Meta:
+        verbose_name = "Jaantuska Waqtiga Marxalada"
+        verbose_name_plural = "Jaantusyada Waqtiga Marxalada"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'status', 'region_office', 'officer_id', 'bucket'],
+                name='unique_transition_histogram'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} {self.status} {self.region_office} [{self.bucket}]: {self.count}"
+
+
+JOB_STATUS_CHOICES = [
+    ('queued', 'Queued'),
+    ('running', 'Running'),
+    ('succeeded', 'Succeeded'),
+    ('failed', 'Failed'),
+]
+
+
+class Job(models.Model):
+    """
+    A long-running operation queued for the ``run_jobs`` worker.
+    
+    ``params`` and ``result`` are JSON; ``progress`` is a percentage.
+    Failed attempts are retried after ``run_after`` until ``max_attempts``
+    is reached.
+    """
+    kind = models.CharField(max_length=50, verbose_name="Nooca")
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=JOB_STATUS_CHOICES, default='queued', verbose_name="Xaalada")
+    progress = models.PositiveSmallIntegerField(default=0)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Shaqo"
+        verbose_name_plural = "Shaqooyin"
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+    
+    @property
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed')
+
+
+SYNC_ENTITY_CHOICES = [
+    ('traveldocument', 'Warqadda Safari'),
+    ('degmadaform', 'Foomka Degmada'),
+    ('kafiilkaform', 'Foomka Kafiilka'),
+]
+
+
+class Tombstone(models.Model):
+    """
+    Marker left when a synced record is deleted.
+    
+    The change feed reports these so that regional offices can remove
+    records they downloaded earlier. ``moved`` marks a record that moved
+    to another office: it is gone from ``region_office`` only.
+    """
+    entity = models.CharField(max_length=20, choices=SYNC_ENTITY_CHOICES)
+    object_id = models.BigIntegerField()
+    region_office = models.CharField(max_length=100, blank=True, verbose_name="Xafiiska Gobolka")
+    moved = models.BooleanField(default=False)
+    deleted_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = "Diiwaan la Tirtiray"
+        verbose_name_plural = "Diiwaano la Tirtiray"
+        indexes = [
+            models.Index(fields=['deleted_at', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.entity} #{self.object_id} deleted {self.deleted_at}"
+
+
+class ExportArtifact(models.Model):
+    """
+    A stored export file, served again while its data is unchanged.
+    
+    ``fingerprint`` covers the export parameters and the state of the rows
+    they match; ``params_hash`` covers the parameters only and groups the
+    artifacts of one export over time.
+    """
+    fingerprint = models.CharField(max_length=64, unique=True)
+    params_hash = models.CharField(max_length=64, db_index=True)
+    format = models.CharField(max_length=10)
+    params = models.JSONField(default=dict, blank=True)
+    file = models.FileField(upload_to='exports/')
+    size = models.PositiveBigIntegerField(default=0)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='export_artifacts')
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Faylka la Dhoofiyay"
+        verbose_name_plural = "Faylasha la Dhoofiyay"
+    
+    def __str__(self):
+        return f"{self.format} export {self.fingerprint[:12]}"
+    
+    @property
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
@@ -0,0 +1,291 @@
+"""
+Fuzzy name matching for Somali names.
+"""
+import re
+import unicodedata
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count
+
+from .models import (
+    TravelDocument, DegmadaFormMember, KafiilkaFormMember,
+    IndexedName, NameKey
+)
+
+
+# Indexed entity -> (model, name field)
+NAME_SOURCES = {
+    'traveldocument': (TravelDocument, 'full_name'),
+    'degmadamember': (DegmadaFormMember, 'name'),
+    'kafiilkamember': (KafiilkaFormMember, 'name'),
+}
+
+# Somali Latin spellings mapped onto the common English/Arabic ones,
+# applied in order (digraphs first)
+TRANSLITERATION_RULES = [
+    ('ch', 'sh'),
+    ('x', 'h'),     # Maxamed -> Mahamed
+    ('kh', 'h'),    # Khadar -> Hadar
+    ('dh', 'd'),
+    ('gh', 'g'),
+    ('ph', 'f'),
+    ('q', 'k'),     # Qaasim -> Kaasim
+    ('c', ''),      # Cabdi -> Abdi
+    ('ou', 'u'),    # Yousef -> Yusef
+]
+
+VOWELS = set('aeiou')
+
+
+class NameNormalizer:
+    """Normalize names and derive phonetic and trigram keys."""
+    
+    @staticmethod
+    def normalize_token(token):
+        """Apply transliteration rules to one lower-case word."""
+        for source, target in TRANSLITERATION_RULES:
+            token = token.replace(source, target)
+        
+        # Collapse doubled letters (Hassan -> Hasan, Faarax -> Farah)
+        token = re.sub(r'(.)\1+', r'\1', token)
+        
+        # Drop a trailing h after a vowel (Abdullah -> Abdulla)
+        if len(token) > 2 and token.endswith('h') and token[-2] in VOWELS:
+            token = token[:-1]
+        return token
+    
+    @staticmethod
+    def tokens(name):
+        """Split a name into normalized words."""
+        if not name:
+            return []
+        
+        text = unicodedata.normalize('NFKD', name.lower())
+        text = ''.join(char for char in text if not unicodedata.combining(char))
+        words = re.findall(r'[a-z]+', text)
+        return [token for token in map(NameNormalizer.normalize_token, words) if token]
+    
+    @staticmethod
+    def normalize(name):
+        """Return the normalized form of a full name."""
+        return ' '.join(NameNormalizer.tokens(name))
+    
+    @staticmethod
+    def phonetic_key(token):
+        """
+        Reduce a normalized word to its consonant skeleton.
+        
+        Maxamed, Mohamed and Muhammad all become 'mhmd'; a leading vowel is
+        kept as 'a' so that Cumar/Omar/Umar share the key 'amr'.
+        """
+        if not token:
+            return ''
+        
+        first = 'a' if token[0] in VOWELS else token[0]
+        rest = ''.join(char for char in token[1:] if char not in VOWELS)
+        return re.sub(r'(.)\1+', r'\1', first + rest)
+    
+    @staticmethod
+    def trigrams(text):
+        """Return the set of padded trigrams of a string."""
+        padded = f'  {text} '
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+    
+    @staticmethod
+    def key_stages(name):
+        """
+        Return the index keys of a name, grouped from most to least selective.
+        
+        The stages are: the whole name and adjacent word pairs, single words,
+        and trigrams of the single-word keys (to tolerate typos).
+        """
+        phonetic = [NameNormalizer.phonetic_key(token) for token in NameNormalizer.tokens(name)]
+        phonetic = [key for key in phonetic if key]
+        if not phonetic:
+            return [[], [], []]
+        
+        whole = [f"f:{' '.join(phonetic)}"[:64]]
+        pairs = [f'q:{first} {second}' for first, second in zip(phonetic, phonetic[1:])]
+        words = [f'p:{key}' for key in phonetic]
+        grams = sorted({
+            f't:{gram}'
+            for key in phonetic if len(key) > 1
+            for gram in NameNormalizer.trigrams(key)
+        })
+        return [
+            list(dict.fromkeys(whole + pairs)),
+            list(dict.fromkeys(words)),
+            grams,
+        ]
+    
+    @staticmethod
+    def index_keys(name):
+        """Return every key stored for a name."""
+        return [key for stage in NameNormalizer.key_stages(name) for key in stage]
+    
+    @staticmethod
+    def similarity(first, second):
+        """
+        Score how alike two normalized names are, from 0 to 1.
+        
+        Combines the overlap of phonetic word keys with the trigram
+        similarity of the normalized spellings.
+        """
+        first_keys = {NameNormalizer.phonetic_key(token) for token in first.split()}
+        second_keys = {NameNormalizer.phonetic_key(token) for token in second.split()}
+        if not first_keys or not second_keys:
+            return 0.0
+        
+        dice = 2 * len(first_keys & second_keys) / (len(first_keys) + len(second_keys))
+        
+        first_grams = NameNormalizer.trigrams(first)
+        second_grams = NameNormalizer.trigrams(second)
+        jaccard = len(first_grams & second_grams) / len(first_grams | second_grams)
+        
+        return round(0.6 * dice + 0.4 * jaccard, 3)
+
+
+class NameIndex:
+    """Maintain and query the fuzzy name index."""
+    
+    # Candidates ranked by similarity
+    MAX_CANDIDATES = 300
+    
+    @staticmethod
+    @transaction.atomic
+    def index(entity, object_id, name):
+        """Add or refresh the index entry for one record."""
+        if not name or not NameNormalizer.tokens(name):
+            NameIndex.remove(entity, object_id)
+            return
+        
+        entry, created = IndexedName.objects.get_or_create(
+            entity=entity,
+            object_id=object_id,
+            defaults={'name': name, 'normalized_name': NameNormalizer.normalize(name)}
+        )
+        
+        if not created:
+            if entry.name == name:
+                return
+            entry.name = name
+            entry.normalized_name = NameNormalizer.normalize(name)
+            entry.save(update_fields=['name', 'normalized_name'])
+            entry.keys.all().delete()
+        
+        NameKey.objects.bulk_create([
+            NameKey(name=entry, entity=entity, key=key)
+            for key in NameNormalizer.index_keys(name)
+        ])
+    
+    @staticmethod
+    def index_instance(instance):
+        """Index a TravelDocument or form member instance."""
+        for entity, (model, field) in NAME_SOURCES.items():
+            if isinstance(instance, model):
+                NameIndex.index(entity, instance.pk, getattr(instance, field))
+                return
+    
+    @staticmethod
+    def index_new(instances):
+        """Index newly created records that bypassed the save signals."""
+        for entity, (model, field) in NAME_SOURCES.items():
+            rows = [
+                (instance.pk, getattr(instance, field))
+                for instance in instances
+                if isinstance(instance, model) and getattr(instance, field)
+            ]
+            if rows:
+                NameIndex._index_batch(entity, rows)
+    
+    @staticmethod
+    def remove(entity, object_id):
+        """Remove a record from the index."""
+        IndexedName.objects.filter(entity=entity, object_id=object_id).delete()
+    
+    @staticmethod
+    def rebuild(batch_size=1000):
+        """Rebuild the whole index and return the number of names indexed."""
+        NameKey.objects.all().delete()
+        IndexedName.objects.all().delete()
+        
+        total = 0
+        for entity, (model, field) in NAME_SOURCES.items():
+            rows = model.objects.exclude(**{field: ''}).values_list('id', field)
+            batch = []
+            for row in rows.iterator(chunk_size=batch_size):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    total += NameIndex._index_batch(entity, batch)
+                    batch = []
+            if batch:
+                total += NameIndex._index_batch(entity, batch)
+        return total
+    
+    @staticmethod
+    def _index_batch(entity, rows):
+        """Bulk index a list of (object_id, name) rows."""
+        entries = IndexedName.objects.bulk_create([
+            IndexedName(
+                entity=entity,
+                object_id=object_id,
+                name=name,
+                normalized_name=NameNormalizer.normalize(name)
+            )
+            for object_id, name in rows if NameNormalizer.tokens(name)
+        ])
+        NameKey.objects.bulk_create([
+            NameKey(name=entry, entity=entity, key=key)
+            for entry in entries
+            for key in NameNormalizer.index_keys(entry.name)
+        ])
+        return len(entries)
+    
+    @staticmethod
+    def search(query, entities=None, limit=20, min_score=0.3):
+        """
+        Find names that sound like the query.
+        
+        Candidates are the names sharing the most keys with the query,
+        counted with one aggregate query per stage of keys, starting from
+        the most selective ones, and then ranked by similarity. Returns a
+        list of dicts with entity, object_id, name and score.
+        """
+        normalized_query = NameNormalizer.normalize(query)
+        if not normalized_query:
+            return []
+        
+        keys = NameKey.objects.all()
+        if entities:
+            keys = keys.filter(entity__in=entities)
+        
+        hits = Counter()
+        for stage in NameNormalizer.key_stages(query):
+            if not stage:
+                continue
+            stage_hits = keys.filter(key__in=stage).values('name_id').annotate(
+                hits=Count('id')
+            ).order_by('-hits', 'name_id')[:NameIndex.MAX_CANDIDATES]
+            hits.update({row['name_id']: row['hits'] for row in stage_hits})
+            if len(hits) >= limit:
+                break
+        
+        ranked = sorted(hits.items(), key=lambda item: (-item[1], item[0]))
+        candidate_ids = [name_id for name_id, _ in ranked[:NameIndex.MAX_CANDIDATES]]
+        candidates = IndexedName.objects.filter(id__in=candidate_ids).values(
+            'entity', 'object_id', 'name', 'normalized_name'
+        )
+        
+        results = []
+        for candidate in candidates:
+            score = NameNormalizer.similarity(
+                normalized_query,
+                candidate.pop('normalized_name')
+            )
+            if score >= min_score:
+                candidate['score'] = score
+                results.append(candidate)
+        
+        results.sort(key=lambda result: (-result['score'], result['name']))
+        return results[:limit]
@@ -0,0 +1,93 @@
+"""
+Pagination classes for the immigration API.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class OptionalCursorPagination(PageNumberPagination):
+    """
+    Page-number pagination that switches to keyset pagination on request.
+    
+    Clients opt in by passing ``?cursor=`` (empty for the first page). Rows
+    are then ordered by (created_at, id), newest first, and each page starts
+    after the last row of the previous one, so deep pages cost the same as
+    the first, no COUNT is run, and rows inserted while paging never shift
+    or repeat results. Cursor responses only carry a ``next`` link.
+    """
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+    
+    def use_cursor(self, request):
+        """Return whether the request asked for keyset pagination."""
+        return self.cursor_query_param in request.query_params
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.use_cursor(request)
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        
+        self.request = request
+        page_size = self.get_page_size(request)
+        rows = list(self.cursor_window(queryset, request))
+        self.has_next = len(rows) > page_size
+        self.page_rows = rows[:page_size]
+        return self.page_rows
+    
+    def cursor_window(self, queryset, request):
+        """Return the rows a cursor page reads, plus one to detect a next page."""
+        queryset = queryset.order_by(*self.ordering)
+        
+        position = self.decode_cursor(request.query_params[self.cursor_query_param])
+        if position is not None:
+            created_at, pk = position
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            )
+        return queryset[:self.get_page_size(request) + 1]
+    
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        
+        return Response({
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        })
+    
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.page_rows[-1])
+        )
+    
+    @staticmethod
+    def encode_cursor(row):
+        """Encode the (created_at, id) position of a model or named row."""
+        position = f'{row.created_at.isoformat()}|{row.id}'
+        return base64.urlsafe_b64encode(position.encode('ascii')).decode('ascii')
+    
+    def decode_cursor(self, cursor):
+        """Decode a cursor into (created_at, id), or None for the first page."""
+        if not cursor:
+            return None
+        
+        try:
+            position = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('ascii')
+            created_at, pk = position.split('|')
+            return datetime.fromisoformat(created_at), int(pk)
+        except (ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
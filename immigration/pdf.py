@@ -0,0 +1,240 @@
+"""
+PDF rendering of travel documents and cards for printing.
+"""
+import base64
+import hashlib
+import importlib
+import mimetypes
+import multiprocessing
+import posixpath
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import default_storage
+from django.template.loader import render_to_string
+
+# No model imports at module level: worker processes started with spawn
+# import this module to run html_to_pdf without setting up Django
+from .conditional import queryset_fingerprint
+
+# Layout -> template rendering one document
+PDF_LAYOUTS = {
+    'document': 'travel_document/print.html',
+    'card': 'travel_document/card.html',
+}
+
+# Optional packages needed to render and merge PDFs
+PDF_PACKAGES = ('weasyprint', 'qrcode', 'pypdf')
+
+
+class PDFUnavailable(Exception):
+    """Raised when the packages needed to render PDFs are not installed."""
+
+
+def require_packages():
+    """Import the PDF packages, raising PDFUnavailable for missing ones."""
+    missing = []
+    for package in PDF_PACKAGES:
+        try:
+            importlib.import_module(package)
+        except (ImportError, OSError):
+            # weasyprint raises OSError when its system libraries are missing
+            missing.append(package)
+    if missing:
+        raise PDFUnavailable(f'PDF rendering needs: {", ".join(missing)}')
+
+
+def html_to_pdf(html):
+    """Render a self-contained HTML page to PDF bytes."""
+    # Module level so worker processes can run it
+    from weasyprint import HTML
+    return HTML(string=html).write_pdf()
+
+
+class PDFRenderer:
+    """
+    Render travel documents to print-ready PDFs.
+    
+    Each document is rendered once per layout and kept in storage under a
+    name holding its ``updated_at``; children, photo and status changes
+    all move ``updated_at``, so a stored PDF is current as long as its name
+    matches. Pages are self-contained (photo and QR code are inlined) so
+    rendering never waits on the network. Batches render the missing pages
+    across PDF_RENDER_PROCESSES spawned processes and merge them in request
+    order.
+    """
+    
+    @staticmethod
+    def cache_name(document, layout):
+        """Return the storage name of a document's current PDF."""
+        return posixpath.join(
+            PDFRenderer.cache_dir(document.pk, layout),
+            f'{document.updated_at:%Y%m%d%H%M%S%f}.pdf'
+        )
+    
+    @staticmethod
+    def cache_dir(document_id, layout):
+        return f'pdf_cache/{layout}/{document_id}'
+    
+    @staticmethod
+    def image_data_uri(image):
+        """Return an image field's file as a data URI, or None."""
+        if not image:
+            return None
+        try:
+            with image.storage.open(image.name, 'rb') as handle:
+                content = handle.read()
+        except OSError:
+            return None
+        content_type = mimetypes.guess_type(image.name)[0] or 'image/jpeg'
+        return f'data:{content_type};base64,{base64.b64encode(content).decode("ascii")}'
+    
+    @staticmethod
+    def qr_code(document):
+        """Return the document's QR code as an SVG data URI."""
+        import qrcode
+        import qrcode.image.svg
+        
+        data = document.document_number
+        url = getattr(settings, 'PDF_QR_URL', None)
+        if url:
+            data = url.format(id=document.pk, document_number=document.document_number)
+        svg = qrcode.make(data, image_factory=qrcode.image.svg.SvgPathImage).to_string()
+        return f'data:image/svg+xml;base64,{base64.b64encode(svg).decode("ascii")}'
+    
+    @staticmethod
+    def render_html(document, layout='document'):
+        """Render a document's print page."""
+        return render_to_string(PDF_LAYOUTS[layout], {
+            'document': document,
+            'children': document.children.all(),
+            'photo': PDFRenderer.image_data_uri(document.photo),
+            'qr_code': PDFRenderer.qr_code(document),
+        })
+    
+    @staticmethod
+    def store(document, layout, pdf):
+        """Store a rendered PDF and remove the document's older ones."""
+        name = PDFRenderer.cache_name(document, layout)
+        if not default_storage.exists(name):
+            name = default_storage.save(name, ContentFile(pdf))
+        directory = PDFRenderer.cache_dir(document.pk, layout)
+        try:
+            files = default_storage.listdir(directory)[1]
+        except (OSError, NotImplementedError):
+            files = []
+        for filename in files:
+            path = posixpath.join(directory, filename)
+            if path != name:
+                default_storage.delete(path)
+        return name
+    
+    @staticmethod
+    def render(document, layout='document'):
+        """Return a document's PDF, rendering it if no current one is stored."""
+        require_packages()
+        name = PDFRenderer.cache_name(document, layout)
+        if not default_storage.exists(name):
+            name = PDFRenderer.store(
+                document, layout, html_to_pdf(PDFRenderer.render_html(document, layout))
+            )
+        with default_storage.open(name, 'rb') as handle:
+            return handle.read()
+    
+    @staticmethod
+    def render_batch(document_ids, output, layout='document', progress=None, processes=None):
+        """
+        Write the PDFs of many documents, merged in order, to ``output``.
+        
+        Missing pages are rendered across ``processes`` processes,
+        PDF_RENDER_PROCESSES by default; pass 1 to render them in the
+        calling process. Unknown ids are skipped. Returns the number of
+        documents written.
+        """
+        require_packages()
+        from pypdf import PdfWriter
+        from .models import TravelDocument
+        
+        found = TravelDocument.objects.prefetch_related('children').in_bulk(document_ids)
+        documents = [found[pk] for pk in dict.fromkeys(document_ids) if pk in found]
+        names = {document.pk: PDFRenderer.cache_name(document, layout) for document in documents}
+        missing = [
+            document for document in documents
+            if not default_storage.exists(names[document.pk])
+        ]
+        total = len(missing) + 1
+        
+        if missing:
+            # Pages are built here; only the HTML reaches the workers
+            pages = (PDFRenderer.render_html(document, layout) for document in missing)
+            if processes is None:
+                processes = getattr(settings, 'PDF_RENDER_PROCESSES', 4)
+            processes = min(processes, len(missing))
+            if processes > 1:
+                # Spawned, not forked: the caller may be running threads
+                with ProcessPoolExecutor(
+                    max_workers=processes,
+                    mp_context=multiprocessing.get_context('spawn')
+                ) as pool:
+                    PDFRenderer.store_rendered(
+                        missing, pool.map(html_to_pdf, pages), layout, names, progress, total
+                    )
+            else:
+                PDFRenderer.store_rendered(
+                    missing, map(html_to_pdf, pages), layout, names, progress, total
+                )
+        
+        writer = PdfWriter()
+        handles = [default_storage.open(names[document.pk], 'rb') for document in documents]
+        try:
+            for handle in handles:
+                writer.append(handle)
+            writer.write(output)
+        finally:
+            for handle in handles:
+                handle.close()
+        if progress:
+            progress(total, total)
+        return len(documents)
+    
+    @staticmethod
+    def store_rendered(documents, pdfs, layout, names, progress, total):
+        """Store PDFs as they arrive, recording their names and progress."""
+        for done, (document, pdf) in enumerate(zip(documents, pdfs), 1):
+            names[document.pk] = PDFRenderer.store(document, layout, pdf)
+            if progress:
+                progress(done, total)
+    
+    @staticmethod
+    def batch_fingerprint(document_ids, layout, user=None):
+        """Hash a user's batch ids and layout with the state of its documents."""
+        from .models import TravelDocument
+        from .exports import ExportArtifacts
+        
+        documents = TravelDocument.objects.filter(id__in=document_ids)
+        return hashlib.sha256('|'.join([
+            ExportArtifacts.params_hash({'layout': layout}, user),
+            ','.join(str(pk) for pk in document_ids),
+            queryset_fingerprint(documents)
+        ]).encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def build_batch(document_ids, layout='document', user=None, progress=None):
+        """Return a current export artifact holding the batch's merged PDF."""
+        from .exports import ExportArtifacts
+        
+        fingerprint = PDFRenderer.batch_fingerprint(document_ids, layout, user)
+        artifact = ExportArtifacts.find(fingerprint)
+        if artifact is not None:
+            return artifact
+        
+        with tempfile.TemporaryFile() as output:
+            PDFRenderer.render_batch(document_ids, output, layout, progress)
+            output.seek(0)
+            name = default_storage.save(
+                f'exports/print_{layout}_{fingerprint[:16]}.pdf', File(output)
+            )
+        params = {'format': 'pdf', 'document_ids': document_ids, 'layout': layout}
+        return ExportArtifacts.store(fingerprint, params, name, user)
@@ -0,0 +1,139 @@
+"""
+Cross-entity person index keyed by identification number.
+"""
+from django.db import transaction
+
+from .models import (
+    TravelDocument, DegmadaFormMember, KafiilkaFormMember, PersonRecord
+)
+from .utils import DataProcessor
+
+
+# Indexed entity -> (model, ID field)
+PERSON_SOURCES = {
+    'traveldocument': (TravelDocument, 'identification_number'),
+    'degmadamember': (DegmadaFormMember, 'id_number'),
+    'kafiilkamember': (KafiilkaFormMember, 'id_number'),
+}
+
+
+class PersonIndex:
+    """Maintain and query the person index."""
+    
+    @staticmethod
+    def person_key(id_number):
+        """Return the key a person is indexed under."""
+        return DataProcessor.normalize_identification_number(id_number)
+    
+    @staticmethod
+    def entity_for(instance):
+        """Return the indexed entity name of an instance, or None."""
+        for entity, (model, field) in PERSON_SOURCES.items():
+            if isinstance(instance, model):
+                return entity
+        return None
+    
+    @staticmethod
+    def record_values(entity, instance):
+        """Build the PersonRecord fields for a source record."""
+        if entity == 'traveldocument':
+            return {
+                'person_key': PersonIndex.person_key(instance.identification_number),
+                'name': instance.full_name,
+                'reference': instance.document_number,
+                'form_id': None,
+                'phone': DataProcessor.normalize_phone_number(instance.phone_number),
+                'birth_date': instance.birth_date,
+                'nationality': instance.nationality,
+            }
+        return {
+            'person_key': PersonIndex.person_key(instance.id_number),
+            'name': instance.name,
+            'reference': instance.form.reference,
+            'form_id': instance.form_id,
+            'phone': DataProcessor.normalize_phone_number(instance.phone),
+            'birth_date': instance.birth_date,
+            'nationality': instance.nationality,
+        }
+    
+    @staticmethod
+    def index_instance(instance):
+        """Add, refresh or drop the index entry for one record."""
+        entity = PersonIndex.entity_for(instance)
+        if entity is None:
+            return
+        
+        values = PersonIndex.record_values(entity, instance)
+        if not values['person_key']:
+            PersonIndex.remove(entity, instance.pk)
+            return
+        
+        PersonRecord.objects.update_or_create(
+            entity=entity,
+            object_id=instance.pk,
+            defaults=values
+        )
+    
+    @staticmethod
+    def index_new(instances):
+        """Index newly created records that bypassed the save signals."""
+        records = []
+        for instance in instances:
+            entity = PersonIndex.entity_for(instance)
+            if entity is None:
+                continue
+            values = PersonIndex.record_values(entity, instance)
+            if values['person_key']:
+                records.append(PersonRecord(entity=entity, object_id=instance.pk, **values))
+        PersonRecord.objects.bulk_create(records)
+    
+    @staticmethod
+    def remove(entity, object_id):
+        """Remove a record from the index."""
+        PersonRecord.objects.filter(entity=entity, object_id=object_id).delete()
+    
+    @staticmethod
+    def update_form_reference(entity, form):
+        """Copy a form's reference onto the index entries of its members."""
+        PersonRecord.objects.filter(entity=entity, form_id=form.pk).exclude(
+            reference=form.reference
+        ).update(reference=form.reference)
+    
+    @staticmethod
+    @transaction.atomic
+    def rebuild(batch_size=1000):
+        """Rebuild the whole index and return the number of records indexed."""
+        PersonRecord.objects.all().delete()
+        
+        total = 0
+        for entity, (model, field) in PERSON_SOURCES.items():
+            records = model.objects.exclude(**{field: ''})
+            if entity != 'traveldocument':
+                records = records.select_related('form')
+            
+            batch = []
+            for instance in records.iterator(chunk_size=batch_size):
+                values = PersonIndex.record_values(entity, instance)
+                if values['person_key']:
+                    batch.append(PersonRecord(entity=entity, object_id=instance.pk, **values))
+                if len(batch) >= batch_size:
+                    total += len(PersonRecord.objects.bulk_create(batch))
+                    batch = []
+            total += len(PersonRecord.objects.bulk_create(batch))
+        return total
+    
+    @staticmethod
+    def lookup(id_number):
+        """Return every indexed record of a person, or an empty list."""
+        person_key = PersonIndex.person_key(id_number)
+        if not person_key:
+            return []
+        
+        return list(
+            PersonRecord.objects.filter(person_key=person_key)
+            .order_by('entity', 'object_id')
+            .values(
+                'entity', 'object_id', 'name', 'reference', 'form_id',
+                'phone', 'birth_date', 'nationality'
+            )
+        )
@@ -0,0 +1,233 @@
+"""
+Pre-aggregated rollup cubes for travel documents and forms.
+"""
+from collections import Counter
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import TruncDate, TruncMonth, TruncYear
+from django.utils import timezone
+
+from .models import (
+    TravelDocument, DegmadaForm, KafiilkaForm,
+    DocumentRollup, FormRollup
+)
+
+
+# Cube -> (rollup model, dimensions in key order)
+CUBES = {
+    'documents': (DocumentRollup, ['day', 'region', 'district', 'status', 'nationality']),
+    'forms': (FormRollup, ['form_type', 'day', 'gobolka', 'degmada', 'sponsor_type']),
+}
+
+# Coarser time dimensions derived from ``day`` when drilling down
+TIME_DIMENSIONS = {
+    'month': TruncMonth,
+    'year': TruncYear,
+}
+
+
+class RollupCube:
+    """Maintain the rollup tables and answer slice/roll-up queries."""
+    
+    @staticmethod
+    def cell(instance, values=None):
+        """
+        Return (cube, key) for the cell a record is counted in, or None.
+        
+        ``values`` may be a dict of stored column values, e.g. the previous
+        state of a record, to read instead of the instance attributes.
+        """
+        if values is None:
+            get = lambda name: getattr(instance, name, None)
+        else:
+            get = values.get
+        if not get('created_at'):
+            return None
+        
+        day = timezone.localdate(get('created_at'))
+        if isinstance(instance, TravelDocument):
+            return 'documents', (
+                day,
+                get('region') or '',
+                get('district') or '',
+                get('status') or '',
+                get('nationality') or '',
+            )
+        
+        form_type = 'kafiilka' if isinstance(instance, KafiilkaForm) else 'degmada'
+        return 'forms', (
+            form_type,
+            day,
+            get('gobolka') or '',
+            get('degmada') or '',
+            get('sponsor_type') or '',
+        )
+    
+    @staticmethod
+    @transaction.atomic
+    def apply(cube, deltas):
+        """Add a {key: delta} mapping to the cells of a cube."""
+        model, dimensions = CUBES[cube]
+        for key, delta in deltas.items():
+            if not delta:
+                continue
+            
+            cells = model.objects.filter(**dict(zip(dimensions, key)))
+            if not cells.update(count=F('count') + delta):
+                try:
+                    with transaction.atomic():
+                        model.objects.create(count=delta, **dict(zip(dimensions, key)))
+                except IntegrityError:
+                    # Another writer created the cell first
+                    cells.update(count=F('count') + delta)
+            
+            if delta < 0:
+                cells.filter(count__lte=0).delete()
+    
+    @staticmethod
+    def record_saved(instance, created, previous=None):
+        """Move a created or changed record into its current cell."""
+        if not created and previous is None:
+            return
+        
+        deltas = {}
+        new = RollupCube.cell(instance)
+        old = None if created else RollupCube.cell(instance, previous)
+        if new == old:
+            return
+        
+        for cell, delta in [(old, -1), (new, 1)]:
+            if cell is not None:
+                cube, key = cell
+                deltas.setdefault(cube, Counter())[key] += delta
+        for cube, cube_deltas in deltas.items():
+            RollupCube.apply(cube, cube_deltas)
+    
+    @staticmethod
+    def record_created(instances):
+        """Count newly created records that bypassed the save signals."""
+        deltas = {}
+        for instance in instances:
+            cell = RollupCube.cell(instance)
+            if cell is not None:
+                cube, key = cell
+                deltas.setdefault(cube, Counter())[key] += 1
+        for cube, cube_deltas in deltas.items():
+            RollupCube.apply(cube, cube_deltas)
+    
+    @staticmethod
+    def record_updated(model, rows, values):
+        """
+        Move records changed by a queryset update to their new cells.
+        
+        ``rows`` are dicts of the records' previous column values and
+        ``values`` the columns the update set.
+        """
+        # cell() only looks at the instance's type when given values
+        instance = model()
+        deltas = {}
+        for row in rows:
+            old = RollupCube.cell(instance, row)
+            new = RollupCube.cell(instance, {**row, **values})
+            if old == new:
+                continue
+            for cell, delta in [(old, -1), (new, 1)]:
+                if cell is not None:
+                    cube, key = cell
+                    deltas.setdefault(cube, Counter())[key] += delta
+        for cube, cube_deltas in deltas.items():
+            RollupCube.apply(cube, cube_deltas)
+    
+    @staticmethod
+    def record_deleted(instance):
+        """Remove a deleted record from its cell."""
+        cell = RollupCube.cell(instance)
+        if cell is not None:
+            cube, key = cell
+            RollupCube.apply(cube, {key: -1})
+    
+    @staticmethod
+    def count_all():
+        """Recompute every cell from the stored records."""
+        sources = [
+            ('documents', TravelDocument, ['region', 'district', 'status', 'nationality']),
+            ('degmada', DegmadaForm, ['gobolka', 'degmada', 'rollup_sponsor_type']),
+            ('kafiilka', KafiilkaForm, ['gobolka', 'degmada', 'sponsor_type']),
+        ]
+        
+        cells = {cube: Counter() for cube in CUBES}
+        for source, model, fields in sources:
+            rows = model.objects.annotate(
+                rollup_day=TruncDate('created_at'),
+                # Degmada forms have no sponsor type
+                rollup_sponsor_type=Value('')
+            ).values_list('rollup_day', *fields).annotate(count=Count('id')).order_by()
+            
+            for day, *values, count in rows:
+                if day is None:
+                    continue
+                values = tuple(value or '' for value in values)
+                if source == 'documents':
+                    cells['documents'][(day, *values)] += count
+                else:
+                    cells['forms'][(source, day, *values)] += count
+        return cells
+    
+    @staticmethod
+    @transaction.atomic
+    def rebuild():
+        """Replace every cube with a fresh aggregation and return the cell count."""
+        total = 0
+        for cube, counts in RollupCube.count_all().items():
+            model, dimensions = CUBES[cube]
+            model.objects.all().delete()
+            model.objects.bulk_create([
+                model(count=count, **dict(zip(dimensions, key)))
+                for key, count in counts.items()
+            ], batch_size=1000)
+            total += len(counts)
+        return total
+    
+    @staticmethod
+    def drill_down(cube, group_by=None, filters=None, date_from=None, date_to=None):
+        """
+        Answer a slice/roll-up query from a cube.
+        
+        ``group_by`` lists the dimensions to keep (``month`` and ``year`` roll
+        days up), ``filters`` slices on exact dimension values and the dates
+        bound the ``day`` dimension. Returns a list of dicts with the kept
+        dimensions and a ``count``, largest first.
+        """
+        if cube not in CUBES:
+            raise ValidationError(f"Unknown rollup cube: {cube}")
+        model, dimensions = CUBES[cube]
+        group_by = list(group_by or [])
+        filters = dict(filters or {})
+        
+        for dimension in group_by:
+            if dimension not in dimensions and dimension not in TIME_DIMENSIONS:
+                raise ValidationError(f"Cannot group {cube} by {dimension}")
+        for dimension in filters:
+            if dimension not in dimensions:
+                raise ValidationError(f"Cannot filter {cube} by {dimension}")
+        
+        cells = model.objects.filter(**filters)
+        if date_from:
+            cells = cells.filter(day__gte=date_from)
+        if date_to:
+            cells = cells.filter(day__lte=date_to)
+        
+        if not group_by:
+            return [{'count': cells.aggregate(count=Sum('count'))['count'] or 0}]
+        
+        cells = cells.annotate(**{
+            dimension: TIME_DIMENSIONS[dimension]('day')
+            for dimension in group_by if dimension in TIME_DIMENSIONS
+        })
+        return list(
+            cells.values(*group_by)
+            .annotate(count=Sum('count'))
+            .order_by('-count', *group_by)
+        )
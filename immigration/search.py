@@ -0,0 +1,141 @@
+"""
+Full-text search backends for travel documents.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import TravelDocument
+
+
+# Fields covered by travel document search, in FTS column order
+SEARCH_FIELDS = [
+    'full_name', 'mother_name', 'document_number', 'identification_number',
+    'phone_number', 'sponsor_name', 'region', 'district',
+]
+
+# bm25 weights per column: names and numbers matter more than places
+SEARCH_WEIGHTS = [10.0, 2.0, 10.0, 8.0, 5.0, 2.0, 1.0, 1.0]
+
+FTS_TABLE = 'immigration_traveldocument_fts'
+
+
+class ContainsSearchBackend:
+    """Search backend that ORs ``icontains`` lookups over the search fields."""
+    
+    def search(self, queryset, query):
+        """Filter a queryset down to documents matching the query."""
+        if not query:
+            return queryset
+        
+        condition = Q()
+        for field in SEARCH_FIELDS:
+            condition |= Q(**{f'{field}__icontains': query})
+        return queryset.filter(condition)
+    
+    def index_document(self, document):
+        """Add or refresh a document in the index."""
+    
+    def index_documents(self, documents):
+        """Add new documents to the index."""
+        for document in documents:
+            self.index_document(document)
+    
+    def remove_document(self, document_id):
+        """Remove a document from the index."""
+    
+    def rebuild(self):
+        """Rebuild the whole index and return the number of documents."""
+        return 0
+
+
+class SQLiteFTSSearchBackend(ContainsSearchBackend):
+    """
+    Search backend using an SQLite FTS5 shadow table.
+    
+    Every word of the query must match the start of a word in one of the
+    search fields, and results are ordered by bm25 relevance.
+    """
+    
+    @staticmethod
+    def build_match_expression(query):
+        """Turn free text into an FTS5 prefix query, or None if empty."""
+        tokens = re.findall(r'\w+', query.lower())
+        if not tokens:
+            return None
+        return ' '.join(f'"{token}"*' for token in tokens)
+    
+    def search(self, queryset, query):
+        if not query:
+            return queryset
+        
+        match = self.build_match_expression(query)
+        if match is None:
+            return queryset.none()
+        
+        table = queryset.model._meta.db_table
+        weights = ', '.join(str(weight) for weight in SEARCH_WEIGHTS)
+        
+        return queryset.filter(
+            id__in=RawSQL(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+                [match]
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f'SELECT bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s AND rowid = {table}.id',
+                [match]
+            )
+        ).order_by('search_rank', '-created_at')
+    
+    def index_document(self, document):
+        values = [getattr(document, field) or '' for field in SEARCH_FIELDS]
+        columns = ', '.join(SEARCH_FIELDS)
+        placeholders = ', '.join(['%s'] * len(SEARCH_FIELDS))
+        
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [document.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, {columns}) VALUES (%s, {placeholders})',
+                [document.pk] + values
+            )
+    
+    def index_documents(self, documents):
+        columns = ', '.join(SEARCH_FIELDS)
+        placeholders = ', '.join(['%s'] * len(SEARCH_FIELDS))
+        
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, {columns}) VALUES (%s, {placeholders})',
+                [
+                    [document.pk] + [getattr(document, field) or '' for field in SEARCH_FIELDS]
+                    for document in documents
+                ]
+            )
+    
+    def remove_document(self, document_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [document_id])
+    
+    def rebuild(self):
+        columns = ', '.join(SEARCH_FIELDS)
+        source = ', '.join(f"COALESCE({field}, '')" for field in SEARCH_FIELDS)
+        
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, {columns}) '
+                f'SELECT id, {source} FROM {TravelDocument._meta.db_table}'
+            )
+            cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE}')
+            return cursor.fetchone()[0]
+
+
+def get_search_backend():
+    """Return the search backend for the configured database."""
+    if connection.vendor == 'sqlite':
+        return SQLiteFTSSearchBackend()
+    return ContainsSearchBackend()
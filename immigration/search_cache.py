@@ -0,0 +1,132 @@
+"""
+Cache of travel document search results.
+"""
+import hashlib
+import json
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache, caches, DEFAULT_CACHE_ALIAS
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from .models import TravelDocument
+from .utils import DataProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class SearchResultCache:
+    """
+    Cache the ordered document IDs matching a set of search parameters.
+    
+    Entries are keyed on the normalized ``DocumentSearchSerializer`` data and
+    a generation number. Any TravelDocument write bumps the generation, so
+    older entries are never read again and simply expire. Every worker
+    process must see the bump, so nothing is cached when the cache is
+    process-local.
+    """
+    
+    KEY_PREFIX = 'immigration:search'
+    GENERATION_KEY = 'immigration:search:generation'
+    
+    @staticmethod
+    def timeout():
+        return getattr(settings, 'SEARCH_CACHE_TIMEOUT', 300)
+    
+    @staticmethod
+    def max_results():
+        return getattr(settings, 'SEARCH_CACHE_MAX_RESULTS', 10000)
+    
+    @staticmethod
+    def enabled():
+        """Whether the cache is shared between processes."""
+        return not isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache)
+    
+    @staticmethod
+    def normalize_params(params):
+        """Reduce search parameters to a canonical, JSON-serializable dict."""
+        normalized = {}
+        for name, value in params.items():
+            if value in (None, ''):
+                continue
+            
+            if name == 'query':
+                value = ' '.join(value.lower().split())
+            elif name == 'phone_number':
+                value = DataProcessor.normalize_phone_number(value)
+            elif name == 'identification_number':
+                value = DataProcessor.normalize_identification_number(value)
+            elif hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            elif isinstance(value, str):
+                value = value.strip()
+            
+            if value:
+                normalized[name] = value
+        return normalized
+    
+    @staticmethod
+    def generation():
+        """Return the current cache generation."""
+        return cache.get_or_set(SearchResultCache.GENERATION_KEY, 1, timeout=None)
+    
+    @staticmethod
+    def make_key(params):
+        """Build the cache key for a set of search parameters."""
+        normalized = SearchResultCache.normalize_params(params)
+        digest = hashlib.sha1(
+            json.dumps(normalized, sort_keys=True).encode('utf-8')
+        ).hexdigest()
+        return f'{SearchResultCache.KEY_PREFIX}:{SearchResultCache.generation()}:{digest}'
+    
+    @staticmethod
+    def get_ids(params, search):
+        """
+        Return the ordered list of matching document IDs.
+        
+        ``search`` is called with the parameters on a cache miss and must
+        return an ordered queryset. Returns None when the result is too large
+        to cache, or when caching is disabled; the caller should then
+        paginate the queryset itself.
+        """
+        if not SearchResultCache.enabled():
+            return None
+        
+        key = SearchResultCache.make_key(params)
+        ids = cache.get(key)
+        if ids is not None:
+            return ids
+        
+        limit = SearchResultCache.max_results()
+        ids = list(search(params).values_list('id', flat=True)[:limit + 1])
+        if len(ids) > limit:
+            return None
+        
+        cache.set(key, ids, SearchResultCache.timeout())
+        return ids
+    
+    @staticmethod
+    def hydrate(ids, queryset=None):
+        """Load the documents for a page of IDs, keeping their order."""
+        if queryset is None:
+            queryset = TravelDocument.objects.prefetch_related('children')
+        documents = queryset.in_bulk(ids)
+        return [documents[pk] for pk in ids if pk in documents]
+    
+    @staticmethod
+    def invalidate():
+        """Make every cached search result stale once the write commits."""
+        transaction.on_commit(SearchResultCache._bump_generation)
+    
+    @staticmethod
+    def _bump_generation():
+        # A new unique value rather than incr(), which some backends
+        # implement as a get and a set that concurrent bumps can merge.
+        # Runs after the write has committed, so a cache failure must not
+        # fail the request; stale entries still expire after the timeout
+        try:
+            cache.set(SearchResultCache.GENERATION_KEY, uuid.uuid4().hex, timeout=None)
+        except Exception:
+            logger.exception('Could not invalidate cached search results')
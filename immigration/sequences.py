@@ -0,0 +1,137 @@
+"""
+Sequence allocation for document numbers and form references.
+"""
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DocumentSequence
+
+# Connection that counters are advanced on, outside the caller's
+# transaction; a copy of the default database in settings.DATABASES
+SEQUENCE_ALIAS = 'immigration_sequences'
+
+
+class SequenceAllocator:
+    """
+    Allocate values from named counters in the ``DocumentSequence`` table.
+    
+    Values are reserved in blocks, so a worker process only touches the
+    counter row once every ``block_size`` inserts. Inside a transaction the
+    counter is advanced on a separate autocommit connection: its row lock
+    is released at once instead of being held until the caller's
+    transaction commits. Values of a transaction that rolls back are
+    skipped, never handed out twice. SQLite has a single writer, so a
+    second connection would wait on the caller's own transaction; there,
+    and when DATABASES has no SEQUENCE_ALIAS entry, the counter is advanced
+    in the caller's transaction and no spare values are kept, since they
+    would be undone by a rollback.
+    """
+    
+    def __init__(self, block_size=None, separate_connection=None):
+        self._block_size = block_size
+        self._separate_connection = separate_connection
+        self._blocks = {}
+        self._lock = threading.Lock()
+    
+    @property
+    def block_size(self):
+        """Number of values reserved from the database at a time."""
+        if self._block_size is not None:
+            return self._block_size
+        return getattr(settings, 'DOCUMENT_SEQUENCE_BLOCK_SIZE', 20)
+    
+    @property
+    def separate_connection(self):
+        """Whether counters are advanced outside the caller's transaction."""
+        if self._separate_connection is not None:
+            return self._separate_connection
+        return connections[DEFAULT_DB_ALIAS].vendor != 'sqlite'
+    
+    def next_value(self, name, initial=None):
+        """Return the next value of the named sequence."""
+        return self.reserve(name, 1, initial=initial)[0]
+    
+    def reserve(self, name, count=1, initial=None, use_blocks=True):
+        """
+        Reserve ``count`` values from the named sequence.
+        
+        ``initial`` seeds a sequence that does not exist yet; it may be an
+        integer or a callable returning the last value already in use.
+        Pass ``use_blocks=False`` for sequences that should not keep spare
+        values around (e.g. short-lived per-day counters).
+        """
+        with self._lock:
+            start, end = self._blocks.pop(name, (1, 0))
+            taken = min(count, end - start + 1)
+            values = list(range(start, start + taken))
+            if start + taken <= end:
+                self._blocks[name] = (start + taken, end)
+        
+        remaining = count - len(values)
+        if remaining:
+            using = self._allocation_alias()
+            size = remaining
+            if use_blocks and using is not None:
+                size = max(remaining, self.block_size)
+            last = self._increment(name, size, initial, using or DEFAULT_DB_ALIAS)
+            first = last - size + 1
+            values.extend(range(first, first + remaining))
+            
+            if size > remaining:
+                with self._lock:
+                    self._blocks.setdefault(name, (first + remaining, last))
+        
+        return values
+    
+    def reset(self, name=None):
+        """Forget cached blocks for one sequence, or for all of them."""
+        with self._lock:
+            if name is None:
+                self._blocks.clear()
+            else:
+                self._blocks.pop(name, None)
+    
+    def _allocation_alias(self):
+        """
+        Return the alias of a connection whose counter updates commit at
+        once, or None if the counter must move in the caller's transaction.
+        """
+        if not transaction.get_connection().in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if not self.separate_connection or SEQUENCE_ALIAS not in settings.DATABASES:
+            return None
+        return SEQUENCE_ALIAS
+    
+    @staticmethod
+    def _increment(name, size, initial, using=DEFAULT_DB_ALIAS):
+        """Atomically advance the counter row and return its new value."""
+        with transaction.atomic(using=using):
+            counters = DocumentSequence.objects.using(using).filter(name=name)
+            updated = counters.update(
+                last_value=F('last_value') + size,
+                updated_at=timezone.now()
+            )
+            
+            if not updated:
+                start = initial() if callable(initial) else (initial or 0)
+                try:
+                    with transaction.atomic(using=using):
+                        DocumentSequence.objects.using(using).create(
+                            name=name,
+                            last_value=start + size
+                        )
+                except IntegrityError:
+                    # Another worker created the row first
+                    counters.update(
+                        last_value=F('last_value') + size,
+                        updated_at=timezone.now()
+                    )
+            
+            return counters.values_list('last_value', flat=True).get()
+
+
+sequence_allocator = SequenceAllocator()
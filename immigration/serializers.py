@@ -5,27 +5,100 @@ from rest_framework import serializers
 from .models import (
     TravelDocument, TravelDocumentChild,
     DegmadaForm, DegmadaFormMember,
-    KafiilkaForm, KafiilkaFormMember
+    KafiilkaForm, KafiilkaFormMember, Job, ExportArtifact,
+    INDEXED_ENTITY_CHOICES, AUTOCOMPLETE_FIELD_CHOICES
 )
+from .utils import ExportHelper
 from django.contrib.auth import get_user_model
+from django.core.exceptions import FieldDoesNotExist
 
 User = get_user_model()
 
 
+class DynamicFieldsMixin:
+    """
+    Let clients pick fields with ``?fields=`` and nested data with ``?expand=``.
+    
+    ``fields`` is a comma-separated list of field names. Nested fields listed
+    in ``expandable_fields`` are included when named in ``expand``; without
+    an ``expand`` parameter they follow ``fields`` (all fields by default).
+    """
+    expandable_fields = ()
+    
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        expand = kwargs.pop('expand', None)
+        super().__init__(*args, **kwargs)
+        
+        request = self.context.get('request')
+        if request is not None:
+            if fields is None and request.query_params.get('fields'):
+                fields = request.query_params['fields'].split(',')
+            if expand is None and 'expand' in request.query_params:
+                expand = request.query_params['expand'].split(',')
+        
+        self.is_sparse = fields is not None or expand is not None
+        if not self.is_sparse:
+            return
+        
+        fields = {name.strip() for name in fields} if fields is not None else None
+        expand = {name.strip() for name in expand} if expand is not None else None
+        for name in list(self.fields):
+            if name in self.expandable_fields and expand is not None:
+                keep = name in expand
+            else:
+                keep = fields is None or name in fields
+            if not keep:
+                self.fields.pop(name)
+    
+    def get_query_plan(self):
+        """
+        Return the columns, joins and prefetches the selected fields need.
+        
+        The result is a dict with ``only``, ``select_related`` and
+        ``prefetch_related`` lists for the serializer's model queryset.
+        """
+        model = self.Meta.model
+        plan = {'only': [model._meta.pk.name], 'select_related': [], 'prefetch_related': []}
+        
+        for field in self.fields.values():
+            source = field.source
+            if source == '*':
+                continue
+            if isinstance(field, serializers.BaseSerializer):
+                plan['prefetch_related'].append(source)
+                continue
+            if '.' in source:
+                relation = source.split('.')[0]
+                plan['select_related'].append(relation)
+                plan['only'].append(source.replace('.', '__'))
+                continue
+            if source.startswith('get_') and source.endswith('_display'):
+                source = source[4:-len('_display')]
+            
+            try:
+                model_field = model._meta.get_field(source)
+            except FieldDoesNotExist:
+                continue
+            if model_field.concrete:
+                plan['only'].append(source)
+        
+        plan['only'] = list(dict.fromkeys(plan['only']))
+        return plan
+
+
 class TravelDocumentChildSerializer(serializers.ModelSerializer):
     """Serializer for travel document children."""
     
     class Meta:
         model = TravelDocumentChild
-        fields = [
-            'id', 'name', 'birth_date', 'birth_place', 'photo',
-            'created_at', 'updated_at'
-        ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        fields = ['id', 'name', 'birth_date', 'birth_place', 'photo']
+        read_only_fields = ['id']
 
 
-class TravelDocumentSerializer(serializers.ModelSerializer):
+class TravelDocumentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for travel documents."""
+    expandable_fields = ('children',)
     children = TravelDocumentChildSerializer(many=True, read_only=True)
     created_by_username = serializers.CharField(
         source='created_by.username',
@@ -84,6 +157,34 @@ class TravelDocumentCreateSerializer(serializers.ModelSerializer):
         return document
 
 
+class TravelDocumentBulkCreateSerializer(serializers.Serializer):
+    """
+    Serializer for creating a batch of travel documents.
+    
+    The batch itself is validated with ``is_valid``; ``split_rows`` then
+    validates every document with one ``TravelDocumentCreateSerializer``
+    and separates the valid rows from the invalid ones.
+    """
+    MAX_DOCUMENTS = 500
+    
+    documents = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=MAX_DOCUMENTS
+    )
+    
+    def split_rows(self):
+        """Return ([(index, validated data)], [(index, errors)])."""
+        row_serializer = TravelDocumentCreateSerializer(context=self.context)
+        valid, invalid = [], []
+        for index, row in enumerate(self.validated_data['documents']):
+            try:
+                valid.append((index, row_serializer.run_validation(row)))
+            except serializers.ValidationError as exc:
+                invalid.append((index, exc.detail))
+        return valid, invalid
+
+
 class TravelDocumentUpdateSerializer(serializers.ModelSerializer):
     """Serializer for updating travel documents."""
     children = TravelDocumentChildSerializer(many=True, required=False)
@@ -132,8 +233,9 @@ class DegmadaFormMemberSerializer(serializers.ModelSerializer):
         ]
 
 
-class DegmadaFormSerializer(serializers.ModelSerializer):
+class DegmadaFormSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for degmada forms."""
+    expandable_fields = ('members',)
     members = DegmadaFormMemberSerializer(many=True, read_only=True)
     
     class Meta:
@@ -162,8 +264,9 @@ class KafiilkaFormMemberSerializer(serializers.ModelSerializer):
         ]
 
 
-class KafiilkaFormSerializer(serializers.ModelSerializer):
+class KafiilkaFormSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for kafiilka forms."""
+    expandable_fields = ('members',)
     members = KafiilkaFormMemberSerializer(many=True, read_only=True)
     sponsor_type_display = serializers.CharField(
         source='get_sponsor_type_display',
@@ -206,11 +309,79 @@ class DocumentSearchSerializer(serializers.Serializer):
     query = serializers.CharField(required=False, allow_blank=True)
     region = serializers.CharField(required=False, allow_blank=True)
     status = serializers.CharField(required=False, allow_blank=True)
+    phone_number = serializers.CharField(required=False, allow_blank=True)
+    identification_number = serializers.CharField(required=False, allow_blank=True)
     date_from = serializers.DateField(required=False)
     date_to = serializers.DateField(required=False)
     sort_by = serializers.CharField(required=False, default='-created_at')
 
 
+class NameSearchSerializer(serializers.Serializer):
+    """Serializer for fuzzy name search parameters."""
+    q = serializers.CharField()
+    entity = serializers.MultipleChoiceField(
+        choices=INDEXED_ENTITY_CHOICES,
+        required=False
+    )
+    limit = serializers.IntegerField(required=False, default=20, min_value=1, max_value=100)
+
+
+class NameMatchSerializer(serializers.Serializer):
+    """Serializer for fuzzy name search results."""
+    entity = serializers.CharField()
+    object_id = serializers.IntegerField()
+    name = serializers.CharField()
+    score = serializers.FloatField()
+
+
+class AutocompleteSerializer(serializers.Serializer):
+    """Serializer for autocomplete parameters."""
+    field = serializers.ChoiceField(choices=AUTOCOMPLETE_FIELD_CHOICES)
+    q = serializers.CharField(max_length=200)
+    limit = serializers.IntegerField(required=False, default=8, min_value=1, max_value=20)
+
+
+class RollupQuerySerializer(serializers.Serializer):
+    """Serializer for rollup drill-down parameters."""
+    group_by = serializers.CharField(required=False, allow_blank=True)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    
+    def validate_group_by(self, value):
+        return [dimension.strip() for dimension in value.split(',') if dimension.strip()]
+
+
+class SyncFeedSerializer(serializers.Serializer):
+    """Serializer for change feed parameters."""
+    sync_token = serializers.CharField(required=False, allow_blank=True)
+    region_office = serializers.CharField(required=False, allow_blank=True)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=1000)
+
+
+class LifecycleReportSerializer(serializers.Serializer):
+    """Serializer for time-in-state report parameters."""
+    status = serializers.ChoiceField(choices=TravelDocument.STATUS_CHOICES)
+    group_by = serializers.ChoiceField(
+        choices=['region_office', 'officer'],
+        required=False,
+        default='region_office'
+    )
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+
+class PersonRecordSerializer(serializers.Serializer):
+    """Serializer for one record linked to a person."""
+    entity = serializers.CharField()
+    object_id = serializers.IntegerField()
+    name = serializers.CharField()
+    reference = serializers.CharField()
+    form_id = serializers.IntegerField(allow_null=True)
+    phone = serializers.CharField()
+    birth_date = serializers.DateField(allow_null=True)
+    nationality = serializers.CharField()
+
+
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for users."""
     
@@ -233,12 +404,25 @@ class AuditLogSerializer(serializers.Serializer):
 class ExportRequestSerializer(serializers.Serializer):
     """Serializer for export requests."""
     format = serializers.ChoiceField(
-        choices=['csv', 'excel', 'pdf', 'json'],
+        choices=['csv', 'csv_gz', 'excel', 'pdf', 'json', 'ndjson'],
         default='excel'
     )
     filters = DocumentSearchSerializer(required=False)
+    # CSV columns, in order; the default set when omitted
+    columns = serializers.ListField(
+        child=serializers.ChoiceField(choices=list(ExportHelper.CSV_COLUMNS)),
+        required=False,
+        allow_empty=False
+    )
+    # Excel sheets, in order; only the documents sheet when omitted
+    sheets = serializers.ListField(
+        child=serializers.ChoiceField(choices=list(ExportHelper.EXCEL_SHEETS)),
+        required=False,
+        allow_empty=False
+    )
     include_children = serializers.BooleanField(default=True)
     include_photos = serializers.BooleanField(default=False)
+    background = serializers.BooleanField(default=False)
 
 
 class BulkOperationSerializer(serializers.Serializer):
@@ -249,4 +433,50 @@ class BulkOperationSerializer(serializers.Serializer):
     operation = serializers.ChoiceField(
         choices=['approve', 'print', 'delete', 'export']
     )
+    background = serializers.BooleanField(default=False)
+
+
+class PrintBatchSerializer(serializers.Serializer):
+    """Serializer for batch PDF printing requests."""
+    document_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        min_length=1,
+        max_length=1000
+    )
+    layout = serializers.ChoiceField(
+        choices=['document', 'card'],
+        default='document'
+    )
+    mark_printed = serializers.BooleanField(default=False)
+    background = serializers.BooleanField(default=False)
+
 
+class JobSerializer(serializers.ModelSerializer):
+    """Serializer for background jobs."""
+    
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'kind', 'status', 'progress', 'attempts', 'max_attempts',
+            'result', 'error', 'created_at', 'updated_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+
+class ExportArtifactSerializer(serializers.ModelSerializer):
+    """Serializer for stored export files."""
+    download_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ExportArtifact
+        fields = [
+            'id', 'format', 'params', 'size', 'created_at', 'expires_at',
+            'download_url'
+        ]
+        read_only_fields = fields
+    
+    def get_download_url(self, obj):
+        from rest_framework.reverse import reverse
+        return reverse(
+            'exportartifact-download', args=[obj.pk], request=self.context.get('request')
+        )
@@ -1,19 +1,31 @@
 """
 Service layer for business logic in the immigration application.
 """
+from django.conf import settings
 from django.db import transaction
 from django.utils import timezone
 from django.core.exceptions import ValidationError
-from .models import TravelDocument, DegmadaForm, KafiilkaForm
+from .models import TravelDocument, TravelDocumentChild, DegmadaForm, KafiilkaForm
 from .utils import (
     DocumentValidator, DocumentNumberGenerator,
     DataProcessor, NotificationHelper
 )
+from .search import get_search_backend
 
 
 class TravelDocumentService:
     """Service for handling travel document business logic."""
     
+    # Allowed status changes; other (e.g. blank) statuses may change freely
+    VALID_TRANSITIONS = {
+        'filled': ['approved'],
+        'approved': ['printed'],
+        'printed': []
+    }
+    
+    # Documents per transaction in bulk status changes
+    BULK_CHUNK_SIZE = 1000
+    
     @staticmethod
     @transaction.atomic
     def create_travel_document(form_data, files=None, user=None):
@@ -26,9 +38,7 @@ class TravelDocumentService:
         
         # Generate document number if not provided
         if not form_data.get('document_number'):
-            last_doc = TravelDocument.objects.order_by('-id').first()
-            last_id = last_doc.id if last_doc else 0
-            form_data['document_number'] = DocumentNumberGenerator.generate_travel_document_number(last_id)
+            form_data['document_number'] = DocumentNumberGenerator.generate_travel_document_number()
         
         # Create document
         document = TravelDocument.objects.create(**form_data)
@@ -44,16 +54,77 @@ class TravelDocumentService:
     
     @staticmethod
     @transaction.atomic
-    def update_document_status(document, new_status):
-        """Update document status with validation."""
+    def bulk_create_documents(rows, user=None):
+        """
+        Create many travel documents and their children in one transaction.
+        
+        ``rows`` are validated ``TravelDocumentCreateSerializer`` data.
+        Document numbers are reserved as one block and rows are inserted
+        with ``bulk_create``. That skips the model signals, so the search
+        and name indexes, counters and rollups are updated here in batches.
+        Returns the created documents in the order of ``rows``.
+        """
+        if not rows:
+            return []
+        
+        rows = [dict(row) for row in rows]
+        children_data = [row.pop('children', []) for row in rows]
+        numbers = DocumentNumberGenerator.reserve_travel_document_numbers(len(rows))
+        
+        documents = []
+        for row, number in zip(rows, numbers):
+            document = TravelDocument(document_number=number, created_by=user, **row)
+            document.refresh_lookup_fields()
+            documents.append(document)
+        documents = TravelDocument.objects.bulk_create(documents)
+        
+        if documents and documents[0].pk is None:
+            # The backend cannot return ids from bulk inserts
+            ids = dict(TravelDocument.objects.filter(
+                document_number__in=numbers
+            ).values_list('document_number', 'id'))
+            for document in documents:
+                document.pk = ids[document.document_number]
+        
+        TravelDocumentChild.objects.bulk_create([
+            TravelDocumentChild(document=document, **child_data)
+            for document, children in zip(documents, children_data)
+            for child_data in children
+        ])
+        
+        TravelDocumentService.index_new_documents(documents)
+        return documents
+    
+    @staticmethod
+    def index_new_documents(documents):
+        """Update derived data for documents inserted without save signals."""
+        from .names import NameIndex
+        from .persons import PersonIndex
+        from .search_cache import SearchResultCache
+        from .autocomplete import AutocompleteIndex
+        from .statistics import StatisticsCounters
+        from .rollups import RollupCube
+        
+        get_search_backend().index_documents(documents)
+        SearchResultCache.invalidate()
+        NameIndex.index_new(documents)
+        PersonIndex.index_new(documents)
+        AutocompleteIndex.add_instances(documents)
+        StatisticsCounters.record_created(documents)
+        RollupCube.record_created(documents)
+    
+    @staticmethod
+    @transaction.atomic
+    def update_document_status(document, new_status, user=None):
+        """
+        Update document status with validation.
+        
+        ``user`` is recorded as the officer of the status transition.
+        """
         old_status = document.status
         
         # Validate status transition
-        valid_transitions = {
-            'filled': ['approved'],
-            'approved': ['printed'],
-            'printed': []
-        }
+        valid_transitions = TravelDocumentService.VALID_TRANSITIONS
         
         if old_status in valid_transitions:
             if new_status not in valid_transitions[old_status]:
@@ -63,6 +134,7 @@ class TravelDocumentService:
         
         document.status = new_status
         document.updated_at = timezone.now()
+        document._status_changed_by = user
         document.save()
         
         # Send notification
@@ -71,14 +143,152 @@ class TravelDocumentService:
         return document
     
     @staticmethod
-    def approve_document(document):
+    def print_errors(document_ids, statuses=None):
+        """
+        Return ``{'id', 'error'}`` entries for documents that cannot be
+        marked printed; documents already printed are fine.
+        """
+        if statuses is None:
+            statuses = dict(
+                TravelDocument.objects.filter(id__in=document_ids).values_list('id', 'status')
+            )
+        errors = []
+        for document_id in document_ids:
+            current = statuses.get(document_id)
+            if current is None:
+                errors.append({'id': document_id, 'error': 'Document not found'})
+                continue
+            allowed = TravelDocumentService.VALID_TRANSITIONS.get(current)
+            if current != 'printed' and allowed is not None and 'printed' not in allowed:
+                errors.append({
+                    'id': document_id,
+                    'error': f"Cannot transition from {current} to printed"
+                })
+        return errors
+    
+    @staticmethod
+    @transaction.atomic
+    def bulk_update_status(document_ids, new_status, user=None):
+        """
+        Move many documents to ``new_status`` with set-based updates.
+        
+        The documents are read (and locked) once. Each allowed source status
+        is then moved with a single conditional UPDATE (``status = source``),
+        so the transition rules are enforced by the database. Because the
+        UPDATE skips model signals, counters, rollups, transition history
+        and the search cache are updated here in batches, and notifications
+        are sent as one batch. Returns a dict mapping every requested id to
+        None on success or an error message.
+        """
+        now = timezone.now()
+        rows = {
+            row['id']: row
+            for row in TravelDocument.objects.select_for_update().filter(
+                id__in=document_ids
+            ).values(
+                'id', 'status', 'created_at', 'region', 'district', 'nationality',
+                'region_office', 'document_number', 'full_name'
+            )
+        }
+        
+        outcomes = dict.fromkeys(document_ids)
+        sources = {}
+        for document_id in document_ids:
+            row = rows.get(document_id)
+            if row is None:
+                outcomes[document_id] = 'Document not found'
+                continue
+            
+            allowed = TravelDocumentService.VALID_TRANSITIONS.get(row['status'])
+            if allowed is not None and new_status not in allowed:
+                outcomes[document_id] = f"Cannot transition from {row['status']} to {new_status}"
+            else:
+                sources.setdefault(row['status'], set()).add(document_id)
+        
+        changed = []
+        for source, ids in sources.items():
+            TravelDocument.objects.filter(id__in=ids, status=source).update(
+                status=new_status,
+                updated_at=now
+            )
+            changed.extend(rows[document_id] for document_id in ids)
+        
+        if changed:
+            from .search_cache import SearchResultCache
+            from .statistics import StatisticsCounters
+            from .rollups import RollupCube
+            from .lifecycle import LifecycleTracker
+            
+            values = {'status': new_status}
+            StatisticsCounters.record_updated(TravelDocument, changed, values)
+            RollupCube.record_updated(TravelDocument, changed, values)
+            LifecycleTracker.record_transitions(changed, new_status, officer=user, occurred_at=now)
+            SearchResultCache.invalidate()
+            NotificationHelper.send_bulk_status_notification(changed, new_status)
+        
+        return outcomes
+    
+    @staticmethod
+    def bulk_operation(document_ids, operation, user=None, progress=None):
+        """
+        Apply a bulk operation and return a result entry per document.
+        
+        Status changes run in chunks of BULK_CHUNK_SIZE documents, each in
+        its own transaction; ``progress(done, total)`` is called as they
+        complete.
+        """
+        total = len(document_ids)
+        results = []
+        
+        if operation in ('approve', 'print'):
+            new_status, message = {
+                'approve': ('approved', 'Document approved'),
+                'print': ('printed', 'Document marked as printed'),
+            }[operation]
+            for start in range(0, total, TravelDocumentService.BULK_CHUNK_SIZE):
+                chunk = document_ids[start:start + TravelDocumentService.BULK_CHUNK_SIZE]
+                outcomes = TravelDocumentService.bulk_update_status(chunk, new_status, user)
+                results.extend(
+                    {
+                        'document_id': document_id,
+                        'status': 'error' if error else 'success',
+                        'message': error or message
+                    }
+                    for document_id, error in outcomes.items()
+                )
+                if progress:
+                    progress(start + len(chunk), total)
+            return results
+        
+        documents = TravelDocument.objects.filter(id__in=document_ids)
+        for done, document in enumerate(documents, 1):
+            try:
+                if operation == 'delete':
+                    document.delete()
+                    results.append({
+                        'document_id': document.id,
+                        'status': 'success',
+                        'message': 'Document deleted'
+                    })
+            except Exception as e:
+                results.append({
+                    'document_id': document.id,
+                    'status': 'error',
+                    'message': str(e)
+                })
+            if progress:
+                progress(done, total)
+        return results
+    
+    @staticmethod
+    def approve_document(document, user=None):
         """Approve a travel document."""
-        return TravelDocumentService.update_document_status(document, 'approved')
+        return TravelDocumentService.update_document_status(document, 'approved', user)
     
     @staticmethod
-    def print_document(document):
+    def print_document(document, user=None):
         """Mark document as printed."""
-        return TravelDocumentService.update_document_status(document, 'printed')
+        return TravelDocumentService.update_document_status(document, 'printed', user)
     
     @staticmethod
     def get_document_statistics():
@@ -108,23 +318,32 @@ class TravelDocumentService:
         """Search documents with various filters."""
         qs = TravelDocument.objects.all()
         
-        if query:
-            qs = qs.filter(
-                Q(full_name__icontains=query) |
-                Q(document_number__icontains=query) |
-                Q(identification_number__icontains=query)
-            )
-        
         if filters:
             if filters.get('region'):
                 qs = qs.filter(region=filters['region'])
             if filters.get('status'):
                 qs = qs.filter(status=filters['status'])
+            if filters.get('phone_number'):
+                qs = qs.filter(
+                    phone_number_normalized=DataProcessor.normalize_phone_number(
+                        filters['phone_number']
+                    )
+                )
+            if filters.get('identification_number'):
+                qs = qs.filter(
+                    identification_number_normalized=DataProcessor.normalize_identification_number(
+                        filters['identification_number']
+                    )
+                )
             if filters.get('date_from'):
                 qs = qs.filter(created_at__gte=filters['date_from'])
             if filters.get('date_to'):
                 qs = qs.filter(created_at__lte=filters['date_to'])
         
+        if query:
+            # Ranked by relevance
+            return get_search_backend().search(qs, query)
+        
         return qs.order_by('-created_at')
 
 
@@ -284,61 +503,293 @@ class AuditService:
 class ExportService:
     """Service for exporting data in various formats."""
     
+    # Streamed formats -> (content type, file extension)
+    STREAMED_FORMATS = {
+        'json': ('application/json', 'json'),
+        'ndjson': ('application/x-ndjson', 'ndjson'),
+        'csv': ('text/csv; charset=utf-8', 'csv'),
+        'csv_gz': ('application/gzip', 'csv.gz'),
+    }
+    
+    # Formats the export endpoint can produce
+    FORMATS = ('excel',) + tuple(STREAMED_FORMATS)
+    
     @staticmethod
-    def export_to_excel(documents, filename=None):
-        """Export documents to Excel format."""
-        from django.http import HttpResponse
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment
-        
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Travel Documents"
+    def export_to_excel(documents, filename=None, progress=None, filters=None, sheets=None):
+        """
+        Export documents to Excel format.
+        
+        The workbook is written to a temporary file and streamed from there;
+        see ``write_excel`` for the sheets.
+        """
+        import tempfile
+        from django.http import FileResponse
+        
+        output = tempfile.TemporaryFile()
+        ExportService.write_excel(
+            output,
+            ExportService.excel_querysets(documents, filters, sheets),
+            progress=progress
+        )
+        output.seek(0)
         
-        # Headers
-        headers = [
-            'Document Number', 'Full Name', 'Date', 'Region',
-            'District', 'Sponsor', 'Status', 'Created At'
-        ]
-        ws.append(headers)
-        
-        # Style headers
-        for cell in ws[1]:
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal='center')
-        
-        # Data rows
-        for doc in documents:
-            ws.append([
-                doc.document_number,
-                doc.full_name,
-                doc.date.strftime('%Y-%m-%d') if doc.date else '',
-                doc.region,
-                doc.district,
-                doc.sponsor_name,
-                doc.get_status_display(),
-                doc.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            ])
-        
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        response = HttpResponse(
+        filename = filename or f'travel_documents_{timezone.now().strftime("%Y%m%d")}.xlsx'
+        return FileResponse(
+            output,
+            as_attachment=True,
+            filename=filename,
             content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         )
-        filename = filename or f'travel_documents_{timezone.now().strftime("%Y%m%d")}.xlsx'
+    
+    @staticmethod
+    def excel_querysets(documents, filters=None, sheets=None):
+        """
+        Return the (sheet, queryset) pairs of an Excel export.
+        
+        Children belong to the exported documents; forms are limited to the
+        ``date_from``/``date_to`` filters and members belong to those forms.
+        Only the documents sheet is exported by default.
+        """
+        from .models import DegmadaFormMember, KafiilkaFormMember
+        
+        filters = filters or {}
+        forms = {}
+        for model in (DegmadaForm, KafiilkaForm):
+            queryset = model.objects.order_by('-created_at')
+            if filters.get('date_from'):
+                queryset = queryset.filter(created_at__gte=filters['date_from'])
+            if filters.get('date_to'):
+                queryset = queryset.filter(created_at__lte=filters['date_to'])
+            forms[model] = queryset
+        
+        querysets = {
+            'documents': documents,
+            'children': TravelDocumentChild.objects.filter(
+                document__in=documents.order_by().values('pk')
+            ).order_by('document_id', 'id'),
+            'degmada_forms': forms[DegmadaForm],
+            'degmada_members': DegmadaFormMember.objects.filter(
+                form__in=forms[DegmadaForm].order_by().values('pk')
+            ).order_by('form_id', 'id'),
+            'kafiilka_forms': forms[KafiilkaForm],
+            'kafiilka_members': KafiilkaFormMember.objects.filter(
+                form__in=forms[KafiilkaForm].order_by().values('pk')
+            ).order_by('form_id', 'id'),
+        }
+        return [(sheet, querysets[sheet]) for sheet in sheets or ['documents']]
+    
+    @staticmethod
+    def write_excel(output, sheets, progress=None):
+        """
+        Write an XLSX workbook of (sheet, queryset) pairs to a file object.
+        
+        The workbook is write-only: rows go from a chunked query iterator to
+        openpyxl's temporary files in one pass and are never all in memory.
+        Column widths must be set before the first row is written, so they
+        are measured on the headers and the first EXPORT_CHUNK_SIZE rows.
+        """
+        from itertools import chain, islice
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, Alignment
+        from openpyxl.utils import get_column_letter
+        from .utils import ExportHelper
+        
+        chunk_size = getattr(settings, 'EXPORT_CHUNK_SIZE', 1000)
+        total = sum(queryset.count() for sheet, queryset in sheets) if progress else 0
+        done = 0
+        
+        wb = Workbook(write_only=True)
+        for sheet, queryset in sheets:
+            title, columns = ExportHelper.EXCEL_SHEETS[sheet]
+            ws = wb.create_sheet(title)
+            headers = [header for header, column in columns]
+            rows = ExportHelper.iter_rows(
+                queryset, [column for header, column in columns], chunk_size
+            )
+            
+            first = list(islice(rows, chunk_size))
+            for index, header in enumerate(headers):
+                longest = max([len(header)] + [len(str(row[index])) for row in first])
+                ws.column_dimensions[get_column_letter(index + 1)].width = min(longest + 2, 50)
+            
+            header_cells = []
+            for header in headers:
+                cell = WriteOnlyCell(ws, value=header)
+                cell.font = Font(bold=True)
+                cell.alignment = Alignment(horizontal='center')
+                header_cells.append(cell)
+            ws.append(header_cells)
+            
+            for row in chain(first, rows):
+                ws.append(row)
+                done += 1
+                if progress and done % chunk_size == 0:
+                    progress(done, total)
+        
+        wb.save(output)
+        if progress:
+            progress(done, total)
+    
+    @staticmethod
+    def iter_document_batches(documents, progress=None):
+        """
+        Yield the serialized documents in batches of EXPORT_CHUNK_SIZE.
+        
+        Rows are read with a chunked database iterator and the children of
+        each batch with one query, so memory stays flat whatever the number
+        of documents. ``progress(done, total)`` is called after each batch.
+        """
+        from itertools import islice
+        from .fast_serializers import FastSerializer
+        from .serializers import TravelDocumentSerializer
+        
+        chunk_size = getattr(settings, 'EXPORT_CHUNK_SIZE', 1000)
+        total = documents.count() if progress else 0
+        
+        fast = FastSerializer(TravelDocumentSerializer())
+        if fast.supported:
+            rows = fast.rows(documents).iterator(chunk_size=chunk_size)
+            serialize = fast.serialize
+        else:
+            plan = TravelDocumentSerializer().get_query_plan()
+            rows = documents.select_related(
+                *plan['select_related']
+            ).prefetch_related(*plan['prefetch_related']).iterator(chunk_size=chunk_size)
+            serialize = lambda batch: TravelDocumentSerializer(batch, many=True).data
+        
+        done = 0
+        while True:
+            batch = list(islice(rows, chunk_size))
+            if not batch:
+                break
+            yield serialize(batch)
+            done += len(batch)
+            if progress:
+                progress(done, total)
+    
+    @staticmethod
+    def stream_json(documents, ndjson=False, progress=None):
+        """
+        Yield an export as text chunks, one per batch of documents.
+        
+        The JSON form is ``{"documents": [...]}`` as before; NDJSON puts
+        one document per line.
+        """
+        import json
+        from django.core.serializers.json import DjangoJSONEncoder
+        
+        def dumps(data):
+            return json.dumps(data, cls=DjangoJSONEncoder)
+        
+        if ndjson:
+            for batch in ExportService.iter_document_batches(documents, progress):
+                yield ''.join(dumps(data) + '\n' for data in batch)
+            return
+        
+        separator = ''
+        yield '{"documents": ['
+        for batch in ExportService.iter_document_batches(documents, progress):
+            yield separator + ', '.join(dumps(data) for data in batch)
+            separator = ', '
+        yield ']}'
+    
+    @staticmethod
+    def stream_csv(documents, columns=None, compress=False, progress=None):
+        """
+        Yield a CSV export as encoded chunks of EXPORT_CHUNK_SIZE rows.
+        
+        With ``compress`` the chunks form a gzip file.
+        """
+        import csv
+        import io
+        import zlib
+        from .utils import ExportHelper
+        
+        chunk_size = getattr(settings, 'EXPORT_CHUNK_SIZE', 1000)
+        total = documents.count() if progress else 0
+        headers, rows = ExportHelper.prepare_csv_data(documents, columns, chunk_size)
+        # wbits=31 writes a gzip header and trailer
+        compressor = zlib.compressobj(wbits=31) if compress else None
+        
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(headers)
+        done = 0
+        while True:
+            for row in rows:
+                writer.writerow(row)
+                done += 1
+                if done % chunk_size == 0:
+                    break
+            else:
+                break
+            
+            chunk = buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            yield compressor.compress(chunk) if compressor else chunk
+            if progress:
+                progress(done, total)
+        
+        chunk = buffer.getvalue().encode('utf-8')
+        if compressor:
+            chunk = compressor.compress(chunk) + compressor.flush()
+        yield chunk
+        if progress:
+            progress(done, total)
+    
+    @staticmethod
+    def stream_export(format_type, documents, columns=None, progress=None):
+        """Return the chunk generator of a streamed export format."""
+        if format_type in ('json', 'ndjson'):
+            return ExportService.stream_json(
+                documents, ndjson=format_type == 'ndjson', progress=progress
+            )
+        return ExportService.stream_csv(
+            documents, columns, compress=format_type == 'csv_gz', progress=progress
+        )
+    
+    @staticmethod
+    def export_streamed(format_type, documents, columns=None, filename=None):
+        """Export documents as a streamed response in one of STREAMED_FORMATS."""
+        from django.http import StreamingHttpResponse
+        
+        content_type, extension = ExportService.STREAMED_FORMATS[format_type]
+        response = StreamingHttpResponse(
+            ExportService.stream_export(format_type, documents, columns),
+            content_type=content_type
+        )
+        filename = filename or f'travel_documents_{timezone.now().strftime("%Y%m%d")}.{extension}'
         response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        wb.save(response)
         return response
-
+    
+    @staticmethod
+    def export_to_storage(format_type, filters, name, columns=None, sheets=None, progress=None):
+        """
+        Write an export to the default storage and return the stored name.
+        
+        ``name`` is the file path without its extension.
+        """
+        import tempfile
+        from django.core.files import File
+        from django.core.files.storage import default_storage
+        
+        if format_type != 'excel' and format_type not in ExportService.STREAMED_FORMATS:
+            raise ValueError(f'Export format not yet implemented: {format_type}')
+        documents = TravelDocumentService.search_documents(filters.get('query'), filters)
+        
+        with tempfile.TemporaryFile() as output:
+            if format_type == 'excel':
+                ExportService.write_excel(
+                    output,
+                    ExportService.excel_querysets(documents, filters, sheets),
+                    progress=progress
+                )
+                extension = 'xlsx'
+            else:
+                for chunk in ExportService.stream_export(format_type, documents, columns, progress):
+                    output.write(chunk if isinstance(chunk, bytes) else chunk.encode('utf-8'))
+                extension = ExportService.STREAMED_FORMATS[format_type][1]
+            output.seek(0)
+            return default_storage.save(f'{name}.{extension}', File(output))
@@ -1,22 +1,40 @@
 """
 Signals for the immigration application.
 """
-from django.db.models.signals import post_save, pre_save, pre_delete
+from django.db.models.signals import post_save, pre_save, pre_delete, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
 from .models import (
     TravelDocument, DegmadaForm, KafiilkaForm,
     TravelDocumentChild, DegmadaFormMember, KafiilkaFormMember
 )
+from .search import get_search_backend
+from .names import NameIndex, NAME_SOURCES
+from .persons import PersonIndex, PERSON_SOURCES
+from .search_cache import SearchResultCache
+from .autocomplete import AutocompleteIndex
+from .statistics import StatisticsCounters
+from .rollups import RollupCube
+from .lifecycle import LifecycleTracker
+from .sync import SyncFeed
+
+
+@receiver(pre_save, sender=TravelDocument)
+@receiver(pre_save, sender=DegmadaForm)
+@receiver(pre_save, sender=KafiilkaForm)
+def remember_previous_state(sender, instance, raw=False, **kwargs):
+    """Keep the stored values of an updated record for post_save handlers."""
+    instance._previous_state = None
+    if instance.pk and not raw:
+        instance._previous_state = sender.objects.filter(pk=instance.pk).values().first()
 
 
 @receiver(pre_save, sender=TravelDocument)
 def generate_document_number(sender, instance, **kwargs):
     """Generate document number if not provided."""
     if not instance.document_number:
-        last_doc = TravelDocument.objects.order_by('-id').first()
-        last_id = last_doc.id if last_doc else 0
-        instance.document_number = f"TD-{str(last_id + 1).zfill(5)}"
+        from .utils import DocumentNumberGenerator
+        instance.document_number = DocumentNumberGenerator.generate_travel_document_number()
 
 
 @receiver(pre_save, sender=TravelDocument)
@@ -48,6 +66,137 @@ def log_document_creation(sender, instance, created, **kwargs):
         pass
 
 
+@receiver(post_save, sender=TravelDocument)
+def update_search_index(sender, instance, **kwargs):
+    """Keep the full-text search index in sync with the document."""
+    get_search_backend().index_document(instance)
+
+
+@receiver(post_delete, sender=TravelDocument)
+def remove_from_search_index(sender, instance, **kwargs):
+    """Drop a deleted document from the full-text search index."""
+    get_search_backend().remove_document(instance.pk)
+
+
+@receiver(post_save, sender=TravelDocument)
+@receiver(post_delete, sender=TravelDocument)
+def invalidate_search_cache(sender, instance, **kwargs):
+    """Expire cached search results after any document write."""
+    SearchResultCache.invalidate()
+
+
+@receiver(post_save, sender=TravelDocument)
+@receiver(post_save, sender=DegmadaForm)
+@receiver(post_save, sender=KafiilkaForm)
+def update_autocomplete_index(sender, instance, **kwargs):
+    """Add new values to the autocomplete index and retire replaced ones."""
+    AutocompleteIndex.update_instance(instance, getattr(instance, '_previous_state', None))
+
+
+@receiver(post_delete, sender=TravelDocument)
+@receiver(post_delete, sender=DegmadaForm)
+@receiver(post_delete, sender=KafiilkaForm)
+def remove_from_autocomplete_index(sender, instance, **kwargs):
+    """Retire the values of a deleted record from the autocomplete index."""
+    AutocompleteIndex.remove_instance(instance)
+
+
+@receiver(post_save, sender=TravelDocument)
+@receiver(post_save, sender=DegmadaForm)
+@receiver(post_save, sender=KafiilkaForm)
+def update_statistics_counters(sender, instance, created, **kwargs):
+    """Count new records and move changed ones between status/day counters."""
+    StatisticsCounters.record_saved(
+        instance, created, getattr(instance, '_previous_state', None)
+    )
+
+
+@receiver(post_delete, sender=TravelDocument)
+@receiver(post_delete, sender=DegmadaForm)
+@receiver(post_delete, sender=KafiilkaForm)
+def decrement_statistics_counters(sender, instance, **kwargs):
+    """Remove a deleted record from the statistics counters."""
+    StatisticsCounters.record_deleted(instance)
+
+
+@receiver(post_save, sender=TravelDocument)
+@receiver(post_save, sender=DegmadaForm)
+@receiver(post_save, sender=KafiilkaForm)
+def update_rollup_cube(sender, instance, created, **kwargs):
+    """Move a new or changed record into its rollup cell."""
+    RollupCube.record_saved(
+        instance, created, getattr(instance, '_previous_state', None)
+    )
+
+
+@receiver(post_delete, sender=TravelDocument)
+@receiver(post_delete, sender=DegmadaForm)
+@receiver(post_delete, sender=KafiilkaForm)
+def remove_from_rollup_cube(sender, instance, **kwargs):
+    """Remove a deleted record from its rollup cell."""
+    RollupCube.record_deleted(instance)
+
+
+@receiver(post_save, sender=TravelDocument)
+def record_status_transition(sender, instance, created, **kwargs):
+    """Record a status change for lifecycle reporting."""
+    previous = getattr(instance, '_previous_state', None)
+    if created or not previous or previous['status'] == instance.status:
+        return
+    
+    LifecycleTracker.record_transition(
+        instance,
+        previous['status'],
+        instance.status,
+        officer=getattr(instance, '_status_changed_by', None)
+    )
+
+
+@receiver(post_save, sender=TravelDocument)
+@receiver(post_save, sender=DegmadaFormMember)
+@receiver(post_save, sender=KafiilkaFormMember)
+def update_name_index(sender, instance, **kwargs):
+    """Keep the fuzzy name index in sync with the person's name."""
+    NameIndex.index_instance(instance)
+
+
+@receiver(post_delete, sender=TravelDocument)
+@receiver(post_delete, sender=DegmadaFormMember)
+@receiver(post_delete, sender=KafiilkaFormMember)
+def remove_from_name_index(sender, instance, **kwargs):
+    """Drop a deleted person from the fuzzy name index."""
+    for entity, (model, field) in NAME_SOURCES.items():
+        if sender is model:
+            NameIndex.remove(entity, instance.pk)
+
+
+@receiver(post_save, sender=TravelDocument)
+@receiver(post_save, sender=DegmadaFormMember)
+@receiver(post_save, sender=KafiilkaFormMember)
+def update_person_index(sender, instance, **kwargs):
+    """Keep the person index in sync with the person's ID and details."""
+    PersonIndex.index_instance(instance)
+
+
+@receiver(post_save, sender=DegmadaForm)
+@receiver(post_save, sender=KafiilkaForm)
+def update_person_index_reference(sender, instance, created, **kwargs):
+    """Copy a changed form reference onto its members' index entries."""
+    if not created:
+        entity = 'degmadamember' if sender is DegmadaForm else 'kafiilkamember'
+        PersonIndex.update_form_reference(entity, instance)
+
+
+@receiver(pre_delete, sender=TravelDocument)
+@receiver(pre_delete, sender=DegmadaFormMember)
+@receiver(pre_delete, sender=KafiilkaFormMember)
+def remove_from_person_index(sender, instance, **kwargs):
+    """Drop a deleted person record from the person index."""
+    for entity, (model, field) in PERSON_SOURCES.items():
+        if sender is model:
+            PersonIndex.remove(entity, instance.pk)
+
+
 @receiver(pre_save, sender=DegmadaForm)
 def generate_degmada_reference(sender, instance, **kwargs):
     """Generate reference if not provided."""
@@ -171,3 +320,36 @@ def auto_approve_if_ready(sender, instance, **kwargs):
             # For now, just leave it as filled
             pass
 
+
+@receiver(post_save, sender=TravelDocumentChild)
+@receiver(post_delete, sender=TravelDocumentChild)
+@receiver(post_save, sender=DegmadaFormMember)
+@receiver(post_delete, sender=DegmadaFormMember)
+@receiver(post_save, sender=KafiilkaFormMember)
+@receiver(post_delete, sender=KafiilkaFormMember)
+def touch_parent(sender, instance, raw=False, **kwargs):
+    """Move the parent's updated_at so its ETag changes with nested rows."""
+    if raw:
+        return
+    field = 'document' if sender is TravelDocumentChild else 'form'
+    parent_model = sender._meta.get_field(field).related_model
+    parent_model.objects.filter(
+        pk=getattr(instance, f'{field}_id')
+    ).update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=TravelDocument)
+@receiver(post_delete, sender=DegmadaForm)
+@receiver(post_delete, sender=KafiilkaForm)
+def leave_tombstone(sender, instance, **kwargs):
+    """Record the deletion for the sync feed."""
+    SyncFeed.record_deletion(instance)
+
+
+@receiver(post_save, sender=TravelDocument)
+@receiver(post_save, sender=DegmadaForm)
+@receiver(post_save, sender=KafiilkaForm)
+def leave_move_tombstone(sender, instance, created, **kwargs):
+    """Remove a record from its old office's sync feed when it changes office."""
+    if not created:
+        SyncFeed.record_move(instance, getattr(instance, '_previous_state', None))
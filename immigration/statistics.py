@@ -0,0 +1,190 @@
+"""
+Incrementally maintained statistics counters.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import TravelDocument, DegmadaForm, KafiilkaForm, StatisticsCounter
+
+
+# Model -> counter name prefix
+COUNTED_MODELS = {
+    TravelDocument: 'traveldocument',
+    DegmadaForm: 'degmadaform',
+    KafiilkaForm: 'kafiilkaform',
+}
+
+
+class StatisticsCounters:
+    """Maintain and read the statistics counter table."""
+    
+    @staticmethod
+    def counter_names(prefix, created_at, status=None):
+        """Return the counters a record with these values contributes to."""
+        names = [f'{prefix}:total']
+        if prefix == 'traveldocument':
+            names.append(f'{prefix}:status:{status or "none"}')
+        if created_at:
+            names.append(f'{prefix}:day:{timezone.localdate(created_at).isoformat()}')
+        return names
+    
+    @staticmethod
+    def instance_names(instance, values=None):
+        """
+        Return the counters of an instance.
+        
+        ``values`` may be a dict of stored column values, e.g. the previous
+        state of a record, to read instead of the instance attributes.
+        """
+        prefix = COUNTED_MODELS[type(instance)]
+        if values is None:
+            values = {
+                'created_at': instance.created_at,
+                'status': getattr(instance, 'status', None),
+            }
+        return StatisticsCounters.counter_names(
+            prefix, values.get('created_at'), values.get('status')
+        )
+    
+    @staticmethod
+    @transaction.atomic
+    def apply(deltas):
+        """Add a {counter name: delta} mapping to the stored counters."""
+        for name, delta in deltas.items():
+            if not delta:
+                continue
+            
+            counters = StatisticsCounter.objects.filter(name=name)
+            if counters.update(value=F('value') + delta, updated_at=timezone.now()):
+                continue
+            try:
+                with transaction.atomic():
+                    StatisticsCounter.objects.create(name=name, value=delta)
+            except IntegrityError:
+                # Another writer created the counter first
+                counters.update(value=F('value') + delta, updated_at=timezone.now())
+    
+    @staticmethod
+    def record_saved(instance, created, previous=None):
+        """Update the counters after a record is created or changed."""
+        deltas = Counter(StatisticsCounters.instance_names(instance))
+        if not created:
+            if previous is None:
+                return
+            deltas.subtract(StatisticsCounters.instance_names(instance, previous))
+        StatisticsCounters.apply(deltas)
+    
+    @staticmethod
+    def record_created(instances):
+        """Count newly created records that bypassed the save signals."""
+        deltas = Counter()
+        for instance in instances:
+            deltas.update(StatisticsCounters.instance_names(instance))
+        StatisticsCounters.apply(deltas)
+    
+    @staticmethod
+    def record_updated(model, rows, values):
+        """
+        Move records changed by a queryset update to their new counters.
+        
+        ``rows`` are dicts of the records' previous column values and
+        ``values`` the columns the update set.
+        """
+        prefix = COUNTED_MODELS[model]
+        deltas = Counter()
+        for row in rows:
+            new = {**row, **values}
+            deltas.update(StatisticsCounters.counter_names(
+                prefix, new.get('created_at'), new.get('status')
+            ))
+            deltas.subtract(StatisticsCounters.counter_names(
+                prefix, row.get('created_at'), row.get('status')
+            ))
+        StatisticsCounters.apply(deltas)
+    
+    @staticmethod
+    def record_deleted(instance):
+        """Update the counters after a record is deleted."""
+        StatisticsCounters.apply({
+            name: -1 for name in StatisticsCounters.instance_names(instance)
+        })
+    
+    @staticmethod
+    def count_all():
+        """Recompute every counter from the stored records."""
+        counts = Counter()
+        for model, prefix in COUNTED_MODELS.items():
+            counts[f'{prefix}:total'] = model.objects.count()
+            
+            if prefix == 'traveldocument':
+                for status, count in model.objects.values_list('status').annotate(
+                    count=Count('id')
+                ).order_by():
+                    counts[f'{prefix}:status:{status or "none"}'] += count
+            
+            days = model.objects.annotate(
+                day=TruncDate('created_at')
+            ).values_list('day').annotate(count=Count('id')).order_by()
+            for day, count in days:
+                if day:
+                    counts[f'{prefix}:day:{day.isoformat()}'] += count
+        return counts
+    
+    @staticmethod
+    @transaction.atomic
+    def rebuild():
+        """Replace every counter with a fresh count and return how many."""
+        counts = StatisticsCounters.count_all()
+        StatisticsCounter.objects.all().delete()
+        StatisticsCounter.objects.bulk_create([
+            StatisticsCounter(name=name, value=value)
+            for name, value in counts.items()
+        ], batch_size=1000)
+        return len(counts)
+    
+    @staticmethod
+    def dashboard(days=30):
+        """
+        Return the dashboard statistics with a single primary-key lookup.
+        
+        Recent counts add up the per-day counters of the last ``days`` days,
+        today included.
+        """
+        today = timezone.localdate()
+        recent_days = [(today - timedelta(days=offset)).isoformat() for offset in range(days)]
+        
+        names = [f'{prefix}:total' for prefix in COUNTED_MODELS.values()]
+        names += [
+            f'traveldocument:status:{status}'
+            for status, label in TravelDocument.STATUS_CHOICES
+        ]
+        names += [
+            f'{prefix}:day:{day}'
+            for prefix in COUNTED_MODELS.values()
+            for day in recent_days
+        ]
+        values = dict(
+            StatisticsCounter.objects.filter(name__in=names).values_list('name', 'value')
+        )
+        
+        def recent(prefix):
+            return sum(values.get(f'{prefix}:day:{day}', 0) for day in recent_days)
+        
+        return {
+            'total_documents': values.get('traveldocument:total', 0),
+            'approved_documents': values.get('traveldocument:status:approved', 0),
+            'filled_documents': values.get('traveldocument:status:filled', 0),
+            'printed_documents': values.get('traveldocument:status:printed', 0),
+            'recent_documents': recent('traveldocument'),
+            
+            'total_degmada': values.get('degmadaform:total', 0),
+            'total_kafiilka': values.get('kafiilkaform:total', 0),
+            
+            'recent_degmada': recent('degmadaform'),
+            'recent_kafiilka': recent('kafiilkaform'),
+        }
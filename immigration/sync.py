@@ -0,0 +1,177 @@
+"""
+Change feed that lets regional offices download only what changed.
+"""
+import base64
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import TravelDocument, DegmadaForm, KafiilkaForm, Tombstone
+
+# Feed key -> (model, field holding the record's regional office)
+SYNC_SOURCES = {
+    'travel_documents': (TravelDocument, 'region_office'),
+    'degmada_forms': (DegmadaForm, 'gobolka'),
+    'kafiilka_forms': (KafiilkaForm, 'gobolka'),
+}
+
+
+class InvalidSyncToken(ValueError):
+    """Raised for a sync token that cannot be decoded."""
+
+
+class SyncFeed:
+    """
+    Read the records changed and deleted after a sync token.
+    
+    Each source is paged by keyset on (updated_at, id) and deletions on
+    (deleted_at, id), so every page costs one indexed range scan per
+    source. The token is the last position read from each of them. Only
+    changes older than SYNC_FEED_SETTLE_SECONDS are returned: a slow
+    transaction can commit a row whose updated_at is slightly in the past,
+    and reading right up to the present would skip it for good.
+    
+    A record that changes office is reported to its old office as deleted;
+    the full feed leaves such moves out, since the record still exists.
+    """
+    
+    @staticmethod
+    def encode_token(positions):
+        """Encode {stream: (timestamp, id)} positions into an opaque token."""
+        data = {
+            stream: [moment.isoformat(), pk]
+            for stream, (moment, pk) in positions.items()
+        }
+        return base64.urlsafe_b64encode(
+            json.dumps(data, separators=(',', ':'), sort_keys=True).encode('utf-8')
+        ).decode('ascii')
+    
+    @staticmethod
+    def decode_token(token):
+        """Decode a token into positions; an empty token starts from the beginning."""
+        if not token:
+            return {}
+        try:
+            data = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+            return {
+                stream: (datetime.fromisoformat(moment), int(pk))
+                for stream, (moment, pk) in data.items()
+            }
+        except (ValueError, TypeError, AttributeError, UnicodeError):
+            raise InvalidSyncToken('Invalid sync token')
+    
+    @staticmethod
+    def after(queryset, field, position, horizon, limit):
+        """Return up to ``limit + 1`` rows after ``position``, oldest first."""
+        queryset = queryset.filter(**{f'{field}__lte': horizon})
+        if position is not None:
+            moment, pk = position
+            queryset = queryset.filter(
+                Q(**{f'{field}__gt': moment}) | Q(**{field: moment, 'id__gt': pk})
+            )
+        return list(queryset.order_by(field, 'id')[:limit + 1])
+    
+    @staticmethod
+    def read(token=None, region_office=None, limit=None, context=None):
+        """
+        Return the next page of the feed.
+        
+        The page holds the serialized changed records of every source, the
+        deletions as ``{'entity', 'id', 'deleted_at'}`` entries and the
+        token to pass next time. ``has_more`` is True when a source had
+        more than ``limit`` changes and the client should fetch again.
+        """
+        from .serializers import (
+            TravelDocumentSerializer, DegmadaFormSerializer, KafiilkaFormSerializer
+        )
+        serializers = {
+            'travel_documents': TravelDocumentSerializer,
+            'degmada_forms': DegmadaFormSerializer,
+            'kafiilka_forms': KafiilkaFormSerializer,
+        }
+        
+        positions = SyncFeed.decode_token(token)
+        limit = limit or getattr(settings, 'SYNC_FEED_PAGE_SIZE', 500)
+        horizon = timezone.now() - timedelta(
+            seconds=getattr(settings, 'SYNC_FEED_SETTLE_SECONDS', 5)
+        )
+        page = {'has_more': False}
+        
+        for key, (model, office_field) in SYNC_SOURCES.items():
+            serializer = serializers[key](context=context)
+            plan = serializer.get_query_plan()
+            queryset = model.objects.select_related(
+                *plan['select_related']
+            ).prefetch_related(*plan['prefetch_related'])
+            if region_office:
+                queryset = queryset.filter(**{office_field: region_office})
+            
+            rows = SyncFeed.after(queryset, 'updated_at', positions.get(key), horizon, limit)
+            if len(rows) > limit:
+                page['has_more'] = True
+                rows = rows[:limit]
+            if rows:
+                positions[key] = (rows[-1].updated_at, rows[-1].id)
+            page[key] = serializers[key](rows, many=True, context=context).data
+        
+        tombstones = Tombstone.objects.all()
+        if region_office:
+            tombstones = tombstones.filter(region_office=region_office)
+        else:
+            tombstones = tombstones.filter(moved=False)
+        rows = SyncFeed.after(tombstones, 'deleted_at', positions.get('deleted'), horizon, limit)
+        if len(rows) > limit:
+            page['has_more'] = True
+            rows = rows[:limit]
+        if rows:
+            positions['deleted'] = (rows[-1].deleted_at, rows[-1].id)
+        feed_keys = {model._meta.model_name: key for key, (model, field) in SYNC_SOURCES.items()}
+        page['deleted'] = [
+            {'entity': feed_keys[row.entity], 'id': row.object_id, 'deleted_at': row.deleted_at}
+            for row in rows
+        ]
+        
+        page['sync_token'] = SyncFeed.encode_token(positions)
+        return page
+    
+    @staticmethod
+    def record_deletion(instance):
+        """Leave a tombstone for a deleted record."""
+        for key, (model, office_field) in SYNC_SOURCES.items():
+            if isinstance(instance, model):
+                Tombstone.objects.create(
+                    entity=model._meta.model_name,
+                    object_id=instance.pk,
+                    region_office=getattr(instance, office_field)
+                )
+                return
+    
+    @staticmethod
+    def record_move(instance, previous):
+        """
+        Leave a tombstone for the old office of a record that changed office.
+        
+        A tombstone left when the record moved out of its new office earlier
+        is dropped, so it cannot remove the record there again.
+        """
+        if not previous:
+            return
+        for key, (model, office_field) in SYNC_SOURCES.items():
+            if isinstance(instance, model):
+                office = getattr(instance, office_field)
+                if previous[office_field] == office:
+                    return
+                entity = model._meta.model_name
+                Tombstone.objects.filter(
+                    entity=entity, object_id=instance.pk, region_office=office, moved=True
+                ).delete()
+                Tombstone.objects.create(
+                    entity=entity,
+                    object_id=instance.pk,
+                    region_office=previous[office_field],
+                    moved=True
+                )
+                return
@@ -0,0 +1,974 @@
+"""
+Query budget tests for the immigration API.
+"""
+import io
+import json
+import unittest
+from datetime import date
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from .models import (
+    TravelDocument, TravelDocumentChild,
+    DegmadaForm, DegmadaFormMember,
+    KafiilkaForm, KafiilkaFormMember, Job, ExportArtifact
+)
+from .api_views import TravelDocumentViewSet
+
+User = get_user_model()
+
+
+class QueryBudgetTest(TestCase):
+    """
+    Every list and detail endpoint must use a fixed number of queries.
+    
+    Budgets include the one query that computes the ETag.
+    """
+    
+    def setUp(self):
+        """Set up an authenticated client."""
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def add_records(self, count):
+        """Create documents and forms, each with nested rows."""
+        for index in range(count):
+            document = TravelDocument.objects.create(
+                full_name=f'Ahmed User {index}',
+                region='Hargeisa',
+                status='filled',
+                created_by=self.user
+            )
+            for child in range(2):
+                TravelDocumentChild.objects.create(document=document, name=f'Child {child}')
+            
+            degmada = DegmadaForm.objects.create(company_name=f'Company {index}')
+            kafiilka = KafiilkaForm.objects.create(company_name=f'Company {index}')
+            for member in range(2):
+                DegmadaFormMember.objects.create(
+                    form=degmada, name=f'Member {member}', nationality='Somali',
+                    phone='0631234567', id_number=f'DM{index}{member}'
+                )
+                KafiilkaFormMember.objects.create(
+                    form=kafiilka, name=f'Member {member}', nationality='Somali',
+                    phone='0631234567', id_number=f'KM{index}{member}'
+                )
+    
+    def assertQueryBudget(self, budget, path, data=None, method='get'):
+        """
+        Check the query count stays at or below budget as data grows.
+        
+        ``path`` may be a callable, evaluated after the data is added.
+        """
+        counts = []
+        for _ in range(2):
+            self.add_records(5)
+            cache.clear()
+            url = path() if callable(path) else path
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(self.client, method)(url, data)
+            self.assertEqual(response.status_code, 200, response.data)
+            counts.append(len(queries))
+        
+        self.assertEqual(counts[0], counts[1], 'query count grows with the data')
+        self.assertLessEqual(counts[1], budget)
+    
+    def test_travel_document_list(self):
+        self.assertQueryBudget(4, '/api/travel-documents/')
+    
+    def test_travel_document_detail(self):
+        self.assertQueryBudget(3, lambda: f'/api/travel-documents/{TravelDocument.objects.first().pk}/')
+    
+    def test_travel_document_recent(self):
+        self.assertQueryBudget(3, '/api/travel-documents/recent/')
+    
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_travel_document_search(self):
+        # A process-local cache turns search caching off, so only the search
+        # itself is counted; cached pages are covered in test_services
+        self.assertQueryBudget(3, '/api/travel-documents/search/', {'query': 'ahmed'}, 'post')
+    
+    def test_degmada_form_list(self):
+        self.assertQueryBudget(4, '/api/degmada-forms/')
+    
+    def test_degmada_form_detail(self):
+        self.assertQueryBudget(3, lambda: f'/api/degmada-forms/{DegmadaForm.objects.first().pk}/')
+    
+    def test_kafiilka_form_list(self):
+        self.assertQueryBudget(4, '/api/kafiilka-forms/')
+    
+    def test_kafiilka_form_detail(self):
+        self.assertQueryBudget(3, lambda: f'/api/kafiilka-forms/{KafiilkaForm.objects.first().pk}/')
+
+
+class CursorPaginationTest(TestCase):
+    """Tests for opt-in keyset pagination."""
+    
+    def setUp(self):
+        """Set up documents, some sharing a creation time."""
+        from django.utils import timezone
+        
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        
+        for index in range(25):
+            TravelDocument.objects.create(full_name=f'User {index}', region='Hargeisa')
+        TravelDocument.objects.filter(id__lte=10).update(created_at=timezone.now())
+        self.expected = list(
+            TravelDocument.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+    
+    def walk(self, url, method='get', data=None):
+        """Follow next links and return the ids seen."""
+        ids = []
+        while url:
+            response = getattr(self.client, method)(url, data)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+        return ids
+    
+    def test_walk_all_pages(self):
+        """Test that cursor pages cover every document once, in order."""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/travel-documents/?cursor=')
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries))
+        
+        self.assertEqual(self.walk('/api/travel-documents/?cursor='), self.expected)
+        self.assertEqual(self.walk('/api/travel-documents/recent/?cursor='), self.expected)
+        self.assertEqual(
+            self.walk('/api/travel-documents/search/?cursor=', 'post', {'region': 'Hargeisa'}),
+            self.expected
+        )
+    
+    def test_stable_under_inserts(self):
+        """Test that documents created while paging do not shift later pages."""
+        response = self.client.get('/api/travel-documents/?cursor=')
+        first_page = [row['id'] for row in response.data['results']]
+        
+        TravelDocument.objects.create(full_name='New User')
+        rest = self.walk(response.data['next'])
+        
+        self.assertEqual(first_page + rest, self.expected)
+    
+    def test_forms_and_default_pagination(self):
+        """Test cursor pages on forms and that page numbers still work."""
+        DegmadaForm.objects.create(company_name='Test Company')
+        self.assertEqual(len(self.walk('/api/degmada-forms/?cursor=')), 1)
+        
+        response = self.client.get('/api/travel-documents/?page=2')
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 5)
+    
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/travel-documents/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+
+class SparseFieldsetTest(TestCase):
+    """Tests for ?fields= and ?expand= on serializers and querysets."""
+    
+    def setUp(self):
+        """Set up a document with a child and a form with a member."""
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        
+        document = TravelDocument.objects.create(
+            full_name='Test User', status='filled', created_by=self.user
+        )
+        TravelDocumentChild.objects.create(document=document, name='Child')
+        form = KafiilkaForm.objects.create(company_name='Test Company', sponsor_type='SHASI')
+        KafiilkaFormMember.objects.create(
+            form=form, name='Member', nationality='Somali', phone='0631234567', id_number='KM1'
+        )
+    
+    def test_fields_prune_payload_and_columns(self):
+        """Test that unrequested fields are neither serialized nor selected."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                '/api/travel-documents/',
+                {'fields': 'id,document_number,full_name,status_display,created_by_username'}
+            )
+        
+        row = response.data['results'][0]
+        self.assertEqual(
+            set(row), {'id', 'document_number', 'full_name', 'status_display', 'created_by_username'}
+        )
+        self.assertEqual(row['status_display'], 'Waa la Buxiyay')
+        self.assertEqual(row['created_by_username'], 'testuser')
+        
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('mother_name', sql)
+        self.assertNotIn('immigration_traveldocumentchild', sql)
+    
+    def test_expand_nested(self):
+        """Test that expand controls nested data and its prefetch."""
+        response = self.client.get('/api/travel-documents/', {'fields': 'id', 'expand': 'children'})
+        self.assertEqual(response.data['results'][0]['children'][0]['name'], 'Child')
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/kafiilka-forms/', {'expand': ''})
+        row = response.data['results'][0]
+        self.assertNotIn('members', row)
+        self.assertEqual(row['sponsor_type_display'], 'Individual')
+        self.assertFalse(any('kafiilkaformmember' in query['sql'] for query in queries))
+    
+    def test_default_fields_unchanged(self):
+        """Test that requests without the parameters get every field."""
+        response = self.client.get('/api/travel-documents/')
+        row = response.data['results'][0]
+        self.assertIn('mother_name', row)
+        self.assertEqual(len(row['children']), 1)
+
+
+class FastSerializerTest(TestCase):
+    """The fast list path must produce the same bytes as the serializer."""
+    
+    def setUp(self):
+        """Set up documents covering empty, null and nested values."""
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        
+        for index in range(25):
+            document = TravelDocument.objects.create(
+                full_name=f'Ahmed User {index}',
+                region='Hargeisa',
+                status=['filled', 'approved', 'printed'][index % 3],
+                birth_date=date(1990, 1, index + 1),
+                has_notayo=bool(index % 2),
+                photo=f'photos/user{index}.jpg' if index % 4 else '',
+                created_by=self.user if index % 2 else None
+            )
+            for child in range(index % 3):
+                TravelDocumentChild.objects.create(
+                    document=document,
+                    name=f'Child {child}',
+                    birth_date=date(2015, 1, 1) if child else None,
+                    photo='photos/child.jpg' if child else ''
+                )
+    
+    def assertSameContent(self, path, data=None, method='get'):
+        """Compare the fast and the regular response bytes."""
+        cache.clear()
+        fast = getattr(self.client, method)(path, data)
+        cache.clear()
+        with mock.patch.object(TravelDocumentViewSet, 'fast_actions', ()):
+            regular = getattr(self.client, method)(path, data)
+        
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, regular.content)
+    
+    def test_list_recent_and_search(self):
+        self.assertSameContent('/api/travel-documents/')
+        self.assertSameContent('/api/travel-documents/', {'page': 2})
+        self.assertSameContent('/api/travel-documents/?cursor=')
+        self.assertSameContent('/api/travel-documents/recent/')
+        self.assertSameContent('/api/travel-documents/search/', {'query': 'ahmed'}, 'post')
+        self.assertSameContent('/api/travel-documents/search/?cursor=', {'region': 'Hargeisa'}, 'post')
+    
+    def test_sparse_fields(self):
+        self.assertSameContent('/api/travel-documents/', {'fields': 'id,created_by_username,status_display'})
+        self.assertSameContent('/api/travel-documents/', {'fields': 'id', 'expand': 'children'})
+    
+    def test_no_serializer_per_row(self):
+        """Test that the fast path does not read fields one by one."""
+        with mock.patch('rest_framework.fields.Field.get_attribute') as get_attribute:
+            response = self.client.get('/api/travel-documents/')
+        self.assertEqual(len(response.data['results']), 20)
+        get_attribute.assert_not_called()
+    
+    def test_benchmark_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+        
+        out = StringIO()
+        call_command('benchmark_serializers', limit=25, repeat=1, stdout=out)
+        self.assertIn('Output identical', out.getvalue())
+
+
+class ConditionalGetTest(TestCase):
+    """Tests for ETag and Last-Modified handling."""
+    
+    def setUp(self):
+        """Set up a document with a child and a form."""
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        
+        self.document = TravelDocument.objects.create(full_name='Test User', region='Hargeisa')
+        TravelDocumentChild.objects.create(document=self.document, name='Child')
+        self.form = DegmadaForm.objects.create(company_name='Test Company')
+    
+    def revalidate(self, path, etag, **params):
+        """Repeat a GET with If-None-Match and return the response."""
+        return self.client.get(path, params, HTTP_IF_NONE_MATCH=etag)
+    
+    def test_detail_not_modified(self):
+        """Test that an unchanged record is answered with 304 and no serialization."""
+        path = f'/api/travel-documents/{self.document.pk}/'
+        response = self.client.get(path)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.revalidate(path, etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(len(queries), 1)
+        
+        response = self.client.get(path, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        
+        self.assertEqual(self.revalidate(path, etag, fields='id').status_code, 200)
+    
+    def test_changes_invalidate(self):
+        """Test that edits, nested rows and deletions change the ETag."""
+        detail = f'/api/travel-documents/{self.document.pk}/'
+        listing = '/api/travel-documents/'
+        
+        etag = self.client.get(detail)['ETag']
+        TravelDocumentChild.objects.create(document=self.document, name='Second Child')
+        self.assertEqual(self.revalidate(detail, etag).status_code, 200)
+        
+        etag = self.client.get(listing)['ETag']
+        self.assertEqual(self.revalidate(listing, etag).status_code, 304)
+        other = TravelDocument.objects.create(full_name='Other User')
+        self.assertEqual(self.revalidate(listing, etag).status_code, 200)
+        
+        etag = self.client.get(listing)['ETag']
+        other.delete()
+        self.assertEqual(self.revalidate(listing, etag).status_code, 200)
+    
+    def test_lists_and_forms(self):
+        for path in [
+            '/api/travel-documents/recent/',
+            '/api/travel-documents/?cursor=',
+            '/api/degmada-forms/',
+            f'/api/degmada-forms/{self.form.pk}/',
+        ]:
+            etag = self.client.get(path)['ETag']
+            self.assertEqual(self.revalidate(path, etag).status_code, 304, path)
+    
+    def test_html_detail(self):
+        """Test the HTML detail page validators."""
+        from django.test import Client
+        
+        client = Client()
+        path = f'/travel/{self.document.pk}/'
+        response = client.get(path)
+        self.assertEqual(response.status_code, 200)
+        
+        response = client.get(path, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        
+        self.document.full_name = 'Changed User'
+        self.document.save()
+        response = client.get(path, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+
+class BulkCreateTest(TestCase):
+    """Tests for the bulk create endpoint."""
+    
+    def setUp(self):
+        """Set up an authenticated client."""
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def post(self, documents):
+        return self.client.post(
+            '/api/travel-documents/bulk_create/', {'documents': documents}, format='json'
+        )
+    
+    def test_per_row_results(self):
+        response = self.post([
+            {
+                'full_name': 'Maxamed Cali',
+                'region': 'Hargeisa',
+                'status': 'filled',
+                'identification_number': 'sl-123',
+                'children': [{'name': 'Child One'}, {'name': 'Child Two'}]
+            },
+            {'full_name': 'Bad Status', 'status': 'unknown'},
+            {'full_name': 'Faadumo Xasan', 'region': 'Burao', 'status': 'filled'},
+        ])
+        self.assertEqual(response.status_code, 207)
+        
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], ['created', 'error', 'created'])
+        self.assertIn('status', results[1]['errors'])
+        
+        first = TravelDocument.objects.get(pk=results[0]['id'])
+        self.assertEqual(first.document_number, results[0]['document_number'])
+        self.assertEqual(first.created_by, self.user)
+        self.assertEqual(first.identification_number_normalized, 'SL123')
+        self.assertEqual(first.children.count(), 2)
+        self.assertNotEqual(results[0]['document_number'], results[2]['document_number'])
+    
+    def test_derived_data(self):
+        """Test that indexes and counters match a rebuild after bulk insert."""
+        from .models import DocumentRollup, PersonRecord, StatisticsCounter
+        from .names import NameIndex
+        from .autocomplete import AutocompleteIndex
+        from .statistics import StatisticsCounters
+        from .rollups import RollupCube
+        
+        response = self.post([
+            {'full_name': f'Cabdi Axmed {index}', 'region': 'Hargeisa', 'status': 'filled',
+             'identification_number': f'ID{index}'}
+            for index in range(5)
+        ])
+        self.assertEqual(response.status_code, 201)
+        
+        self.assertEqual(PersonRecord.objects.count(), 5)
+        self.assertTrue(NameIndex.search('Abdi Ahmed'))
+        self.assertEqual(AutocompleteIndex.suggest('region', 'harg'), ['Hargeisa'])
+        
+        search = self.client.post('/api/travel-documents/search/', {'query': 'cabdi'})
+        self.assertEqual(search.data['count'], 5)
+        
+        expected = {name: value for name, value in StatisticsCounters.count_all().items() if value}
+        stored = StatisticsCounter.objects.exclude(value=0).values_list('name', 'value')
+        self.assertEqual(dict(stored), expected)
+        cells = sorted(DocumentRollup.objects.values_list('region', 'status', 'count'))
+        RollupCube.rebuild()
+        self.assertEqual(sorted(DocumentRollup.objects.values_list('region', 'status', 'count')), cells)
+    
+    def test_invalid_batch(self):
+        self.assertEqual(self.post([]).status_code, 400)
+        response = self.post([{'status': 'unknown'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['results'][0]['status'], 'error')
+        self.assertFalse(TravelDocument.objects.exists())
+
+
+class JobApiTest(TestCase):
+    """Tests for background bulk operations, exports and the jobs resource."""
+    
+    def setUp(self):
+        self.officer = User.objects.create_user('officer', password='test')
+        self.client = APIClient()
+        self.client.force_authenticate(self.officer)
+        self.document = TravelDocument.objects.create(
+            full_name='Test User', status='filled', region_office='Hargeisa'
+        )
+    
+    def run_jobs(self):
+        from .jobs import JobQueue
+        JobQueue.work('test-worker', once=True)
+    
+    def test_background_export(self):
+        from django.core.files.storage import default_storage
+        
+        response = self.client.post(
+            '/api/travel-documents/export/',
+            {'format': 'json', 'background': True},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['job']['status'], 'queued')
+        location = response['Location']
+        
+        self.run_jobs()
+        job = self.client.get(location).data
+        self.addCleanup(default_storage.delete, job['result']['file'])
+        self.assertEqual((job['status'], job['progress']), ('succeeded', 100))
+        with default_storage.open(job['result']['file']) as exported:
+            documents = json.load(exported)['documents']
+        self.assertEqual([document['id'] for document in documents], [self.document.pk])
+    
+    def test_large_bulk_operation_queued(self):
+        from django.test import override_settings
+        
+        other = TravelDocument.objects.create(
+            full_name='Other User', status='filled', region_office='Hargeisa'
+        )
+        with override_settings(BULK_OPERATION_SYNC_LIMIT=1):
+            response = self.client.post(
+                '/api/travel-documents/bulk_operation/',
+                {'document_ids': [self.document.pk, other.pk], 'operation': 'approve'},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 202)
+        
+        self.run_jobs()
+        job = self.client.get(f"/api/jobs/{response.data['job']['id']}/").data
+        self.assertEqual(
+            [result['status'] for result in job['result']['results']],
+            ['success', 'success']
+        )
+    
+    def test_jobs_visible_to_owner(self):
+        from .jobs import JobQueue
+        
+        job = JobQueue.enqueue('bulk_operation', {'document_ids': [], 'operation': 'approve'}, self.officer)
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user('other', password='test'))
+        self.assertEqual(other.get(f'/api/jobs/{job.pk}/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/jobs/{job.pk}/').status_code, 200)
+    
+    def test_events_stream(self):
+        from .jobs import JobQueue
+        
+        job = JobQueue.enqueue('bulk_operation', {'document_ids': [], 'operation': 'approve'}, self.officer)
+        self.run_jobs()
+        response = self.client.get(
+            f'/api/jobs/{job.pk}/events/', HTTP_ACCEPT='text/event-stream'
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        self.assertTrue(body.startswith('retry: 1000\n\nid: '))
+        self.assertIn('\nevent: done\n', body)
+        self.assertEqual(json.loads(body.split('data: ', 1)[1])['status'], 'succeeded')
+    
+    def test_events_stream_reconnects(self):
+        """Test that a stream ends early and resumes from Last-Event-ID."""
+        from .jobs import JobQueue
+        
+        job = JobQueue.enqueue('bulk_operation', {'document_ids': [], 'operation': 'approve'}, self.officer)
+        with mock.patch('immigration.api_views.JobViewSet.events_timeout', 0):
+            response = self.client.get(
+                f'/api/jobs/{job.pk}/events/',
+                HTTP_ACCEPT='text/event-stream',
+                HTTP_LAST_EVENT_ID=job.updated_at.isoformat()
+            )
+            body = b''.join(response.streaming_content).decode()
+        # The client already has this state and the stream times out at once
+        self.assertEqual(body, 'retry: 1000\n\n')
+
+
+class SyncFeedTest(TestCase):
+    """Tests for the change feed."""
+    
+    def setUp(self):
+        user = User.objects.create_user('officer', password='test')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.documents = [
+            TravelDocument.objects.create(
+                full_name=f'User {index}', region_office=office, status='filled'
+            )
+            for index, office in enumerate(['Hargeisa', 'Hargeisa', 'Burao'])
+        ]
+        self.form = DegmadaForm.objects.create(
+            reference='DF-1', company_name='Company', gobolka='Hargeisa'
+        )
+    
+    def sync(self, **params):
+        from django.test import override_settings
+        with override_settings(SYNC_FEED_SETTLE_SECONDS=0):
+            response = self.client.get('/api/sync/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+    
+    def test_pages_then_deltas(self):
+        """Test keyset paging, then that only changes and deletions follow."""
+        first = self.sync(limit=2)
+        self.assertTrue(first['has_more'])
+        self.assertEqual(
+            [document['id'] for document in first['travel_documents']],
+            [document.pk for document in self.documents[:2]]
+        )
+        self.assertEqual([form['id'] for form in first['degmada_forms']], [self.form.pk])
+        
+        second = self.sync(limit=2, sync_token=first['sync_token'])
+        self.assertFalse(second['has_more'])
+        self.assertEqual([document['id'] for document in second['travel_documents']], [self.documents[2].pk])
+        self.assertEqual(second['degmada_forms'], [])
+        
+        self.documents[0].full_name = 'Renamed'
+        self.documents[0].save()
+        deleted_id = self.documents[1].pk
+        self.documents[1].delete()
+        
+        delta = self.sync(sync_token=second['sync_token'])
+        self.assertEqual(
+            [(document['id'], document['full_name']) for document in delta['travel_documents']],
+            [(self.documents[0].pk, 'Renamed')]
+        )
+        self.assertEqual(
+            [(entry['entity'], entry['id']) for entry in delta['deleted']],
+            [('travel_documents', deleted_id)]
+        )
+        
+        self.assertEqual(self.sync(sync_token=delta['sync_token'])['travel_documents'], [])
+    
+    def test_region_office(self):
+        page = self.sync(region_office='Burao')
+        self.assertEqual([document['id'] for document in page['travel_documents']], [self.documents[2].pk])
+        self.assertEqual(page['degmada_forms'], [])
+    
+    def test_record_moving_between_offices(self):
+        """Test that the old office is told to drop a record that moved away."""
+        hargeisa = self.sync(region_office='Hargeisa')
+        burao = self.sync(region_office='Burao')
+        full = self.sync()
+        
+        document = self.documents[0]
+        document.region_office = 'Burao'
+        document.save()
+        
+        page = self.sync(region_office='Hargeisa', sync_token=hargeisa['sync_token'])
+        self.assertEqual(page['travel_documents'], [])
+        self.assertEqual(
+            [(entry['entity'], entry['id']) for entry in page['deleted']],
+            [('travel_documents', document.pk)]
+        )
+        page = self.sync(region_office='Burao', sync_token=burao['sync_token'])
+        self.assertEqual([row['id'] for row in page['travel_documents']], [document.pk])
+        self.assertEqual(page['deleted'], [])
+        # The record still exists for a client syncing every office
+        page = self.sync(sync_token=full['sync_token'])
+        self.assertEqual([row['id'] for row in page['travel_documents']], [document.pk])
+        self.assertEqual(page['deleted'], [])
+        
+        # Moving back drops the pending tombstone of the office it returns to
+        document.region_office = 'Hargeisa'
+        document.save()
+        page = self.sync(region_office='Hargeisa', sync_token=hargeisa['sync_token'])
+        self.assertEqual([row['id'] for row in page['travel_documents']], [document.pk])
+        self.assertEqual(page['deleted'], [])
+        page = self.sync(region_office='Burao', sync_token=burao['sync_token'])
+        self.assertEqual([entry['id'] for entry in page['deleted']], [document.pk])
+    
+    def test_recent_changes_settle(self):
+        """Test that changes newer than the settle delay are held back."""
+        response = self.client.get('/api/sync/')
+        self.assertEqual(response.data['travel_documents'], [])
+        self.assertEqual(self.client.get('/api/sync/', {'sync_token': response.data['sync_token']}).status_code, 200)
+    
+    def test_invalid_token(self):
+        response = self.client.get('/api/sync/', {'sync_token': 'not-a-token'})
+        self.assertEqual(response.status_code, 400)
+
+
+class StreamingExportTest(TestCase):
+    """Tests for the streamed JSON and NDJSON exports."""
+    
+    def setUp(self):
+        user = User.objects.create_user('officer', password='test')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        for index in range(5):
+            document = TravelDocument.objects.create(
+                full_name=f'User {index}', status='filled', region_office='Hargeisa'
+            )
+            TravelDocumentChild.objects.create(document=document, name=f'Child {index}')
+    
+    def export(self, format_type):
+        response = self.client.post(
+            '/api/travel-documents/export/', {'format': format_type}, format='json'
+        )
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+    
+    def test_json_matches_serializer(self):
+        from django.core.serializers.json import DjangoJSONEncoder
+        from .serializers import TravelDocumentSerializer
+        
+        expected = json.dumps({
+            'documents': [
+                TravelDocumentSerializer(document).data
+                for document in TravelDocument.objects.order_by('-created_at')
+            ]
+        }, cls=DjangoJSONEncoder)
+        self.assertEqual(self.export('json'), expected)
+    
+    def test_ndjson(self):
+        lines = self.export('ndjson').splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(json.loads(lines[0])['children'][0]['name'], 'Child 4')
+    
+    def test_children_loaded_per_batch(self):
+        """Test one children query per batch instead of one per document."""
+        from django.test import override_settings
+        
+        with override_settings(EXPORT_CHUNK_SIZE=2):
+            with CaptureQueriesContext(connection) as queries:
+                self.export('ndjson')
+        children_queries = [
+            query for query in queries.captured_queries
+            if 'FROM "immigration_traveldocumentchild"' in query['sql']
+        ]
+        self.assertEqual(len(children_queries), 3)
+    
+    def test_csv_columns(self):
+        import csv
+        import io
+        
+        response = self.client.post(
+            '/api/travel-documents/export/',
+            {'format': 'csv', 'columns': ['full_name', 'status', 'region_office']},
+            format='json'
+        )
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], ['Full Name', 'Status', 'Region Office'])
+        self.assertEqual(rows[1], ['User 4', 'Waa la Buxiyay', 'Hargeisa'])
+        self.assertEqual(len(rows), 6)
+        
+        response = self.client.post(
+            '/api/travel-documents/export/',
+            {'format': 'csv', 'columns': ['children']},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+    
+    def test_csv_gzip_in_chunks(self):
+        """Test that gzip CSV decompresses to the plain CSV, streamed per batch."""
+        import gzip
+        from django.test import override_settings
+        from .utils import ExportHelper
+        
+        with override_settings(EXPORT_CHUNK_SIZE=2):
+            response = self.client.post(
+                '/api/travel-documents/export/', {'format': 'csv_gz'}, format='json'
+            )
+            chunks = list(response.streaming_content)
+            plain = self.export('csv')
+        
+        self.assertEqual(len(chunks), 3)
+        self.assertTrue(response['Content-Disposition'].endswith('.csv.gz"'))
+        self.assertEqual(gzip.decompress(b''.join(chunks)).decode(), plain)
+        self.assertTrue(plain.startswith(','.join(
+            ExportHelper.CSV_COLUMNS[column] for column in ExportHelper.DEFAULT_CSV_COLUMNS
+        )))
+    
+    def test_excel_sheets(self):
+        """Test the write-only workbook with document, children and form sheets."""
+        import io
+        from openpyxl import load_workbook
+        
+        DegmadaForm.objects.create(reference='DF-1', company_name='Company')
+        response = self.client.post(
+            '/api/travel-documents/export/',
+            {'format': 'excel', 'sheets': ['documents', 'children', 'degmada_forms']},
+            format='json'
+        )
+        self.assertTrue(response['Content-Disposition'].startswith('attachment; filename="travel_documents_'))
+        workbook = load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(workbook.sheetnames, ['Travel Documents', 'Children', 'Degmada Forms'])
+        
+        documents = list(workbook['Travel Documents'].values)
+        self.assertEqual(documents[0][:2], ('Document Number', 'Full Name'))
+        self.assertEqual((documents[1][1], documents[1][6]), ('User 4', 'Waa la Buxiyay'))
+        self.assertEqual(len(documents), 6)
+        self.assertTrue(workbook['Travel Documents']['A1'].font.bold)
+        self.assertEqual(workbook['Travel Documents'].column_dimensions['B'].width, len('Full Name') + 2)
+        
+        children = list(workbook['Children'].values)
+        self.assertEqual([row[1] for row in children[1:]], [f'Child {index}' for index in range(5)])
+        self.assertEqual(list(workbook['Degmada Forms'].values)[1][0], 'DF-1')
+
+
+class ExportArtifactTest(TestCase):
+    """Tests for stored, reused and expiring background exports."""
+    
+    def setUp(self):
+        from .exports import ExportArtifacts
+        from .models import ExportArtifact
+        
+        user = User.objects.create_user('officer', password='test')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.document = TravelDocument.objects.create(
+            full_name='Test User', status='approved', region='Maroodi Jeex'
+        )
+        self.addCleanup(lambda: ExportArtifacts.delete(ExportArtifact.objects.all()))
+    
+    def request_export(self):
+        return self.client.post(
+            '/api/travel-documents/export/',
+            {'format': 'csv', 'background': True, 'filters': {'status': 'approved'}},
+            format='json'
+        )
+    
+    def run_jobs(self):
+        from .jobs import JobQueue
+        JobQueue.work('test-worker', once=True)
+    
+    def test_reused_until_data_changes(self):
+        from django.core.files.storage import default_storage
+        
+        self.assertEqual(self.request_export().status_code, 202)
+        # A pending export is not queued twice
+        self.assertEqual(self.request_export().status_code, 202)
+        self.assertEqual(Job.objects.filter(kind='export').count(), 1)
+        self.run_jobs()
+        
+        response = self.request_export()
+        self.assertEqual(response.status_code, 200)
+        artifact = response.data['artifact']
+        download = self.client.get(artifact['download_url'])
+        self.assertIn(b'Test User', b''.join(download.streaming_content))
+        first_file = ExportArtifact.objects.get(pk=artifact['id']).file.name
+        
+        self.document.full_name = 'Renamed User'
+        self.document.save()
+        self.assertEqual(self.request_export().status_code, 202)
+        self.run_jobs()
+        
+        response = self.request_export()
+        self.assertNotEqual(response.data['artifact']['id'], artifact['id'])
+        self.assertFalse(default_storage.exists(first_file))
+        self.assertEqual(ExportArtifact.objects.count(), 1)
+    
+    def test_expiry(self):
+        from datetime import timedelta
+        from django.core.files.storage import default_storage
+        from django.utils import timezone
+        from .exports import ExportArtifacts
+        
+        self.request_export()
+        self.run_jobs()
+        artifact = ExportArtifact.objects.get()
+        ExportArtifact.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        
+        self.assertEqual(self.client.get(f'/api/exports/{artifact.pk}/download/').status_code, 404)
+        self.assertEqual(self.request_export().status_code, 202)
+        self.assertEqual(ExportArtifacts.purge_expired(), 1)
+        self.assertFalse(default_storage.exists(artifact.file.name))
+    
+    def test_scoped_to_owner(self):
+        self.request_export()
+        self.run_jobs()
+        artifact = ExportArtifact.objects.get()
+        
+        self.client.force_authenticate(User.objects.create_user('other', password='test'))
+        self.assertEqual(self.client.get('/api/exports/').data['count'], 0)
+        self.assertEqual(self.client.get(f'/api/exports/{artifact.pk}/download/').status_code, 404)
+        # The other user's export is built for them, not shared
+        self.assertEqual(self.request_export().status_code, 202)
+        self.run_jobs()
+        self.assertEqual(ExportArtifact.objects.count(), 2)
+        
+        self.client.force_authenticate(User.objects.create_user('admin', password='test', is_staff=True))
+        self.assertEqual(self.client.get('/api/exports/').data['count'], 2)
+
+
+def pdf_packages_installed():
+    from .pdf import PDFUnavailable, require_packages
+    try:
+        require_packages()
+    except PDFUnavailable:
+        return False
+    return True
+
+
+class PrintPDFTest(TestCase):
+    """Tests for cached document PDFs and batch printing."""
+    
+    def setUp(self):
+        from django.core.files.storage import default_storage
+        from .exports import ExportArtifacts
+        
+        user = User.objects.create_user('officer', password='test')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.documents = [
+            TravelDocument.objects.create(full_name=f'User {index}', status=status)
+            for index, status in enumerate(['approved', 'approved', 'filled'])
+        ]
+        TravelDocumentChild.objects.create(
+            document=self.documents[0], name='Child One', birth_date=date(2020, 1, 1)
+        )
+        
+        def cleanup():
+            ExportArtifacts.delete(ExportArtifact.objects.all())
+            for document in self.documents:
+                for layout in ('document', 'card'):
+                    directory = f'pdf_cache/{layout}/{document.pk}'
+                    if default_storage.exists(directory):
+                        for name in default_storage.listdir(directory)[1]:
+                            default_storage.delete(f'{directory}/{name}')
+        self.addCleanup(cleanup)
+    
+    def print_batch(self, ids, **data):
+        return self.client.post(
+            '/api/travel-documents/print_batch/',
+            {'document_ids': ids, **data},
+            format='json'
+        )
+    
+    @unittest.skipUnless(pdf_packages_installed(), 'PDF packages are not installed')
+    def test_mark_printed_rejects_unprintable(self):
+        """Test that nothing is marked printed when one document cannot be."""
+        ids = [document.pk for document in self.documents]
+        response = self.print_batch(ids, mark_printed=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['id'] for error in response.data['errors']], [ids[2]])
+        self.assertFalse(TravelDocument.objects.filter(status='printed').exists())
+    
+    @unittest.skipIf(pdf_packages_installed(), 'PDF packages are installed')
+    def test_unavailable(self):
+        document = self.documents[0]
+        self.assertEqual(self.client.get(f'/api/travel-documents/{document.pk}/pdf/').status_code, 503)
+        self.assertEqual(self.print_batch([document.pk]).status_code, 503)
+    
+    @unittest.skipUnless(pdf_packages_installed(), 'PDF packages are not installed')
+    def test_document_pdf_cached(self):
+        from .pdf import PDFRenderer
+        
+        document = self.documents[0]
+        response = self.client.get(f'/api/travel-documents/{document.pk}/pdf/?layout=card')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        
+        with mock.patch('immigration.pdf.html_to_pdf') as html_to_pdf:
+            PDFRenderer.render(document, 'card')
+            html_to_pdf.assert_not_called()
+        self.assertEqual(
+            self.client.get(
+                f'/api/travel-documents/{document.pk}/pdf/?layout=card',
+                HTTP_IF_NONE_MATCH=response['ETag']
+            ).status_code,
+            304
+        )
+    
+    @unittest.skipUnless(pdf_packages_installed(), 'PDF packages are not installed')
+    def test_batch(self):
+        from pypdf import PdfReader
+        from .jobs import JobQueue
+        
+        ids = [document.pk for document in self.documents[:2]]
+        response = self.print_batch(ids, mark_printed=True)
+        self.assertEqual(response.status_code, 200)
+        reader = PdfReader(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(len(reader.pages), 2)
+        self.assertEqual(TravelDocument.objects.filter(status='printed').count(), 2)
+        
+        self.assertEqual(self.print_batch(ids, background=True).status_code, 202)
+        JobQueue.work('test-worker', once=True)
+        response = self.print_batch(ids, background=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ExportArtifact.objects.get().format, 'pdf')
@@ -1,14 +1,17 @@
 """
 Tests for immigration services.
 """
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
-from .models import TravelDocument, DegmadaForm, KafiilkaForm
+from django.db import transaction
+from .models import TravelDocument, DegmadaForm, KafiilkaForm, DocumentSequence
 from .services import (
     TravelDocumentService, FormService, ValidationService
 )
 from .utils import DocumentValidator, DocumentNumberGenerator
+from .sequences import SEQUENCE_ALIAS, SequenceAllocator
+from .validators import validate_reference_format
 
 User = get_user_model()
 
@@ -251,3 +254,930 @@ class UtilityTests(TestCase):
         
         self.assertEqual(number, 'TD-00101')
 
+
+class SequenceAllocatorTest(TestCase):
+    """Tests for sequence-based number allocation."""
+    
+    def test_travel_document_numbers_are_unique(self):
+        """Test that reserved numbers never repeat."""
+        numbers = DocumentNumberGenerator.reserve_travel_document_numbers(5)
+        numbers += DocumentNumberGenerator.reserve_travel_document_numbers(5)
+        
+        self.assertEqual(len(set(numbers)), 10)
+        self.assertEqual(numbers[0], 'TD-00001')
+    
+    def test_sequence_seeded_from_existing_documents(self):
+        """Test that a new sequence continues after existing numbers."""
+        TravelDocument.objects.create(
+            full_name='Existing User',
+            document_number='TD-00042'
+        )
+        
+        allocator = SequenceAllocator(block_size=1)
+        value = allocator.next_value(
+            'seed-test',
+            initial=DocumentNumberGenerator._last_travel_document_value
+        )
+        
+        self.assertEqual(value, 43)
+    
+    def test_no_spare_values_in_shared_transaction(self):
+        """Test that a counter moved in the caller's transaction keeps no block."""
+        allocator = SequenceAllocator(block_size=10, separate_connection=False)
+        
+        first = allocator.next_value('transaction-test')
+        second = allocator.next_value('transaction-test')
+        
+        self.assertEqual(second, first + 1)
+        self.assertEqual(allocator._blocks, {})
+
+
+class SeparateSequenceConnectionTest(TransactionTestCase):
+    """Tests for counters advanced outside the caller's transaction."""
+    
+    databases = {'default', SEQUENCE_ALIAS}
+    
+    def test_committed_block_is_reused_without_queries(self):
+        """Test that spare values are served from the process cache."""
+        allocator = SequenceAllocator(block_size=10)
+        first = allocator.next_value('block-test')
+        
+        with self.assertNumQueries(0):
+            second = allocator.next_value('block-test')
+        
+        self.assertEqual(second, first + 1)
+    
+    def test_block_survives_rollback(self):
+        """Test that the counter commits at once and its block is reused."""
+        allocator = SequenceAllocator(block_size=10, separate_connection=True)
+        
+        with transaction.atomic():
+            first = allocator.next_value('separate-test')
+            transaction.set_rollback(True)
+        
+        self.assertEqual(
+            DocumentSequence.objects.get(name='separate-test').last_value,
+            first + 9
+        )
+        with self.assertNumQueries(0):
+            second = allocator.next_value('separate-test')
+        self.assertEqual(second, first + 1)
+    
+    def test_form_references_keep_no_spare_values(self):
+        """Test that per-day counters leave nothing in the process cache."""
+        from datetime import date
+        from .sequences import sequence_allocator
+        
+        DocumentNumberGenerator.reserve_form_references('DEG', 1, day=date(2025, 1, 1))
+        self.assertNotIn('DEG-20250101', sequence_allocator._blocks)
+
+
+class FormReferenceTest(TestCase):
+    """Tests for per-day form reference counters."""
+    
+    def test_forms_saved_together_get_distinct_references(self):
+        """Test that forms created in the same second do not collide."""
+        first = DegmadaForm.objects.create(company_name='Company One')
+        second = DegmadaForm.objects.create(company_name='Company Two')
+        
+        self.assertNotEqual(first.reference, second.reference)
+        validate_reference_format(first.reference)
+        validate_reference_format(second.reference)
+    
+    def test_batch_reservation(self):
+        """Test reserving several references in one call."""
+        from datetime import date
+        
+        references = DocumentNumberGenerator.reserve_form_references(
+            'KAF', 3, day=date(2025, 1, 1)
+        )
+        
+        self.assertEqual(references, [
+            'KAF-20250101-000001',
+            'KAF-20250101-000002',
+            'KAF-20250101-000003',
+        ])
+    
+    def test_counter_continues_after_existing_reference(self):
+        """Test that the daily counter is seeded from stored references."""
+        from datetime import date
+        
+        DegmadaForm.objects.create(
+            company_name='Existing Company',
+            reference='DEG-20250101-000007'
+        )
+        
+        reference = DocumentNumberGenerator.reserve_form_references(
+            'DEG', 1, day=date(2025, 1, 1)
+        )[0]
+        
+        self.assertEqual(reference, 'DEG-20250101-000008')
+
+
+class DocumentSearchTest(TestCase):
+    """Tests for the full-text search backend."""
+    
+    def test_search_matches_indexed_fields(self):
+        """Test searching by mother name, district and phone prefix."""
+        document = TravelDocument.objects.create(
+            full_name='Ahmed Ali',
+            mother_name='Hodan Yusuf',
+            district='Gabiley',
+            phone_number='063123456'
+        )
+        
+        for query in ['Hodan', 'gabil', '0631', 'ahmed ali']:
+            results = TravelDocumentService.search_documents(query)
+            self.assertIn(document, results, query)
+    
+    def test_search_index_follows_updates_and_deletes(self):
+        """Test that the index is kept in sync on save and delete."""
+        document = TravelDocument.objects.create(full_name='Old Name')
+        document.full_name = 'New Name'
+        document.save()
+        
+        self.assertFalse(TravelDocumentService.search_documents('Old').exists())
+        self.assertTrue(TravelDocumentService.search_documents('New').exists())
+        
+        document.delete()
+        self.assertFalse(TravelDocumentService.search_documents('New').exists())
+    
+    def test_search_results_are_ranked(self):
+        """Test that name matches rank above matches in minor fields."""
+        by_district = TravelDocument.objects.create(
+            full_name='Someone Else',
+            district='Burao'
+        )
+        by_name = TravelDocument.objects.create(full_name='Burao Hassan')
+        
+        results = list(TravelDocumentService.search_documents('Burao'))
+        
+        self.assertEqual(results, [by_name, by_district])
+    
+    def test_filter_search_uses_index(self):
+        """Test the search filter on TravelDocumentFilter."""
+        from .filters import TravelDocumentFilter
+        
+        document = TravelDocument.objects.create(
+            full_name='Test User',
+            sponsor_name='Sahal Trading'
+        )
+        TravelDocument.objects.create(full_name='Other User')
+        
+        filtered = TravelDocumentFilter(
+            {'search': 'sahal'},
+            queryset=TravelDocument.objects.all()
+        ).qs
+        
+        self.assertEqual(list(filtered), [document])
+    
+    def test_rebuild_search_index(self):
+        """Test rebuilding the index with the management command."""
+        from io import StringIO
+        from django.core.management import call_command
+        
+        TravelDocument.objects.create(full_name='Rebuilt User')
+        call_command('rebuild_indexes', 'search', stdout=StringIO())
+        
+        self.assertTrue(TravelDocumentService.search_documents('Rebuilt').exists())
+
+
+class NameMatchingTest(TestCase):
+    """Tests for phonetic and fuzzy name matching."""
+    
+    def test_phonetic_keys_for_spelling_variants(self):
+        """Test that common spelling variants share a phonetic key."""
+        from .names import NameNormalizer
+        
+        variants = [
+            ['Maxamed', 'Mohamed', 'Muhammad', 'Mohammed'],
+            ['Cabdi', 'Abdi'],
+            ['Xasan', 'Hassan'],
+            ['Cumar', 'Omar'],
+            ['Qaasim', 'Kasim'],
+        ]
+        for group in variants:
+            keys = {
+                NameNormalizer.phonetic_key(NameNormalizer.tokens(name)[0])
+                for name in group
+            }
+            self.assertEqual(len(keys), 1, group)
+    
+    def test_fuzzy_search_across_entities(self):
+        """Test finding a person under different spellings."""
+        from .names import NameIndex
+        
+        document = TravelDocument.objects.create(full_name='Maxamed Cabdi Xasan')
+        form = DegmadaForm.objects.create(company_name='Test Company')
+        member = form.members.create(
+            name='Mohamed Abdi Hassan',
+            nationality='Somali',
+            phone='063123456',
+            id_number='ID12345'
+        )
+        TravelDocument.objects.create(full_name='Faarax Yuusuf')
+        
+        matches = NameIndex.search('Muhammad Abdi Hasan')
+        found = {(match['entity'], match['object_id']) for match in matches}
+        
+        self.assertEqual(found, {
+            ('traveldocument', document.id),
+            ('degmadamember', member.id),
+        })
+    
+    def test_fuzzy_index_follows_renames_and_deletes(self):
+        """Test that the name index is kept in sync."""
+        from .names import NameIndex
+        
+        document = TravelDocument.objects.create(full_name='Cali Warsame')
+        document.full_name = 'Ismaaciil Warsame'
+        document.save()
+        
+        self.assertEqual(NameIndex.search('Ali Warsame', min_score=0.6), [])
+        self.assertEqual(len(NameIndex.search('Ismail Warsame')), 1)
+        
+        document.delete()
+        self.assertEqual(NameIndex.search('Ismail Warsame'), [])
+    
+    def test_exact_match_found_behind_common_keys(self):
+        """Test that a common name does not crowd out the exact match."""
+        from unittest import mock
+        from .names import NameIndex
+        
+        NameIndex._index_batch('traveldocument', [
+            (object_id, f'Maxamed Cali {suffix}')
+            for object_id, suffix in enumerate(('Warsame', 'Faarax', 'Yuusuf') * 120, 1000)
+        ])
+        document = TravelDocument.objects.create(full_name='Maxamed Cali Xasan')
+        
+        with mock.patch.object(NameIndex, 'MAX_CANDIDATES', 5):
+            matches = NameIndex.search('Mohamed Ali Hassan', limit=1)
+        self.assertEqual(matches[0]['object_id'], document.id)
+
+
+class LookupFieldsTest(TestCase):
+    """Tests for normalized phone and ID lookups."""
+    
+    def test_normalize_phone_number(self):
+        """Test E.164 normalization of phone numbers."""
+        from .utils import DataProcessor
+        
+        for phone in ['063 123 4567', '+252-63-1234567', '00252631234567', '631234567']:
+            self.assertEqual(DataProcessor.normalize_phone_number(phone), '+252631234567')
+        self.assertEqual(DataProcessor.normalize_phone_number(''), '')
+    
+    def test_lookup_fields_populated_on_save(self):
+        """Test that normalized columns are filled when saving."""
+        document = TravelDocument.objects.create(
+            full_name='Test User',
+            phone_number='063-123-4567',
+            identification_number=' sl-12345 '
+        )
+        
+        self.assertEqual(document.phone_number_normalized, '+252631234567')
+        self.assertEqual(document.identification_number_normalized, 'SL12345')
+        
+        document.phone_number = '0657654321'
+        document.save(update_fields=['phone_number'])
+        document.refresh_from_db()
+        self.assertEqual(document.phone_number_normalized, '+252657654321')
+    
+    def test_filter_uses_exact_lookup(self):
+        """Test exact phone and ID filtering in TravelDocumentFilter."""
+        from .filters import TravelDocumentFilter
+        
+        document = TravelDocument.objects.create(
+            full_name='Test User',
+            phone_number='063 123 4567',
+            identification_number='SL12345'
+        )
+        TravelDocument.objects.create(full_name='Other User', phone_number='0631234568')
+        
+        for params in [{'phone_number': '+252631234567'}, {'identification_number': 'sl-12345'}]:
+            filtered = TravelDocumentFilter(params, queryset=TravelDocument.objects.all()).qs
+            self.assertEqual(list(filtered), [document], params)
+    
+    def test_backfill_command(self):
+        """Test backfilling normalized columns with the management command."""
+        from io import StringIO
+        from django.core.management import call_command
+        
+        document = TravelDocument.objects.create(full_name='Test User', phone_number='0631234567')
+        TravelDocument.objects.filter(id=document.id).update(phone_number_normalized='')
+        
+        call_command('rebuild_indexes', 'lookups', stdout=StringIO())
+        
+        document.refresh_from_db()
+        self.assertEqual(document.phone_number_normalized, '+252631234567')
+
+
+class PersonIndexTest(TestCase):
+    """Tests for the cross-entity person index."""
+    
+    def setUp(self):
+        self.document = TravelDocument.objects.create(
+            full_name='Maxamed Cabdi',
+            identification_number='SL-12345'
+        )
+        self.form = KafiilkaForm.objects.create(company_name='Test Company')
+        self.member = self.form.members.create(
+            name='Mohamed Abdi',
+            nationality='Somali',
+            phone='0631234567',
+            id_number='sl12345'
+        )
+    
+    def test_lookup_across_entities(self):
+        """Test that one ID finds documents and form members."""
+        from .persons import PersonIndex
+        
+        with self.assertNumQueries(1):
+            records = PersonIndex.lookup('SL 12345')
+        
+        self.assertEqual(
+            [(record['entity'], record['object_id']) for record in records],
+            [('kafiilkamember', self.member.id), ('traveldocument', self.document.id)]
+        )
+        self.assertEqual(records[0]['reference'], self.form.reference)
+        self.assertEqual(records[0]['phone'], '+252631234567')
+    
+    def test_index_follows_changes(self):
+        """Test that edits and deletes keep the index in sync."""
+        from .persons import PersonIndex
+        
+        self.member.id_number = 'SL99999'
+        self.member.save()
+        self.document.delete()
+        
+        self.assertEqual(PersonIndex.lookup('SL12345'), [])
+        self.assertEqual(len(PersonIndex.lookup('SL99999')), 1)
+        
+        self.form.delete()
+        self.assertEqual(PersonIndex.lookup('SL99999'), [])
+    
+    def test_rebuild(self):
+        """Test rebuilding the index from the stored records."""
+        from .models import PersonRecord
+        from .persons import PersonIndex
+        
+        PersonRecord.objects.all().delete()
+        
+        self.assertEqual(PersonIndex.rebuild(), 2)
+        self.assertEqual(len(PersonIndex.lookup('SL12345')), 2)
+    
+    def test_person_api(self):
+        """Test the person lookup endpoint."""
+        from rest_framework.test import APIClient
+        
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('officer', password='test'))
+        
+        response = client.get('/api/persons/sl-12345/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id_number'], 'SL12345')
+        self.assertEqual(len(response.data['records']), 2)
+        
+        response = client.get('/api/persons/UNKNOWN1/')
+        self.assertEqual(response.status_code, 404)
+    
+    def test_reference_fits_form_references(self):
+        """Test that any form reference fits the indexed copy."""
+        from .models import PersonRecord
+        
+        self.assertEqual(
+            PersonRecord._meta.get_field('reference').max_length,
+            KafiilkaForm._meta.get_field('reference').max_length
+        )
+
+
+class SearchResultCacheTest(TestCase):
+    """Tests for cached search results."""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        from rest_framework.test import APIClient
+        
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('officer', password='test'))
+        for index in range(3):
+            TravelDocument.objects.create(full_name=f'Ahmed Test {index}', region='Hargeisa')
+    
+    def test_equivalent_params_share_key(self):
+        """Test that parameter normalization maps variants onto one key."""
+        from .search_cache import SearchResultCache
+        
+        self.assertEqual(
+            SearchResultCache.make_key({'query': ' Ahmed  TEST', 'phone_number': '063 123 4567', 'region': ''}),
+            SearchResultCache.make_key({'phone_number': '+252631234567', 'query': 'ahmed test'})
+        )
+    
+    def test_pages_served_from_cache(self):
+        """Test that later pages only hydrate rows from the cached IDs."""
+        for index in range(20):
+            TravelDocument.objects.create(full_name=f'Ahmed Extra {index}', region='Hargeisa')
+        
+        first = self.client.post('/api/travel-documents/search/', {'query': 'ahmed'})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.data['count'], 23)
+        
+        # The generation and ID list from the cache table, then the page of
+        # rows and their children; no search or COUNT query
+        with self.assertNumQueries(4):
+            response = self.client.post('/api/travel-documents/search/?page=2', {'query': 'Ahmed '})
+        self.assertEqual(response.data['count'], 23)
+        self.assertEqual(len(response.data['results']), 3)
+        
+        ids = [row['id'] for row in first.data['results'] + response.data['results']]
+        self.assertEqual(len(set(ids)), 23)
+    
+    def test_writes_invalidate_cache(self):
+        """Test that saving a document expires cached results."""
+        self.client.post('/api/travel-documents/search/', {'query': 'ahmed'})
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            TravelDocument.objects.create(full_name='Ahmed New')
+        
+        response = self.client.post('/api/travel-documents/search/', {'query': 'ahmed'})
+        self.assertEqual(response.data['count'], 4)
+    
+    def test_generation_shared_between_clients(self):
+        """Test that a bump through one cache client is seen by another."""
+        from django.core.cache import caches
+        from .search_cache import SearchResultCache
+        
+        other = caches.create_connection('default')
+        before = other.get(SearchResultCache.GENERATION_KEY)
+        SearchResultCache._bump_generation()
+        
+        self.assertNotEqual(other.get(SearchResultCache.GENERATION_KEY), before)
+        self.assertEqual(other.get(SearchResultCache.GENERATION_KEY), SearchResultCache.generation())
+    
+    def test_cache_error_does_not_fail_write(self):
+        """Test that a failed generation bump is logged, not raised."""
+        from unittest import mock
+        from django.db import DatabaseError
+        
+        with mock.patch('immigration.search_cache.cache.set', side_effect=DatabaseError), \
+                self.assertLogs('immigration.search_cache', 'ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                document = TravelDocument.objects.create(full_name='Ahmed New')
+        
+        self.assertTrue(TravelDocument.objects.filter(pk=document.pk).exists())
+    
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_disabled_with_process_local_cache(self):
+        """Test that a per-process cache is never used for results."""
+        from .search_cache import SearchResultCache
+        
+        self.assertIsNone(SearchResultCache.get_ids({'query': 'ahmed'}, lambda params: self.fail()))
+        response = self.client.post('/api/travel-documents/search/', {'query': 'ahmed'})
+        self.assertEqual(response.data['count'], 3)
+
+
+class AutocompleteTest(TestCase):
+    """Tests for the typeahead prefix index."""
+    
+    def test_suggestions_follow_writes(self):
+        """Test that saves, edits and deletes keep suggestions current."""
+        from .autocomplete import AutocompleteIndex
+        
+        first = TravelDocument.objects.create(full_name='Maxamed Cali', region='Hargeisa')
+        TravelDocument.objects.create(full_name='Maxamuud Faarax', region='Hargeisa')
+        DegmadaForm.objects.create(company_name='Test Company', gobolka='Hawd')
+        
+        self.assertEqual(
+            AutocompleteIndex.suggest('full_name', 'maxa'),
+            ['Maxamed Cali', 'Maxamuud Faarax']
+        )
+        # Most used values come first
+        self.assertEqual(AutocompleteIndex.suggest('region', 'H'), ['Hargeisa', 'Hawd'])
+        
+        first.full_name = 'Axmed Cali'
+        first.save()
+        self.assertEqual(AutocompleteIndex.suggest('full_name', 'maxa'), ['Maxamuud Faarax'])
+        
+        first.delete()
+        self.assertEqual(AutocompleteIndex.suggest('full_name', 'ax'), [])
+        self.assertEqual(AutocompleteIndex.suggest('region', 'harg'), ['Hargeisa'])
+    
+    def test_most_used_value_wins_short_prefix(self):
+        """Test that a common value is found behind many rarer ones."""
+        from .autocomplete import AutocompleteIndex
+        
+        for index in range(60):
+            AutocompleteIndex.add('full_name', f'Maaha {index:02d}')
+        AutocompleteIndex.add('full_name', 'Mohamed', count=5)
+        AutocompleteIndex.add('full_name', 'M%_d', count=9)
+        
+        self.assertEqual(AutocompleteIndex.suggest('full_name', 'm', limit=2), ['M%_d', 'Mohamed'])
+        # LIKE wildcards in the prefix are matched literally
+        self.assertEqual(AutocompleteIndex.suggest('full_name', 'm%'), ['M%_d'])
+    
+    def test_prefix_range(self):
+        """Test that the range scan stops at the end of the prefix."""
+        from .autocomplete import AutocompleteIndex
+        
+        for value in ('Cali', 'Cabdi', 'Cb', 'Caz\uffff', 'C'):
+            AutocompleteIndex.add('full_name', value)
+        
+        self.assertEqual(
+            AutocompleteIndex.suggest('full_name', 'ca'), ['Cabdi', 'Cali', 'Caz\uffff']
+        )
+        self.assertEqual(AutocompleteIndex.suggest('full_name', 'caz\uffff'), ['Caz\uffff'])
+        self.assertEqual(AutocompleteIndex.prefix_end('ca'), 'cb')
+    
+    def test_rebuild(self):
+        """Test rebuilding the index from stored records."""
+        from .autocomplete import AutocompleteIndex
+        from .models import AutocompleteTerm
+        
+        TravelDocument.objects.create(full_name='Maxamed Cali', region='Hargeisa')
+        TravelDocument.objects.create(full_name='Cabdi Xasan', region='Hargeisa')
+        expected = set(AutocompleteTerm.objects.values_list('field', 'term', 'count'))
+        
+        AutocompleteTerm.objects.all().delete()
+        AutocompleteIndex.rebuild()
+        
+        self.assertEqual(set(AutocompleteTerm.objects.values_list('field', 'term', 'count')), expected)
+    
+    def test_autocomplete_api(self):
+        """Test the autocomplete endpoint."""
+        from rest_framework.test import APIClient
+        
+        TravelDocument.objects.create(full_name='Maxamed Cali', sponsor_name='Cabdi Xasan')
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('officer', password='test'))
+        
+        with self.assertNumQueries(1):
+            response = client.get('/api/autocomplete/', {'field': 'sponsor_name', 'q': 'cab'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, ['Cabdi Xasan'])
+        
+        response = client.get('/api/autocomplete/', {'field': 'unknown', 'q': 'cab'})
+        self.assertEqual(response.status_code, 400)
+
+
+class StatisticsCountersTest(TestCase):
+    """Tests for incrementally maintained statistics counters."""
+    
+    def setUp(self):
+        self.document = TravelDocument.objects.create(full_name='Test User', status='filled')
+        TravelDocument.objects.create(full_name='Other User', status='approved')
+        DegmadaForm.objects.create(company_name='Test Company')
+    
+    def test_counters_follow_writes(self):
+        """Test that creates, status transitions and deletes move the counters."""
+        from .statistics import StatisticsCounters
+        
+        TravelDocumentService.approve_document(self.document)
+        stats = StatisticsCounters.dashboard()
+        self.assertEqual(stats['total_documents'], 2)
+        self.assertEqual(stats['filled_documents'], 0)
+        self.assertEqual(stats['approved_documents'], 2)
+        self.assertEqual(stats['recent_documents'], 2)
+        self.assertEqual(stats['total_degmada'], 1)
+        self.assertEqual(stats['recent_degmada'], 1)
+        
+        self.document.delete()
+        stats = StatisticsCounters.dashboard()
+        self.assertEqual(stats['total_documents'], 1)
+        self.assertEqual(stats['approved_documents'], 1)
+    
+    def test_dashboard_matches_rebuild(self):
+        """Test that incremental counters match a full recount."""
+        from io import StringIO
+        from django.core.management import call_command
+        from .statistics import StatisticsCounters
+        
+        expected = StatisticsCounters.dashboard()
+        call_command('rebuild_statistics', stdout=StringIO())
+        self.assertEqual(StatisticsCounters.dashboard(), expected)
+        self.assertEqual(expected['filled_documents'], 1)
+    
+    def test_statistics_api_single_query(self):
+        """Test that the statistics endpoint reads counters in one query."""
+        from rest_framework.test import APIClient
+        
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('officer', password='test'))
+        
+        with self.assertNumQueries(1):
+            response = client.get('/api/statistics/')
+        self.assertEqual(response.data['total_documents'], 2)
+        self.assertEqual(response.data['approved_documents'], 1)
+
+
+class RollupCubeTest(TestCase):
+    """Tests for the rollup cubes and drill-down API."""
+    
+    def setUp(self):
+        self.document = TravelDocument.objects.create(
+            full_name='Test User', region='Hargeisa', district='Gacan Libaax', status='filled'
+        )
+        TravelDocument.objects.create(full_name='Other User', region='Hargeisa', status='approved')
+        TravelDocument.objects.create(full_name='Third User', region='Berbera', status='approved')
+        KafiilkaForm.objects.create(gobolka='Hargeisa', sponsor_type='SHASI')
+        DegmadaForm.objects.create(gobolka='Hargeisa')
+    
+    def test_drill_down(self):
+        """Test slicing and rolling up the document cube."""
+        from .rollups import RollupCube
+        
+        self.assertEqual(
+            RollupCube.drill_down('documents', ['region']),
+            [{'region': 'Hargeisa', 'count': 2}, {'region': 'Berbera', 'count': 1}]
+        )
+        self.assertEqual(
+            RollupCube.drill_down('documents', ['status'], {'region': 'Hargeisa'}),
+            [{'status': 'approved', 'count': 1}, {'status': 'filled', 'count': 1}]
+        )
+        self.assertEqual(RollupCube.drill_down('forms', []), [{'count': 2}])
+        self.assertEqual(
+            RollupCube.drill_down('forms', ['form_type', 'sponsor_type'], {'form_type': 'kafiilka'}),
+            [{'form_type': 'kafiilka', 'sponsor_type': 'SHASI', 'count': 1}]
+        )
+    
+    def test_cells_follow_writes(self):
+        """Test that status changes and deletes move records between cells."""
+        from .rollups import RollupCube
+        
+        TravelDocumentService.approve_document(self.document)
+        self.assertEqual(
+            RollupCube.drill_down('documents', ['status']),
+            [{'status': 'approved', 'count': 3}]
+        )
+        
+        self.document.delete()
+        self.assertEqual(RollupCube.drill_down('documents', []), [{'count': 2}])
+    
+    def test_rebuild_matches_incremental(self):
+        """Test that a full rebuild gives the same cells."""
+        from .models import DocumentRollup, FormRollup
+        from .rollups import RollupCube
+        
+        fields = ['day', 'region', 'district', 'status', 'nationality', 'count']
+        expected = set(DocumentRollup.objects.values_list(*fields))
+        expected_forms = set(FormRollup.objects.values_list('form_type', 'gobolka', 'sponsor_type', 'count'))
+        
+        RollupCube.rebuild()
+        
+        self.assertEqual(set(DocumentRollup.objects.values_list(*fields)), expected)
+        self.assertEqual(
+            set(FormRollup.objects.values_list('form_type', 'gobolka', 'sponsor_type', 'count')),
+            expected_forms
+        )
+    
+    def test_rollup_api(self):
+        """Test the drill-down endpoint."""
+        from rest_framework.test import APIClient
+        
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('officer', password='test'))
+        
+        with self.assertNumQueries(1):
+            response = client.get('/api/rollups/documents/', {'group_by': 'month,region', 'status': 'approved'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['region'] for row in response.data], ['Berbera', 'Hargeisa'])
+        
+        response = client.get('/api/rollups/documents/', {'group_by': 'gobolka'})
+        self.assertEqual(response.status_code, 400)
+
+
+class LifecycleTest(TestCase):
+    """Tests for status transition tracking and time-in-state reports."""
+    
+    def setUp(self):
+        self.officer = User.objects.create_user('officer', password='test')
+    
+    def test_transitions_recorded(self):
+        """Test that each status change is stored with its officer and duration."""
+        document = TravelDocument.objects.create(
+            full_name='Test User', status='filled', region_office='Hargeisa'
+        )
+        TravelDocumentService.approve_document(document, self.officer)
+        TravelDocumentService.print_document(document)
+        
+        transitions = list(document.transitions.order_by('occurred_at'))
+        self.assertEqual(
+            [(t.from_status, t.to_status, t.officer) for t in transitions],
+            [('filled', 'approved', self.officer), ('approved', 'printed', None)]
+        )
+        self.assertTrue(all(t.seconds_in_state >= 0 for t in transitions))
+    
+    def test_percentiles_from_histograms(self):
+        """Test p50/p90 estimates per region office and per officer."""
+        from datetime import timedelta
+        from django.utils import timezone
+        from .lifecycle import LifecycleTracker, LifecycleReport
+        
+        now = timezone.now()
+        for index, hours in enumerate([1] * 5 + [2] * 4 + [100]):
+            document = TravelDocument.objects.create(
+                full_name=f'User {index}', status='filled', region_office='Hargeisa'
+            )
+            TravelDocument.objects.filter(pk=document.pk).update(
+                created_at=now - timedelta(hours=hours)
+            )
+            document.refresh_from_db()
+            LifecycleTracker.record_transition(document, 'filled', 'approved', self.officer, now)
+        
+        [row] = LifecycleReport.time_in_state('filled')
+        self.assertEqual(row['region_office'], 'Hargeisa')
+        self.assertEqual(row['count'], 10)
+        self.assertAlmostEqual(row['p50'], 3600, delta=3600 * 0.05)
+        self.assertAlmostEqual(row['p90'], 7200, delta=7200 * 0.05)
+        self.assertAlmostEqual(row['p99'], 360000, delta=360000 * 0.05)
+        
+        [row] = LifecycleReport.time_in_state('filled', group_by='officer')
+        self.assertEqual(row['officer_username'], 'officer')
+        
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        self.assertEqual(LifecycleReport.time_in_state('filled', date_from=tomorrow), [])
+    
+    def test_lifecycle_api(self):
+        """Test the time-in-state endpoint."""
+        from rest_framework.test import APIClient
+        
+        document = TravelDocument.objects.create(full_name='Test User', status='filled')
+        client = APIClient()
+        client.force_authenticate(self.officer)
+        client.post(f'/api/travel-documents/{document.pk}/approve/')
+        
+        response = client.get('/api/lifecycle/', {'status': 'filled', 'group_by': 'officer'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['officer'], self.officer.pk)
+        
+        response = client.get('/api/lifecycle/', {'status': 'unknown'})
+        self.assertEqual(response.status_code, 400)
+
+
+class BulkStatusUpdateTest(TestCase):
+    """Tests for set-based status transitions."""
+    
+    def setUp(self):
+        self.officer = User.objects.create_user('officer', password='test')
+    
+    def create_documents(self, statuses):
+        return [
+            TravelDocument.objects.create(
+                full_name=f'User {index}', status=status,
+                region='Hargeisa', region_office='Hargeisa'
+            ).pk
+            for index, status in enumerate(statuses)
+        ]
+    
+    def test_outcomes_and_derived_data(self):
+        """Test per-document outcomes and that aggregates match a rebuild."""
+        from .models import DocumentRollup, StatisticsCounter, TransitionHistogram
+        from .statistics import StatisticsCounters
+        from .rollups import RollupCube
+        from .lifecycle import LifecycleTracker
+        
+        ids = self.create_documents(['filled', 'filled', 'approved', '', 'printed'])
+        outcomes = TravelDocumentService.bulk_update_status(ids + [999999], 'approved', self.officer)
+        
+        self.assertEqual(list(outcomes), ids + [999999])
+        self.assertEqual([outcomes[pk] for pk in ids[:2] + ids[3:4]], [None, None, None])
+        self.assertEqual(outcomes[ids[2]], 'Cannot transition from approved to approved')
+        self.assertEqual(outcomes[999999], 'Document not found')
+        self.assertEqual(
+            list(TravelDocument.objects.filter(id__in=ids).order_by('id').values_list('status', flat=True)),
+            ['approved', 'approved', 'approved', 'approved', 'printed']
+        )
+        
+        transitions = TravelDocument.objects.get(pk=ids[0]).transitions.get()
+        self.assertEqual((transitions.from_status, transitions.officer), ('filled', self.officer))
+        self.assertEqual(TravelDocument.objects.get(pk=ids[3]).transitions.get().seconds_in_state, None)
+        
+        expected = {name: value for name, value in StatisticsCounters.count_all().items() if value}
+        stored = StatisticsCounter.objects.exclude(value=0).values_list('name', 'value')
+        self.assertEqual(dict(stored), expected)
+        
+        for model, rebuild in [(DocumentRollup, RollupCube.rebuild), (TransitionHistogram, LifecycleTracker.rebuild)]:
+            cells = sorted(model.objects.values_list(*[f.attname for f in model._meta.fields[1:]]))
+            rebuild()
+            self.assertEqual(sorted(model.objects.values_list(*[f.attname for f in model._meta.fields[1:]])), cells)
+    
+    def test_constant_queries(self):
+        """Test that the number of queries does not grow with the batch."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        # The first batch creates the counter and histogram rows
+        counts = []
+        for size in [1, 5, 50]:
+            ids = self.create_documents(['filled'] * size)
+            with CaptureQueriesContext(connection) as queries:
+                TravelDocumentService.bulk_update_status(ids, 'approved', self.officer)
+            counts.append(len(queries))
+        self.assertEqual(counts[1], counts[2])
+    
+    def test_bulk_operation_api(self):
+        from rest_framework.test import APIClient
+        
+        ids = self.create_documents(['filled', 'printed'])
+        client = APIClient()
+        client.force_authenticate(self.officer)
+        response = client.post(
+            '/api/travel-documents/bulk_operation/',
+            {'document_ids': ids, 'operation': 'approve'},
+            format='json'
+        )
+        self.assertEqual(
+            [(result['document_id'], result['status']) for result in response.data['results']],
+            [(ids[0], 'success'), (ids[1], 'error')]
+        )
+        self.assertEqual(response.data['results'][0]['message'], 'Document approved')
+    
+    def test_print_errors(self):
+        ids = self.create_documents(['filled', 'approved', 'printed'])
+        self.assertEqual(
+            TravelDocumentService.print_errors(ids + [999999]),
+            [
+                {'id': ids[0], 'error': 'Cannot transition from filled to printed'},
+                {'id': 999999, 'error': 'Document not found'},
+            ]
+        )
+
+
+class JobQueueTest(TestCase):
+    """Tests for the background job queue."""
+    
+    def setUp(self):
+        self.officer = User.objects.create_user('officer', password='test')
+    
+    def test_run_bulk_operation(self):
+        """Test that a claimed job runs once and stores its result."""
+        from .jobs import JobQueue
+        
+        document = TravelDocument.objects.create(
+            full_name='Test User', status='filled', region_office='Hargeisa'
+        )
+        job = JobQueue.enqueue(
+            'bulk_operation',
+            {'document_ids': [document.pk], 'operation': 'approve'},
+            self.officer
+        )
+        
+        claimed = JobQueue.claim('worker-1')
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertIsNone(JobQueue.claim('worker-2'))
+        
+        job = JobQueue.run(claimed)
+        self.assertEqual((job.status, job.progress, job.attempts), ('succeeded', 100, 1))
+        self.assertEqual(job.result['results'][0]['status'], 'success')
+        self.assertIsNotNone(job.finished_at)
+        document.refresh_from_db()
+        self.assertEqual(document.status, 'approved')
+    
+    def test_retries_then_fails(self):
+        """Test backoff between attempts and failure after the last one."""
+        from unittest import mock
+        from datetime import timedelta
+        from django.utils import timezone
+        from .jobs import JobQueue, JOB_HANDLERS
+        
+        def broken(job, progress):
+            raise RuntimeError('storage unavailable')
+        
+        with mock.patch.dict(JOB_HANDLERS, {'broken': broken}):
+            job = JobQueue.enqueue('broken')
+            for attempt in range(1, job.max_attempts + 1):
+                job = JobQueue.run(JobQueue.claim('worker-1'))
+                self.assertEqual(job.attempts, attempt)
+                self.assertEqual(job.error, 'storage unavailable')
+                if attempt < job.max_attempts:
+                    self.assertEqual(job.status, 'queued')
+                    self.assertGreater(job.run_after, timezone.now())
+                    self.assertIsNone(JobQueue.claim('worker-1'))
+                    job.run_after = timezone.now() - timedelta(seconds=1)
+                    job.save()
+        
+        self.assertEqual(job.status, 'failed')
+        self.assertIsNotNone(job.finished_at)
+    
+    def test_stale_job_reclaimed(self):
+        """Test that a job whose worker stopped is claimed again."""
+        from datetime import timedelta
+        from django.utils import timezone
+        from .jobs import JobQueue
+        from .models import Job
+        
+        job = JobQueue.enqueue('bulk_operation', {'document_ids': [], 'operation': 'approve'})
+        JobQueue.claim('worker-1')
+        self.assertIsNone(JobQueue.claim('worker-2'))
+        
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=2))
+        job = JobQueue.claim('worker-2')
+        self.assertEqual((job.locked_by, job.attempts), ('worker-2', 2))
+    
+    def test_run_jobs_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .jobs import JobQueue
+        
+        JobQueue.enqueue('bulk_operation', {'document_ids': [], 'operation': 'approve'})
+        output = StringIO()
+        call_command('run_jobs', '--once', stdout=output)
+        self.assertIn('Ran 1 job(s)', output.getvalue())
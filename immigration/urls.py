@@ -3,7 +3,9 @@ from rest_framework.routers import DefaultRouter
 from . import views
 from .api_views import (
     TravelDocumentViewSet, DegmadaFormViewSet,
-    KafiilkaFormViewSet, StatisticsView, DocumentValidationView
+    KafiilkaFormViewSet, StatisticsView, DocumentValidationView,
+    NameSearchView, PersonLookupView, AutocompleteView, RollupView,
+    LifecycleReportView, SyncFeedView, JobViewSet, ExportArtifactViewSet
 )
 
 # API Router
@@ -11,6 +13,8 @@ api_router = DefaultRouter()
 api_router.register(r'travel-documents', TravelDocumentViewSet, basename='traveldocument')
 api_router.register(r'degmada-forms', DegmadaFormViewSet, basename='degmadaform')
 api_router.register(r'kafiilka-forms', KafiilkaFormViewSet, basename='kafiilkaform')
+api_router.register(r'jobs', JobViewSet, basename='job')
+api_router.register(r'exports', ExportArtifactViewSet, basename='exportartifact')
 
 urlpatterns = [
     # Home URL
@@ -41,4 +45,10 @@ urlpatterns = [
     path('api/', include(api_router.urls)),
     path('api/statistics/', StatisticsView.as_view(), name='api-statistics'),
     path('api/validate-document/', DocumentValidationView.as_view(), name='api-validate-document'),
+    path('api/name-search/', NameSearchView.as_view(), name='api-name-search'),
+    path('api/rollups/<str:cube>/', RollupView.as_view(), name='api-rollups'),
+    path('api/lifecycle/', LifecycleReportView.as_view(), name='api-lifecycle'),
+    path('api/sync/', SyncFeedView.as_view(), name='api-sync'),
+    path('api/autocomplete/', AutocompleteView.as_view(), name='api-autocomplete'),
+    path('api/persons/<str:id_number>/', PersonLookupView.as_view(), name='api-person-lookup'),
 ]
\ No newline at end of file
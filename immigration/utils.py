@@ -4,7 +4,7 @@ Utility functions for the immigration application.
 import re
 from datetime import date, datetime
 from django.utils.translation import gettext_lazy as _
-from django.core.exceptions import ValidationError
+from django.core.exceptions import FieldDoesNotExist, ValidationError
 
 
 class DocumentValidator:
@@ -53,29 +53,97 @@ class DocumentValidator:
 class DocumentNumberGenerator:
     """Generate unique document numbers for various document types."""
     
+    TRAVEL_DOCUMENT_SEQUENCE = 'travel_document'
+    
     @staticmethod
     def generate_travel_document_number(last_id=None):
         """Generate a travel document number."""
         if last_id is None:
-            from .models import TravelDocument
-            last_doc = TravelDocument.objects.order_by('-id').first()
-            last_id = last_doc.id if last_doc else 0
+            return DocumentNumberGenerator.reserve_travel_document_numbers(1)[0]
         
         return f"TD-{str(last_id + 1).zfill(5)}"
     
+    @staticmethod
+    def reserve_travel_document_numbers(count):
+        """Reserve a block of travel document numbers."""
+        from .sequences import sequence_allocator
+        
+        values = sequence_allocator.reserve(
+            DocumentNumberGenerator.TRAVEL_DOCUMENT_SEQUENCE,
+            count,
+            initial=DocumentNumberGenerator._last_travel_document_value
+        )
+        return [f"TD-{str(value).zfill(5)}" for value in values]
+    
+    @staticmethod
+    def _last_travel_document_value():
+        """Find the highest number already used, to seed the sequence."""
+        from .models import TravelDocument
+        from django.db.models import Max
+        from django.db.models.functions import Length
+        
+        last_id = TravelDocument.objects.aggregate(last=Max('id'))['last'] or 0
+        
+        last_number = TravelDocument.objects.filter(
+            document_number__regex=r'^TD-\d+$'
+        ).annotate(
+            number_length=Length('document_number')
+        ).order_by(
+            '-number_length', '-document_number'
+        ).values_list('document_number', flat=True).first()
+        
+        if last_number:
+            return max(last_id, int(last_number[3:]))
+        return last_id
+    
     @staticmethod
     def generate_degmada_reference():
         """Generate a degmada form reference."""
-        from django.utils import timezone
-        now = timezone.now()
-        return f"DEG-{now.strftime('%Y%m%d')}-{now.strftime('%H%M%S')}"
+        return DocumentNumberGenerator.reserve_form_references('DEG', 1)[0]
     
     @staticmethod
     def generate_kafiilka_reference():
         """Generate a kafiilka form reference."""
+        return DocumentNumberGenerator.reserve_form_references('KAF', 1)[0]
+    
+    @staticmethod
+    def reserve_form_references(prefix, count, day=None):
+        """
+        Reserve ``count`` form references for one prefix and day.
+        
+        References look like DEG-YYYYMMDD-NNNNNN, where NNNNNN comes from a
+        per-prefix, per-day counter, so forms saved in the same second no
+        longer collide.
+        """
         from django.utils import timezone
-        now = timezone.now()
-        return f"KAF-{now.strftime('%Y%m%d')}-{now.strftime('%H%M%S')}"
+        from .sequences import sequence_allocator
+        
+        day = day or timezone.localdate()
+        day_prefix = f"{prefix}-{day.strftime('%Y%m%d')}-"
+        
+        values = sequence_allocator.reserve(
+            day_prefix.rstrip('-'),
+            count,
+            initial=lambda: DocumentNumberGenerator._last_form_reference_value(
+                prefix, day_prefix
+            ),
+            # A day's counter is dropped the next day, along with any spares
+            use_blocks=False
+        )
+        return [f"{day_prefix}{str(value).zfill(6)}" for value in values]
+    
+    @staticmethod
+    def _last_form_reference_value(prefix, day_prefix):
+        """Find the highest reference already used today, to seed the counter."""
+        from .models import DegmadaForm, KafiilkaForm
+        
+        model = {'DEG': DegmadaForm, 'KAF': KafiilkaForm}[prefix]
+        last_reference = model.objects.filter(
+            reference__startswith=day_prefix
+        ).order_by('-reference').values_list('reference', flat=True).first()
+        
+        suffix = last_reference[len(day_prefix):] if last_reference else ''
+        return int(suffix) if suffix.isdigit() else 0
 
 
 class DataProcessor:
@@ -90,6 +158,34 @@ class DataProcessor:
         cleaned = re.sub(r'[\s\-\(\)]', '', phone)
         return cleaned
     
+    @staticmethod
+    def normalize_phone_number(phone):
+        """
+        Normalize a phone number to E.164 form (+2526XXXXXXXX).
+        
+        Local Somaliland numbers get the +252 country code; numbers in an
+        unrecognized format are reduced to their digits.
+        """
+        cleaned = DataProcessor.clean_phone_number(phone)
+        if not cleaned:
+            return ''
+        
+        if cleaned.startswith('00'):
+            cleaned = '+' + cleaned[2:]
+        digits = re.sub(r'\D', '', cleaned)
+        if not digits:
+            return ''
+        
+        if cleaned.startswith('+'):
+            return '+' + digits
+        if digits.startswith('252') and len(digits) > 10:
+            return '+' + digits
+        
+        local = digits[1:] if digits.startswith('0') else digits
+        if re.match(r'^[6-7][0-9]{7,8}$', local):
+            return '+252' + local
+        return digits
+    
     @staticmethod
     def format_identification_number(id_number):
         """Format identification number with proper casing."""
@@ -97,6 +193,15 @@ class DataProcessor:
             return ''
         return id_number.upper().strip()
     
+    @staticmethod
+    def normalize_identification_number(id_number):
+        """Upper-case an identification number and strip separators."""
+        return re.sub(
+            r'[\s\-/.]',
+            '',
+            DataProcessor.format_identification_number(id_number)
+        )
+    
     @staticmethod
     def extract_name_parts(full_name):
         """Extract first name, last name from full name."""
@@ -148,12 +253,9 @@ class ReportGenerator:
     @staticmethod
     def get_documents_by_region():
         """Get documents grouped by region."""
-        from .models import TravelDocument
-        from django.db.models import Count
+        from .rollups import RollupCube
         
-        return TravelDocument.objects.values('region').annotate(
-            count=Count('id')
-        ).order_by('-count')
+        return RollupCube.drill_down('documents', ['region'])
     
     @staticmethod
     def get_recent_documents(days=30):
@@ -183,6 +285,27 @@ class NotificationHelper:
         # Placeholder for actual notification logic
         return notification_data
     
+    @staticmethod
+    def send_bulk_status_notification(rows, new_status):
+        """
+        Send one batch of notifications for documents changed together.
+        
+        ``rows`` are dicts with each document's number, name and old status.
+        """
+        timestamp = datetime.now()
+        notifications = [
+            {
+                'document_number': row['document_number'],
+                'full_name': row['full_name'],
+                'old_status': row['status'],
+                'new_status': new_status,
+                'timestamp': timestamp,
+            }
+            for row in rows
+        ]
+        # Placeholder for actual notification logic
+        return notifications
+    
     @staticmethod
     def notify_pending_approval(documents):
         """Notify about documents pending approval."""
@@ -209,25 +332,130 @@ class ExportHelper:
             result.append(data)
         return result
     
+    # CSV column (a TravelDocument field) -> header
+    CSV_COLUMNS = {
+        'document_number': 'Document Number',
+        'full_name': 'Full Name',
+        'date': 'Date',
+        'region': 'Region',
+        'district': 'District',
+        'status': 'Status',
+        'created_at': 'Created At',
+        'updated_at': 'Updated At',
+        'region_office': 'Region Office',
+        'mother_name': 'Mother Name',
+        'birth_date': 'Birth Date',
+        'birth_place': 'Birth Place',
+        'identification_number': 'Identification Number',
+        'workplace': 'Workplace',
+        'sponsor_name': 'Sponsor Name',
+        'phone_number': 'Phone Number',
+        'nationality': 'Nationality',
+        'job_type': 'Job Type',
+        'card_number': 'Card Number',
+    }
+    DEFAULT_CSV_COLUMNS = [
+        'document_number', 'full_name', 'date', 'region',
+        'district', 'status', 'created_at'
+    ]
+    
+    # Excel sheet -> (title, [(header, column)]); "documents" is the original export
+    EXCEL_SHEETS = {
+        'documents': ('Travel Documents', [
+            ('Document Number', 'document_number'), ('Full Name', 'full_name'),
+            ('Date', 'date'), ('Region', 'region'), ('District', 'district'),
+            ('Sponsor', 'sponsor_name'), ('Status', 'status'), ('Created At', 'created_at'),
+        ]),
+        'children': ('Children', [
+            ('Document Number', 'document__document_number'), ('Name', 'name'),
+            ('Birth Date', 'birth_date'), ('Birth Place', 'birth_place'),
+        ]),
+        'degmada_forms': ('Degmada Forms', [
+            ('Reference', 'reference'), ('Date', 'date'), ('Company', 'company_name'),
+            ('Sponsor', 'sponsor_name'), ('Gobolka', 'gobolka'), ('Degmada', 'degmada'),
+            ('Created At', 'created_at'),
+        ]),
+        'degmada_members': ('Degmada Members', [
+            ('Form Reference', 'form__reference'), ('Name', 'name'),
+            ('Nationality', 'nationality'), ('Birth Date', 'birth_date'),
+            ('Phone', 'phone'), ('ID Number', 'id_number'),
+        ]),
+        'kafiilka_forms': ('Kafiilka Forms', [
+            ('Reference', 'reference'), ('Date', 'date'), ('Company', 'company_name'),
+            ('Sponsor Type', 'sponsor_type'), ('Sponsor', 'sponsor_name'),
+            ('Gobolka', 'gobolka'), ('Degmada', 'degmada'), ('Created At', 'created_at'),
+        ]),
+        'kafiilka_members': ('Kafiilka Members', [
+            ('Form Reference', 'form__reference'), ('Name', 'name'),
+            ('Nationality', 'nationality'), ('Birth Date', 'birth_date'),
+            ('Phone', 'phone'), ('ID Number', 'id_number'),
+        ]),
+    }
+    
     @staticmethod
-    def prepare_csv_data(documents):
-        """Prepare data for CSV export."""
-        headers = [
-            'Document Number', 'Full Name', 'Date', 'Region', 
-            'District', 'Status', 'Created At'
-        ]
-        rows = []
+    def format_value(value, labels=None):
+        """Format a value for a CSV or Excel cell."""
+        if value is None:
+            return ''
+        if labels is not None:
+            return labels.get(value, value)
+        if isinstance(value, datetime):
+            return value.strftime('%Y-%m-%d %H:%M:%S')
+        if isinstance(value, date):
+            return value.isoformat()
+        return value
+    
+    @staticmethod
+    def iter_rows(queryset, columns, chunk_size=1000):
+        """
+        Yield the formatted ``columns`` of a queryset, one list per row.
         
-        for doc in documents:
-            rows.append([
-                doc.document_number,
-                doc.full_name,
-                doc.date.isoformat() if doc.date else '',
-                doc.region,
-                doc.district,
-                doc.get_status_display(),
-                doc.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            ])
+        Columns are field names or lookups such as ``document__document_number``;
+        fields with choices are shown by label. Rows are read with
+        ``values_list`` and a chunked iterator, so only ``chunk_size`` rows
+        are held in memory at a time.
+        """
+        labels = {}
+        for column in columns:
+            try:
+                field = queryset.model._meta.get_field(column)
+            except FieldDoesNotExist:
+                continue
+            if field.choices:
+                labels[column] = {value: str(label) for value, label in field.flatchoices}
+        
+        records = queryset.prefetch_related(None).values_list(*columns).iterator(
+            chunk_size=chunk_size
+        )
+        for record in records:
+            yield [
+                ExportHelper.format_value(value, labels.get(column))
+                for column, value in zip(columns, record)
+            ]
+    
+    @staticmethod
+    def prepare_csv_data(documents, columns=None, chunk_size=1000):
+        """
+        Prepare data for CSV export.
+        
+        Returns the headers and a generator of rows; querysets are read
+        through ``iter_rows``.
+        """
+        from .models import TravelDocument
+        
+        columns = columns or ExportHelper.DEFAULT_CSV_COLUMNS
+        headers = [ExportHelper.CSV_COLUMNS[column] for column in columns]
+        
+        if hasattr(documents, 'values_list'):
+            return headers, ExportHelper.iter_rows(documents, columns, chunk_size)
         
+        labels = {'status': dict(TravelDocument.STATUS_CHOICES)}
+        rows = (
+            [
+                ExportHelper.format_value(getattr(doc, column), labels.get(column))
+                for column in columns
+            ]
+            for doc in documents
+        )
         return headers, rows
 
@@ -185,10 +185,11 @@ def validate_reference_format(value):
     if not value:
         return
     
-    # Check if it matches expected format (DEG-YYYYMMDD-HHMMSS or KAF-YYYYMMDD-HHMMSS)
+    # Check if it matches expected format (DEG-YYYYMMDD-NNNNNN or KAF-YYYYMMDD-NNNNNN).
+    # Older references used the time of day (HHMMSS) as the last part.
     if not re.match(r'^(DEG|KAF)-\d{8}-\d{6}$', value):
         raise ValidationError(
-            _('Invalid reference format. Should be like DEG-20250101-120000.'),
+            _('Invalid reference format. Should be like DEG-20250101-000001.'),
             params={'value': value},
         )
 
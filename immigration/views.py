@@ -1,4 +1,5 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.views.decorators.http import condition
 from django.views.generic import ListView
 from .models import (
     DegmadaForm, DegmadaFormMember,
@@ -10,6 +11,12 @@ from .forms import (
     KafiilkaFormForm, KafiilkaFormMemberFormSet,
     TravelDocumentForm, TravelDocumentChildFormSet
 )
+from .conditional import RecordValidators
+
+# Detail pages answer 304 while the record is unchanged
+degmada_validators = RecordValidators(DegmadaForm)
+kafiilka_validators = RecordValidators(KafiilkaForm)
+travel_document_validators = RecordValidators(TravelDocument)
 
 # Home View
 def home(request):
@@ -40,6 +47,7 @@ def degmada_form_create(request):
         'formset': formset,
     })
 
+@condition(etag_func=degmada_validators.etag, last_modified_func=degmada_validators.last_modified)
 def degmada_form_detail(request, pk):
     form = get_object_or_404(DegmadaForm, pk=pk)
     return render(request, 'degmada_form/detail.html', {'form': form})
@@ -96,6 +104,7 @@ def kafiilka_form_create(request):
         'formset': formset,
     })
 
+@condition(etag_func=kafiilka_validators.etag, last_modified_func=kafiilka_validators.last_modified)
 def kafiilka_form_detail(request, pk):
     form = get_object_or_404(KafiilkaForm, pk=pk)
     return render(request, 'kafiilka_form/detail.html', {'form': form})
@@ -167,6 +176,7 @@ def travel_document_create(request):
         'title': 'Create Travel Document'
     })
 
+@condition(etag_func=travel_document_validators.etag, last_modified_func=travel_document_validators.last_modified)
 def travel_document_detail(request, pk):
     document = get_object_or_404(TravelDocument, pk=pk)
     return render(request, 'travel_document/detail.html', {'document': document})
@@ -179,6 +189,7 @@ def travel_document_edit(request, pk):
         formset = TravelDocumentChildFormSet(request.POST, request.FILES, instance=document)
         
         if form.is_valid() and formset.is_valid():
+            document._status_changed_by = request.user
             form.save()
             formset.save()
             messages.success(request, 'Travel document updated successfully!')
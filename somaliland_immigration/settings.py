@@ -84,6 +84,14 @@ DATABASES = {
     }
 }
 
+# Second connection to the default database; document sequence counters are
+# advanced on it, outside the caller's transaction (see
+# immigration/sequences.py)
+DATABASES['immigration_sequences'] = {
+    **DATABASES['default'],
+    'TEST': {'MIRROR': 'default'},
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -150,3 +158,56 @@ FILTERS_VERBOSE_LOOKUPS = {
     'contains': 'contains',
     'icontains': 'contains (case-insensitive)',
 }
+
+# Document numbers are reserved from the database in blocks of this size
+# per worker process (see immigration/sequences.py)
+DOCUMENT_SEQUENCE_BLOCK_SIZE = 20
+
+# Cache shared by all worker processes; search result caching relies on
+# every process seeing the same generation, and is skipped with a
+# process-local cache. Migration 0023 creates the cache table
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'immigration_cache',
+    }
+}
+
+# Travel document search results (ordered ID lists) are cached for this many
+# seconds; searches matching more documents than the limit are not cached
+SEARCH_CACHE_TIMEOUT = 300
+SEARCH_CACHE_MAX_RESULTS = 10000
+
+# Background jobs (see immigration/jobs.py): failed jobs are retried up to
+# JOB_MAX_ATTEMPTS times, waiting JOB_RETRY_DELAY seconds doubled after each
+# attempt; running jobs whose lock is older than JOB_LOCK_TIMEOUT seconds
+# are taken over by another worker
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_DELAY = 30
+JOB_LOCK_TIMEOUT = 3600
+
+# Bulk operations on more documents than this run as background jobs
+BULK_OPERATION_SYNC_LIMIT = 1000
+
+# Change feed (/api/sync/): records per source and page, and how many
+# seconds a change must age before it is served, so rows from transactions
+# still committing are not skipped
+SYNC_FEED_PAGE_SIZE = 500
+SYNC_FEED_SETTLE_SECONDS = 5
+
+# Exports read and serialize documents in batches of this size
+EXPORT_CHUNK_SIZE = 1000
+
+# Background export files are kept and served again for this many seconds
+# while the exported data is unchanged
+EXPORT_ARTIFACT_TTL = 86400
+
+# Batch PDF printing (see immigration/pdf.py): batches of more documents
+# than PDF_BATCH_SYNC_LIMIT run as background jobs, which render pages
+# across PDF_RENDER_PROCESSES processes; smaller batches are rendered in
+# the request. PDF_QR_URL is the text of each document's QR code,
+# formatted with {id} and {document_number}; the document number alone
+# when unset
+PDF_RENDER_PROCESSES = 4
+PDF_BATCH_SYNC_LIMIT = 50
+PDF_QR_URL = None